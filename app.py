@@ -9,7 +9,7 @@ import json
 
 from src.tools.content_search import search_items
 from src.tools.geocode import geocode_place
-from src.tools.scoring import quality_score
+from src.tools.scoring import score_search_results
 from src.ui.styles import apply_custom_css
 from src.utils.text import clean_html_to_text
 
@@ -235,6 +235,13 @@ with st.sidebar:
             c2.metric("Scored", metrics['scores'])
             if metrics['broken_services'] > 0: st.error(f"⚠️ {metrics['broken_services']} Broken")
             else: st.success("✅ Healthy")
+            stages = status.get('stages')
+            if stages is not None and not stages.empty:
+                with st.expander(f"Run {status['latest_run']['short_id']} stages"):
+                    st.dataframe(
+                        stages[['stage', 'seconds', 'rows_in', 'rows_out', 'bytes_fetched', 'peak_rss_mb', 'status']],
+                        hide_index=True, use_container_width=True
+                    )
     if st.button("Refresh"): st.rerun()
 
 # --- Page: Copilot ---
@@ -314,8 +321,8 @@ if page == "Copilot":
                     box.write("🔍 Searching...")
                     items = search_items(prompt, item_type=item_type, max_items=max_items)
                     scored = []
-                    for i in items:
-                        i['quality_score'] = quality_score(i)
+                    for i, score in zip(items, score_search_results(items)):
+                        i['quality_score'] = score
                         scored.append(i)
                     if sort_by_quality: scored.sort(key=lambda x:x['quality_score'], reverse=True)
                     st.session_state.results = scored
@@ -386,7 +393,7 @@ if page == "Catalog Health":
     st.title("📊 Catalog Health")
     if not status['ok']: st.stop()
     run_id = status['latest_run']['run_id']
-    data = admin_queries(run_id)
+    data = admin_queries(run_id, status.get('health_run_id'))
     t1, t2, t3 = st.tabs(["Overview", "Issues", "Owners"])
     with t1: st.metric("Unique Items", status['metrics']['items'])
     with t2:
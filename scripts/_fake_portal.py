@@ -0,0 +1,68 @@
+"""
+Offline fixtures shared by the verify scripts that run the snapshot pipeline:
+a throwaway warehouse and a fake portal serving generated items.
+
+Import this module before any project module, so the warehouse path is set
+before it is read.
+"""
+import sys
+import os
+import tempfile
+import types
+
+TMP_DIR = tempfile.mkdtemp(prefix="geocatalog_verify_")
+os.environ["GEOCATALOG_DB_PATH"] = os.path.join(TMP_DIR, "catalog.duckdb")
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+class FakeContent:
+    """Pages `items` like advanced_search and counts the page requests."""
+    def __init__(self, items, reported=None, on_page=None):
+        self.items = items
+        # Total the portal claims, e.g. more than it pages when a page goes missing
+        self.reported = len(items) if reported is None else reported
+        # Called before each page is served, e.g. to make the portal slow
+        self.on_page = on_page
+        self.page_requests = 0
+
+    def advanced_search(self, query, start=1, max_items=100, return_count=False, **kwargs):
+        if return_count:
+            return self.reported
+        self.page_requests += 1
+        if self.on_page is not None:
+            self.on_page()
+        page = self.items[start - 1:start - 1 + max_items]
+        next_start = start + len(page)
+        return {'total': self.reported, 'start': start, 'num': max_items,
+                'nextStart': next_start if next_start <= len(self.items) else -1,
+                'results': [dict(p) for p in page]}
+
+class FakeGIS:
+    """Just enough of a GIS for run_snapshot and the deletion sweep: no network."""
+    def __init__(self, items, reported=None, on_page=None):
+        self.url = "https://portal.example.invalid"
+        self.properties = types.SimpleNamespace(id="verify")
+        self.content = FakeContent(items, reported, on_page)
+
+def make_items(n):
+    """`n` raw item dicts with a spread of missing tags, descriptions and extents."""
+    items = []
+    for k in range(n):
+        created = 1600000000000 + k * 1000
+        items.append({
+            'id': f"{k:032x}", 'title': f"Verification item {k}", 'type': 'Web Map',
+            'owner': ('alice', 'bob', 'carol')[k % 3], 'url': None, 'access': 'public',
+            'tags': ['a', 'b', 'c'][:k % 4], 'snippet': '', 'description': 'desc' if k % 2 else '',
+            'thumbnail': None, 'extent': [[-10, -10], [10, 10]] if k % 5 else [],
+            'created': created, 'modified': created + 5000, 'numViews': k,
+        })
+    return items
+
+def snapshot(con, gis, **kwargs) -> str:
+    """Runs an uncapped snapshot without health checks and returns its run id."""
+    from src.pipeline.snapshot import run_snapshot
+    return run_snapshot(con, gis, **{'max_items': None, 'enable_health': False, **kwargs})
+
+def check(label, ok):
+    print(f"[{'OK' if ok else 'FAIL'}] {label}")
+    return ok
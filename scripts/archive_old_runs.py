@@ -0,0 +1,35 @@
+import argparse
+import sys
+import os
+
+# Ensure project root is in path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.storage.duckdb_client import ensure_db_initialized, connect
+from src.storage.retention import archive_old_runs, get_fact_archive_root, RETENTION_DAYS, ARCHIVED_TABLES
+from src.pipeline.leases import hold_lease
+
+def main():
+    parser = argparse.ArgumentParser(description="Move old runs' quality scores and health checks to Parquet")
+    parser.add_argument("--older-than-days", type=float, default=RETENTION_DAYS, help="Archive runs started more than this many days ago")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be archived")
+
+    args = parser.parse_args()
+
+    try:
+        ensure_db_initialized()
+        con = connect()
+        with hold_lease(con, 'retention'):
+            summary = archive_old_runs(con, older_than_days=args.older_than_days, dry_run=args.dry_run)
+        con.close()
+        rows = ", ".join(f"{summary.get(t, 0)} {t} rows" for t in ARCHIVED_TABLES)
+        verb = "Would archive" if args.dry_run else "Archived"
+        print(f"[OK] {verb} {summary['runs']} runs ({rows}) to {get_fact_archive_root()}")
+        sys.exit(0)
+
+    except Exception as e:
+        print(f"[ERROR] Archiving failed: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import argparse
+import sys
+import os
+import time
+import uuid
+import duckdb
+
+# Ensure project root is in path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.storage.duckdb_client import init_db
+from src.storage.bulk_load import bulk_insert
+from src.pipeline.snapshot import normalize_item
+from src.pipeline.records import records_to_columns
+
+# executemany runs at roughly 10 ms/row, so by default it is timed on this many rows and
+# extrapolated linearly to the full size (100k rows would take over a quarter of an hour)
+EXECUTEMANY_CAP = 2000
+
+def synthetic_raw_items(n: int) -> list:
+    """Builds n ArcGIS-like raw item payloads."""
+    items = []
+    for k in range(n):
+        items.append({
+            'id': f"{k:032x}",
+            'title': f"Synthetic item {k}",
+            'type': "Feature Service",
+            'owner': f"owner_{k % 50}",
+            'url': f"https://services.example.com/arcgis/rest/services/S{k}/FeatureServer" if k % 2 else None,
+            'access': 'public',
+            'tags': ['roads', 'transport', 'city'][:k % 4],
+            'snippet': "A short synthetic summary for benchmarking",
+            'description': "Synthetic description" if k % 3 else "",
+            'thumbnail': "thumbnail/ago.png" if k % 5 else None,
+            'extent': [[-10.0, -10.0], [10.0, 10.0]] if k % 4 else [],
+            'created': 1600000000000 + k * 1000,
+            'modified': 1700000000000 + k * 1000,
+            'numViews': k
+        })
+    return items
+
+def load_executemany(con, rows):
+    keys = list(rows[0].keys())
+    cols = ", ".join(keys)
+    placeholders = ", ".join(["?"] * len(keys))
+    con.executemany(f"INSERT OR REPLACE INTO items_current ({cols}) VALUES ({placeholders})",
+                    [[r[k] for k in keys] for r in rows])
+
+def load_bulk(con, rows):
+    bulk_insert(con, "items_current", records_to_columns(rows), replace=True, key="item_id")
+
+def time_load(loader, rows) -> float:
+    con = duckdb.connect(":memory:")
+    try:
+        init_db(con)
+        t0 = time.perf_counter()
+        loader(con, rows)
+        elapsed = time.perf_counter() - t0
+        loaded = con.sql("SELECT COUNT(*) FROM items_current").fetchone()[0]
+        if loaded != len(rows):
+            raise RuntimeError(f"Expected {len(rows)} rows, loaded {loaded}")
+        return elapsed
+    finally:
+        con.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark items_current loading: executemany vs columnar bulk load")
+    parser.add_argument("--sizes", type=str, default="10000,100000", help="Comma-separated row counts")
+    parser.add_argument("--executemany-cap", type=int, default=EXECUTEMANY_CAP,
+                        help="Rows to time executemany on; larger sizes are extrapolated (0: no cap)")
+    args = parser.parse_args()
+
+    run_id = uuid.uuid4()
+    print(f"{'rows':>8} | {'executemany (s)':>25} | {'bulk load (s)':>14} | {'speedup':>8}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        rows = [normalize_item(r, run_id) for r in synthetic_raw_items(size)]
+        timed = min(size, args.executemany_cap) if args.executemany_cap > 0 else size
+        t_many = time_load(load_executemany, rows[:timed]) * size / timed
+        many_label = f"{t_many:.3f}" if timed == size else f"{t_many:.3f} (est. from {timed})"
+        t_bulk = time_load(load_bulk, rows)
+        print(f"{size:>8} | {many_label:>25} | {t_bulk:>14.3f} | {t_many / t_bulk:>7.0f}x")
+    if args.executemany_cap > 0:
+        print(f"executemany times above {args.executemany_cap} rows are linear extrapolations; "
+              f"pass --executemany-cap 0 to time them in full.")
+
+if __name__ == "__main__":
+    main()
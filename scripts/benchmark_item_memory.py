@@ -0,0 +1,45 @@
+import argparse
+import gc
+import sys
+import os
+import tracemalloc
+import uuid
+
+# Ensure project root is in path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.pipeline.snapshot import normalize_item
+from src.pipeline.records import records_to_columns
+from benchmark_bulk_load import synthetic_raw_items
+
+def measure(build) -> float:
+    """MB still allocated by the object `build()` returns (raw payloads excluded)."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current / (1024 * 1024)
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory held by normalized items: row dicts vs slotted records vs columnar batch")
+    parser.add_argument("--items", type=int, default=100000, help="Synthetic items to normalize")
+    args = parser.parse_args()
+
+    run_id = uuid.uuid4()
+    raw_items = synthetic_raw_items(args.items)
+
+    # Row dicts with datetime values: the representation normalize_item returned before ItemRecord
+    dicts_mb = measure(lambda: [normalize_item(r, run_id).as_dict() for r in raw_items])
+    records_mb = measure(lambda: [normalize_item(r, run_id) for r in raw_items])
+    columns_mb = measure(lambda: records_to_columns([normalize_item(r, run_id) for r in raw_items]))
+
+    print(f"{args.items} normalized items")
+    print(f"{'representation':>16} | {'MB':>8} | {'bytes/item':>10} | {'vs dicts':>8}")
+    for label, mb in [("row dicts", dicts_mb), ("ItemRecord", records_mb), ("columnar batch", columns_mb)]:
+        print(f"{label:>16} | {mb:>8.1f} | {mb * 1024 * 1024 / args.items:>10.0f} | {mb / dicts_mb:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
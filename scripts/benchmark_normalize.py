@@ -0,0 +1,93 @@
+import argparse
+import collections
+import sys
+import os
+import time
+import uuid
+import duckdb
+
+# Ensure project root is in path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.storage.duckdb_client import init_db
+from src.storage.bulk_load import bulk_insert
+from src.pipeline.snapshot import (
+    normalize_batch, create_normalize_pool, normalize_workers, NORMALIZE_POOL_MIN_PAGES, SEARCH_PAGE_SIZE
+)
+from benchmark_bulk_load import synthetic_raw_items
+
+def run_pipeline(raw_items: list, run_id: uuid.UUID, workers: int, page_size: int, load: bool = True):
+    """
+    Normalizes page-sized chunks (inline or in a process pool) and, with `load`,
+    bulk loads them in order as run_snapshot does.
+
+    Returns:
+        tuple: (seconds for the pages, seconds to start and warm up the pool)
+    """
+    pages = [raw_items[i:i + page_size] for i in range(0, len(raw_items), page_size)]
+    con = duckdb.connect(":memory:")
+    pool = create_normalize_pool(workers) if workers > 1 else None
+    try:
+        init_db(con)
+        # Warm up the workers so process start-up is timed separately
+        t_start = time.perf_counter()
+        if pool is not None:
+            list(pool.map(normalize_batch, [pages[0]] * workers, [run_id] * workers))
+        startup = time.perf_counter() - t_start
+        t0 = time.perf_counter()
+        in_flight = collections.deque()
+        loaded = 0
+
+        def consume(entry):
+            columns = entry.result() if pool else normalize_batch(entry, run_id)
+            if load:
+                return bulk_insert(con, "items_current", columns, replace=True, key="item_id")
+            return len(columns['item_id'])
+
+        for page in pages:
+            in_flight.append(pool.submit(normalize_batch, page, run_id) if pool else page)
+            while len(in_flight) > (workers * 2 if pool else 0):
+                loaded += consume(in_flight.popleft())
+        while in_flight:
+            loaded += consume(in_flight.popleft())
+        elapsed = time.perf_counter() - t0
+        if loaded != len(raw_items):
+            raise RuntimeError(f"Expected {len(raw_items)} rows, got {loaded}")
+        return elapsed, startup
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        con.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark normalization + bulk load: inline vs process pool")
+    parser.add_argument("--items", type=int, default=200000, help="Synthetic items to normalize")
+    parser.add_argument("--workers", type=str, default="2,4", help="Comma-separated worker counts to compare")
+    parser.add_argument("--page-size", type=int, default=SEARCH_PAGE_SIZE, help="Items per chunk")
+    args = parser.parse_args()
+
+    run_id = uuid.uuid4()
+    raw_items = synthetic_raw_items(args.items)
+    page_count = -(-args.items // args.page_size)
+    print(f"{args.items} items, {args.page_size} per chunk, {os.cpu_count()} CPUs")
+    if normalize_workers(2) == 1:
+        print("Single CPU: run_snapshot normalizes inline here whatever --workers says; "
+              "the pool rows only show its overhead.")
+
+    print(f"{'workers':>8} | {'normalize (s)':>13} | {'speedup':>8} | {'+ bulk load (s)':>15} | {'speedup':>8} | "
+          f"{'pool start (s)':>14} | {'break-even pages':>16}")
+    base_norm = base_total = None
+    for workers in [1] + [int(w) for w in args.workers.split(",")]:
+        t_norm, startup = run_pipeline(raw_items, run_id, workers, args.page_size, load=False)
+        t_total, _ = run_pipeline(raw_items, run_id, workers, args.page_size, load=True)
+        base_norm, base_total = base_norm or t_norm, base_total or t_total
+        label = "inline" if workers == 1 else str(workers)
+        # Pages after which the time saved per page has paid for starting the pool
+        saved_per_page = (base_total - t_total) / page_count
+        break_even = "-" if workers == 1 else (f"{startup / saved_per_page:.0f}" if saved_per_page > 0 else "never")
+        print(f"{label:>8} | {t_norm:>13.2f} | {base_norm / t_norm:>7.1f}x | "
+              f"{t_total:>15.2f} | {base_total / t_total:>7.1f}x | {startup:>14.2f} | {break_even:>16}")
+    print(f"run_snapshot starts the pool after {NORMALIZE_POOL_MIN_PAGES} inline pages.")
+
+if __name__ == "__main__":
+    main()
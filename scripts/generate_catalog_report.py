@@ -9,6 +9,9 @@ import duckdb
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from src.storage.duckdb_client import connect
+from src.pipeline.instrumentation import load_run_stages
+from src.pipeline.health_refresh import latest_health_run_id
+from src.tools.scoring import missing_field_sql, failed_rule_sql
 # Note: we import preflight logic here, but for module use we might skip it or handle differently.
 # But keeping consistent behavior is good.
 
@@ -22,7 +25,7 @@ def preflight_or_exit(con, exit_on_error=True):
     print("Performing preflight checks...")
     
     # 2. Check Tables
-    required_tables = ['runs', 'items_current', 'quality_scores', 'health_checks', 'items_history']
+    required_tables = ['runs', 'items_current', 'items_active', 'quality_scores', 'health_checks', 'items_history']
     existing_tables_df = con.sql("SELECT table_name FROM information_schema.tables WHERE table_schema='main'").df()
     existing_tables = set(existing_tables_df['table_name'].tolist())
     
@@ -56,8 +59,8 @@ def preflight_or_exit(con, exit_on_error=True):
             else:
                 raise RuntimeError(msg)
             
-    # 4. Detect Latest Run
-    runs_df = con.sql("SELECT run_id, started_at, finished_at FROM runs ORDER BY started_at DESC LIMIT 1").df()
+    # 4. Detect Latest Run (health-only runs have no items or scores of their own)
+    runs_df = con.sql("SELECT run_id, started_at, finished_at FROM runs WHERE COALESCE(source, '') <> 'health' ORDER BY started_at DESC LIMIT 1").df()
     
     if runs_df.empty:
         msg = "No runs found. Run 'python scripts/run_snapshot.py' first."
@@ -117,17 +120,30 @@ def generate_report_logic(con, run_id_str, output_dir, verify_only=False):
     report_sections.append(f"**Run ID:** `{run_id_str}`")
     report_sections.append(f"**Started:** {run_info['started_at']}")
     report_sections.append(f"**Finished:** {run_info['finished_at']}")
+
+    # Health from the newest finished run with results for this snapshot (may be a health-only run)
+    health_run_id = latest_health_run_id(con, run_id_str) or run_id_str
+    if health_run_id != run_id_str:
+        report_sections.append(f"**Health Run ID:** `{health_run_id}`")
     
     # A) Snapshot Summary
     summary_sql = f"""
     SELECT 
-        (SELECT COUNT(*) FROM items_current) as total_items,
-        (SELECT COUNT(*) FROM quality_scores WHERE run_id = '{run_id_str}') as scored_items,
-        (SELECT COUNT(*) FROM health_checks WHERE run_id = '{run_id_str}') as checked_urls
+        (SELECT COUNT(*) FROM items_active) as total_items,
+        (SELECT COUNT(*) FROM quality_scores_all WHERE run_id = '{run_id_str}') as scored_items,
+        (SELECT COUNT(*) FROM health_checks_all WHERE run_id = '{health_run_id}') as checked_urls
     """
     summary_df = query_df(con, summary_sql)
     report_sections.append("## Snapshot Summary")
     report_sections.append(render_df_markdown(summary_df))
+
+    # A2) Run Stages
+    report_sections.append("## Run Stages")
+    stages_df = load_run_stages(con, run_id_str)
+    if stages_df is None:
+        report_sections.append("_Stage metrics not available (run `python scripts/init_duckdb.py`)._")
+    else:
+        report_sections.append(render_df_markdown(stages_df.drop(columns=['started_at', 'finished_at'])))
     
     # B) Quality Stats
     qual_sql = f"""
@@ -137,24 +153,25 @@ def generate_report_logic(con, run_id_str, output_dir, verify_only=False):
         MAX(score) as max_score,
         COUNT(CASE WHEN score >= 70 THEN 1 END) as count_high_quality,
         COUNT(CASE WHEN score < 50 THEN 1 END) as count_low_quality
-    FROM quality_scores 
+    FROM quality_scores_all 
     WHERE run_id = '{run_id_str}'
     """
     qual_df = query_df(con, qual_sql)
     report_sections.append("## Quality Stats")
     report_sections.append(render_df_markdown(qual_df))
 
-    # C) Top Issues
+    # C) Top Issues (missing metadata: the run's quality_scores masks, or the item columns for unscored items)
+    scored = f"items_active i LEFT JOIN quality_scores_all s ON s.item_id = i.item_id AND s.run_id = '{run_id_str}'"
     issues_map = {
-        'missing_tags': "SELECT item_id, title, owner FROM items_current WHERE COALESCE(tags_count,0)=0",
-        'missing_description': "SELECT item_id, title, owner FROM items_current WHERE COALESCE(has_description,false)=false",
-        'missing_extent': "SELECT item_id, title, owner FROM items_current WHERE COALESCE(has_extent,false)=false",
-        'stale_items': "SELECT item_id, title, owner, modified_at FROM items_current WHERE modified_at < (now() - INTERVAL '2 years')",
+        'missing_tags': f"SELECT i.item_id, i.title, i.owner FROM {scored} WHERE {missing_field_sql('tags')}",
+        'missing_description': f"SELECT i.item_id, i.title, i.owner FROM {scored} WHERE {missing_field_sql('description')}",
+        'missing_extent': f"SELECT i.item_id, i.title, i.owner FROM {scored} WHERE {failed_rule_sql('has_extent')}",
+        'stale_items': "SELECT item_id, title, owner, modified_at FROM items_active WHERE modified_at < (now() - INTERVAL '2 years')",
         'broken_services': f"""
             SELECT i.title, i.owner, h.checked_url, h.status_code, h.error_message 
-            FROM health_checks h 
-            JOIN items_current i ON h.item_id = i.item_id 
-            WHERE h.run_id = '{run_id_str}' AND h.ok = false
+            FROM health_checks_all h 
+            JOIN items_active i ON h.item_id = i.item_id 
+            WHERE h.run_id = '{health_run_id}' AND h.ok = false
         """
     }
     
@@ -178,15 +195,16 @@ def generate_report_logic(con, run_id_str, output_dir, verify_only=False):
             print(f"   -> Wrote {csv_path} ({len(df)} rows)")
 
     # D) By-Owner Aggregations
-    owner_sql = """
+    owner_sql = f"""
     SELECT 
-        owner,
+        i.owner,
         COUNT(*) as total_items,
-        COUNT(CASE WHEN COALESCE(tags_count,0)=0 THEN 1 END) as missing_tags,
-        COUNT(CASE WHEN COALESCE(has_description,false)=false THEN 1 END) as missing_description,
-        COUNT(CASE WHEN modified_at < (now() - INTERVAL '2 years') THEN 1 END) as stale
-    FROM items_current
-    GROUP BY owner
+        COUNT(CASE WHEN {missing_field_sql('tags')} THEN 1 END) as missing_tags,
+        COUNT(CASE WHEN {missing_field_sql('description')} THEN 1 END) as missing_description,
+        COUNT(CASE WHEN i.modified_at < (now() - INTERVAL '2 years') THEN 1 END) as stale
+    FROM items_active i
+    LEFT JOIN quality_scores_all s ON s.item_id = i.item_id AND s.run_id = '{run_id_str}'
+    GROUP BY i.owner
     ORDER BY total_items DESC
     LIMIT 20
     """
@@ -206,7 +224,7 @@ def generate_report_logic(con, run_id_str, output_dir, verify_only=False):
     
     # Try different table checks for backward compatibility if needed, but here we assume 'started_at'
     # The check below is a bit verbose, we'll simpler logic for this refactor.
-    prev_run_df = con.sql(f"SELECT run_id FROM runs WHERE started_at < (SELECT started_at FROM runs WHERE run_id='{run_id_str}') ORDER BY started_at DESC LIMIT 1").df()
+    prev_run_df = con.sql(f"SELECT run_id FROM runs WHERE COALESCE(source, '') <> 'health' AND started_at < (SELECT started_at FROM runs WHERE run_id='{run_id_str}') ORDER BY started_at DESC LIMIT 1").df()
     
     if prev_run_df.empty:
         report_sections.append("_No previous run to compare._")
@@ -8,10 +8,13 @@ from datetime import datetime
 # Add project root to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from src.storage.duckdb_client import connect
+from src.tools.scoring import missing_field_sql
+from src.pipeline.health_refresh import latest_health_run_id
 
 def get_latest_run_id(con):
     try:
-        df = con.sql("SELECT run_id FROM runs ORDER BY started_at DESC LIMIT 1").df()
+        # Health-only runs have no scores of their own
+        df = con.sql("SELECT run_id FROM runs WHERE COALESCE(source, '') <> 'health' ORDER BY started_at DESC LIMIT 1").df()
         if not df.empty:
             return str(df.iloc[0]['run_id'])
     except Exception:
@@ -31,21 +34,24 @@ def generate_remediation_pack(run_id=None, out_dir="reports"):
                 print("[ERROR] No run_id found.")
                 return False
         
-        print(f"Generating Remediation Pack for Run ID: {run_id}")
+        # Health from the newest finished run with results for this snapshot (may be a health-only run)
+        health_run_id = latest_health_run_id(con, run_id) or run_id
+        print(f"Generating Remediation Pack for Run ID: {run_id}"
+              + (f" (health from run {health_run_id})" if health_run_id != run_id else ""))
         
         # 2. Base Query Logic (Common Columns)
-        # We join items_current with quality_scores and health_checks
+        # We join items_active with quality_scores and health_checks
         # We calculate priority dynamically
         
         base_sql = f"""
         WITH health AS (
             SELECT item_id, ok, status_code, error_message, checked_url
-            FROM health_checks 
-            WHERE run_id = '{run_id}'
+            FROM health_checks_all 
+            WHERE run_id = '{health_run_id}'
         ),
         scores AS (
-            SELECT item_id, score
-            FROM quality_scores
+            SELECT item_id, score, missing_mask
+            FROM quality_scores_all
             WHERE run_id = '{run_id}'
         )
         SELECT 
@@ -58,11 +64,13 @@ def generate_remediation_pack(run_id=None, out_dir="reports"):
             i.tags_count,
             i.has_description,
             s.score as quality_score,
+            {missing_field_sql('tags')} as missing_tags,
+            {missing_field_sql('description')} as missing_description,
             h.ok as health_ok,
             h.status_code,
             h.error_message,
             h.checked_url
-        FROM items_current i
+        FROM items_active i
         LEFT JOIN scores s ON i.item_id = s.item_id
         LEFT JOIN health h ON i.item_id = h.item_id
         """
@@ -86,8 +94,8 @@ def generate_remediation_pack(run_id=None, out_dir="reports"):
         # 3. Generate Categories
         
         # A. Missing Tags
-        # Definition: tags_count is null or 0
-        mask_tags = (df_base['tags_count'].fillna(0) == 0)
+        # Definition: the 'tags' bit of the run's missing_mask, or tags_count null or 0 for unscored items
+        mask_tags = df_base['missing_tags'].astype(bool)
         df_tags = df_base[mask_tags].copy()
         if not df_tags.empty:
             df_tags['recommended_action'] = 'ADD_TAGS'
@@ -103,7 +111,7 @@ def generate_remediation_pack(run_id=None, out_dir="reports"):
         print(f" -> {path_tags} ({len(df_tags)} rows)")
 
         # B. Missing Description
-        mask_desc = (df_base['has_description'] == False)
+        mask_desc = df_base['missing_description'].astype(bool)
         df_desc = df_base[mask_desc].copy()
         if not df_desc.empty:
             df_desc['recommended_action'] = 'ADD_DESCRIPTION'
@@ -150,17 +158,21 @@ def generate_remediation_pack(run_id=None, out_dir="reports"):
         # We can aggregate from df_base using pandas or SQL. SQL is cleaner for "counts".
         owner_sql = f"""
         WITH health AS (
-            SELECT item_id, ok FROM health_checks WHERE run_id = '{run_id}'
+            SELECT item_id, ok FROM health_checks_all WHERE run_id = '{health_run_id}'
+        ),
+        scores AS (
+            SELECT item_id, missing_mask FROM quality_scores_all WHERE run_id = '{run_id}'
         )
         SELECT 
             i.owner,
             COUNT(*) as total_items,
-            COUNT(CASE WHEN COALESCE(i.tags_count,0)=0 THEN 1 END) as missing_tags_count,
-            COUNT(CASE WHEN i.has_description=False THEN 1 END) as missing_description_count,
+            COUNT(CASE WHEN {missing_field_sql('tags')} THEN 1 END) as missing_tags_count,
+            COUNT(CASE WHEN {missing_field_sql('description')} THEN 1 END) as missing_description_count,
             COUNT(CASE WHEN i.modified_at < (now() - INTERVAL '2 years') THEN 1 END) as stale_items_count,
             COUNT(CASE WHEN h.ok=False THEN 1 END) as broken_services_count
-        FROM items_current i
+        FROM items_active i
         LEFT JOIN health h ON i.item_id = h.item_id
+        LEFT JOIN scores s ON i.item_id = s.item_id
         GROUP BY i.owner
         ORDER BY broken_services_count DESC, missing_description_count DESC, missing_tags_count DESC
         """
@@ -5,6 +5,7 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from src.storage.duckdb_client import ensure_db_initialized, connect, list_tables
+from src.tools.scoring import backfill_quality_masks
 
 def main():
     print("Initializing DuckDB Local Warehouse...")
@@ -12,6 +13,15 @@ def main():
     try:
         db_path = ensure_db_initialized()
         print(f"[OK] DuckDB initialized at {db_path}")
+
+        # Rule dictionary, and score masks for rows stored before them
+        con = connect()
+        try:
+            backfilled = backfill_quality_masks(con)
+            if backfilled:
+                print(f"[OK] Filled in score masks for {backfilled} stored rows")
+        finally:
+            con.close()
         
         # Open connection to list tables
         con = connect(read_only=True)
@@ -0,0 +1,86 @@
+import argparse
+import logging
+import signal
+import sys
+import os
+
+# Ensure project root is in path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.storage.duckdb_client import ensure_db_initialized
+from src.services.portal_search import get_search_client
+from src.pipeline.scheduler import SnapshotScheduler, ScheduledJob, LEASE_RETRY_SECONDS
+from src.storage.retention import RETENTION_DAYS
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run snapshot jobs on cron schedules (long-running)",
+        epilog='Example: run_scheduler.py --full "0 2 * * 0" --incremental "*/30 * * * *" --health "*/5 * * * *"'
+    )
+    parser.add_argument("--full", type=str, default=None, metavar="CRON", help="Schedule for full snapshots (5-field cron or @hourly/@daily/@weekly)")
+    parser.add_argument("--incremental", type=str, default=None, metavar="CRON", help="Schedule for incremental snapshots")
+    parser.add_argument("--health", type=str, default=None, metavar="CRON", help="Schedule for health-only runs (re-probe warehouse URLs, no fetch)")
+    parser.add_argument("--health-only-failing", action="store_true", help="Health-only runs probe only items whose last check failed")
+    parser.add_argument("--retention", type=str, default=None, metavar="CRON", help="Schedule for moving old runs' scores and health checks to Parquet")
+    parser.add_argument("--retention-days", type=float, default=RETENTION_DAYS, help="Age (days) after which runs are archived")
+    parser.add_argument("--max-items", type=int, default=None, help="Max items to fetch per run (default: all)")
+    parser.add_argument("--query", type=str, default=None, help="ArcGIS search query")
+    parser.add_argument("--item-types", type=str, default=None, help="Comma-separated item types")
+    parser.add_argument("--no-health", action="store_true", help="Disable health checks in snapshot jobs")
+    parser.add_argument("--sweep-deletions", action="store_true", help="Tombstone items no longer returned by the portal (full jobs)")
+    parser.add_argument("--workers", type=int, default=1, help="Processes normalizing pages in parallel (1 = inline)")
+    parser.add_argument("--no-archive", action="store_true", help="Do not archive raw search results")
+    parser.add_argument("--lease-retry", type=float, default=LEASE_RETRY_SECONDS, help="Seconds before retrying a job while another writer holds the lease")
+    parser.add_argument("--arcgis-api", action="store_true", help="Search through the arcgis package instead of the lightweight REST client")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    options = {
+        'max_items': args.max_items,
+        'query': args.query,
+        'item_types': [t.strip() for t in args.item_types.split(",")] if args.item_types else None,
+        'enable_health': not args.no_health,
+        'workers': args.workers,
+        'archive_raw': not args.no_archive,
+    }
+    jobs = []
+    if args.full:
+        jobs.append(ScheduledJob('full', 'full', args.full, dict(options, sweep_deletions=args.sweep_deletions)))
+    if args.incremental:
+        jobs.append(ScheduledJob('incremental', 'incremental', args.incremental, options))
+    if args.health:
+        jobs.append(ScheduledJob('health', 'health', args.health, {'only_failing': args.health_only_failing}))
+    if args.retention:
+        jobs.append(ScheduledJob('retention', 'retention', args.retention, {'older_than_days': args.retention_days}))
+    if not jobs:
+        parser.error("give at least one of --full / --incremental / --health / --retention")
+
+    try:
+        ensure_db_initialized()
+
+        # One portal session for every job (the REST client refreshes its token itself);
+        # health-only jobs read their URLs from the warehouse and need none
+        gis = None
+        if args.full or args.incremental:
+            print("Connecting to ArcGIS...")
+            if args.arcgis_api:
+                from src.services.arcgis_client import get_gis
+                gis = get_gis()
+            else:
+                gis = get_search_client()
+            print(f"Connected to: {gis.url}")
+
+        scheduler = SnapshotScheduler(gis, jobs, lease_retry_seconds=args.lease_retry)
+    except Exception as e:
+        print(f"[ERROR] Scheduler failed to start: {e}")
+        sys.exit(1)
+
+    # Finish the job in progress, then exit
+    signal.signal(signal.SIGTERM, lambda signum, frame: scheduler.stop())
+    signal.signal(signal.SIGINT, lambda signum, frame: scheduler.stop())
+    scheduler.run_forever()
+    sys.exit(0)
+
+if __name__ == "__main__":
+    main()
@@ -6,17 +6,43 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from src.storage.duckdb_client import ensure_db_initialized, connect
-from src.services.arcgis_client import get_gis
-from src.pipeline.snapshot import run_snapshot
+from src.services.portal_search import get_search_client
+from src.pipeline.snapshot import run_snapshot, resume_snapshot, PARTITION_STRATEGIES
+from src.pipeline.leases import hold_lease
+from src.pipeline.health_refresh import run_health_refresh
+from src.pipeline.health import (
+    HEALTH_CONCURRENCY, HEALTH_PER_HOST_LIMIT, HEALTH_CACHE_TTL_MINUTES, HEALTH_BREAKER_THRESHOLD,
+    HEALTH_COVERAGE_WINDOW_HOURS
+)
 
 def main():
     parser = argparse.ArgumentParser(description="Run ArcGIS Snapshot Pipeline")
-    parser.add_argument("--max-items", type=int, default=50, help="Max items to fetch")
+    parser.add_argument("--max-items", type=int, default=None, help="Max items to fetch (default: 50, or all with --incremental)")
     parser.add_argument("--query", type=str, default=None, help="ArcGIS search query")
     parser.add_argument("--item-types", type=str, default=None, help="Comma-separated item types")
     parser.add_argument("--no-history", action="store_true", help="Disable SCD2 history")
     parser.add_argument("--no-scores", action="store_true", help="Disable quality scores")
     parser.add_argument("--no-health", action="store_true", help="Disable health checks")
+    parser.add_argument("--health-concurrency", type=int, default=HEALTH_CONCURRENCY, help="Max health probes in flight")
+    parser.add_argument("--health-per-host", type=int, default=HEALTH_PER_HOST_LIMIT, help="Max concurrent connections per host")
+    parser.add_argument("--health-ttl", type=float, default=HEALTH_CACHE_TTL_MINUTES, help="Minutes an OK health result is reused without re-probing (0 = always probe)")
+    parser.add_argument("--health-breaker", type=int, default=HEALTH_BREAKER_THRESHOLD, help="Consecutive connection failures before a host's remaining URLs are skipped")
+    parser.add_argument("--health-budget-probes", type=int, default=None, help="Max endpoints to probe this run (highest risk first)")
+    parser.add_argument("--health-budget-seconds", type=float, default=None, help="Stop starting new probes after this many seconds")
+    parser.add_argument("--health-coverage-hours", type=float, default=HEALTH_COVERAGE_WINDOW_HOURS, help="Every endpoint is probed at least once per this window (given enough budget)")
+    parser.add_argument("--incremental", action="store_true", help="Only fetch items modified since the last run's watermark")
+    parser.add_argument("--sweep-deletions", action="store_true", help="Tombstone items no longer returned by the portal")
+    parser.add_argument("--partition-by", choices=PARTITION_STRATEGIES, default=None, help="Harvest disjoint partitions in parallel")
+    parser.add_argument("--partition-owners", type=str, default=None, help="Comma-separated owners (for --partition-by owner)")
+    parser.add_argument("--partitions", type=int, default=4, help="Number of date ranges (for --partition-by modified)")
+    parser.add_argument("--harvest-workers", type=int, default=4, help="Concurrent partition fetches")
+    parser.add_argument("--workers", type=int, default=1, help="Processes normalizing pages in parallel (1 = inline)")
+    parser.add_argument("--arcgis-api", action="store_true", help="Search through the arcgis package instead of the lightweight REST client")
+    parser.add_argument("--no-archive", action="store_true", help="Do not archive the raw search results of this run")
+    parser.add_argument("--replay", type=str, default=None, metavar="RUN_ID", help="Rebuild items, history and scores from a run's raw archive (offline)")
+    parser.add_argument("--health-only", action="store_true", help="Only re-probe the URLs of items already in the warehouse (no fetch, items and scores untouched)")
+    parser.add_argument("--only-failing", action="store_true", help="With --health-only: probe only items whose last health check failed")
+    parser.add_argument("--resume", type=str, default=None, metavar="RUN_ID", help="Continue an unfinished run from its last checkpoint (uses the run's original options)")
     
     args = parser.parse_args()
     
@@ -24,31 +50,98 @@ def main():
         # 1. Init DB
         ensure_db_initialized()
         
+        # 1b. Replay: no portal connection needed
+        if args.replay:
+            con = connect()
+            print(f"Replaying raw archive of run {args.replay}...")
+            with hold_lease(con, 'replay'):
+                run_snapshot(
+                    con,
+                    None,
+                    max_items=None,
+                    enable_history=not args.no_history,
+                    enable_scores=not args.no_scores,
+                    enable_health=False,
+                    workers=args.workers,
+                    replay_run_id=args.replay
+                )
+            con.close()
+            print("[OK] Replay complete")
+            sys.exit(0)
+
+        # 1c. Health-only refresh: URLs come from the warehouse
+        if args.health_only:
+            con = connect()
+            print(f"Re-probing {'failing' if args.only_failing else 'all'} item URLs...")
+            with hold_lease(con, 'health'):
+                summary = run_health_refresh(
+                    con,
+                    only_failing=args.only_failing,
+                    health_concurrency=args.health_concurrency,
+                    health_per_host=args.health_per_host,
+                    health_breaker_threshold=args.health_breaker
+                )
+            con.close()
+            print(f"[OK] Health run {summary['run_id']}: {summary['probed']} probed, {summary['ok']} OK, "
+                  f"{summary['failed']} failing ({summary['fixed']} fixed, {summary['broken']} newly broken)")
+            sys.exit(0)
+
         # 2. Connect GIS
         print("Connecting to ArcGIS...")
-        gis = get_gis()
+        if args.arcgis_api:
+            from src.services.arcgis_client import get_gis
+            gis = get_gis()
+        else:
+            gis = get_search_client()
         print(f"Connected to: {gis.url}")
         
         # 3. Parse types
         item_types_list = [t.strip() for t in args.item_types.split(",")] if args.item_types else None
+        owners_list = [o.strip() for o in args.partition_owners.split(",")] if args.partition_owners else None
         
         # 4. Run Pipeline
-        print(f"Starting snapshot (max_items={args.max_items})...")
         con = connect()
-        
-        run_snapshot(
-            con, 
-            gis, 
-            max_items=args.max_items,
-            query=args.query,
-            item_types=item_types_list,
-            enable_history=not args.no_history,
-            enable_scores=not args.no_scores,
-            enable_health=not args.no_health
-        )
+
+        if args.resume:
+            print(f"Resuming snapshot run {args.resume}...")
+            with hold_lease(con, 'resume'):
+                run_id = resume_snapshot(con, gis, args.resume)
+            con.close()
+            print(f"[OK] Snapshot run {run_id} complete")
+            sys.exit(0)
+
+        # A capped incremental run never advances its watermark: fetch everything unless asked otherwise
+        max_items = args.max_items if args.max_items is not None else (None if args.incremental else 50)
+        print(f"Starting snapshot (max_items={max_items})...")
+        with hold_lease(con, 'incremental' if args.incremental else 'full'):
+            run_id = run_snapshot(
+                con, 
+                gis, 
+                max_items=max_items,
+                query=args.query,
+                item_types=item_types_list,
+                enable_history=not args.no_history,
+                enable_scores=not args.no_scores,
+                enable_health=not args.no_health,
+                partition_by=args.partition_by,
+                partition_owners=owners_list,
+                num_partitions=args.partitions,
+                harvest_workers=args.harvest_workers,
+                incremental=args.incremental,
+                sweep_deletions=args.sweep_deletions,
+                health_concurrency=args.health_concurrency,
+                health_per_host=args.health_per_host,
+                health_cache_ttl_minutes=args.health_ttl,
+                health_breaker_threshold=args.health_breaker,
+                health_probe_budget=args.health_budget_probes,
+                health_time_budget_seconds=args.health_budget_seconds,
+                health_coverage_window_hours=args.health_coverage_hours,
+                workers=args.workers,
+                archive_raw=not args.no_archive
+            )
         
         con.close()
-        print("[OK] Snapshot complete")
+        print(f"[OK] Snapshot run {run_id} complete")
         sys.exit(0)
         
     except Exception as e:
@@ -0,0 +1,64 @@
+import sys
+
+from _fake_portal import FakeGIS, make_items, snapshot, check
+from src.storage.duckdb_client import ensure_db_initialized, connect
+from src.pipeline.snapshot import sweep_deleted_items
+
+ITEM_COUNT = 10
+
+def _tombstoned(con):
+    return {r[0] for r in con.sql("SELECT item_id FROM items_current WHERE is_deleted").fetchall()}
+
+def _events(con, run_id, change_type):
+    return {r[0] for r in con.execute(
+        "SELECT item_id FROM item_changes WHERE run_id = ? AND change_type = ?", (run_id, change_type)
+    ).fetchall()}
+
+def verify_sweep():
+    ensure_db_initialized()
+    con = connect()
+    items = make_items(ITEM_COUNT)
+    removed = {i['id'] for i in items[-2:]}
+    snapshot(con, FakeGIS(items))
+
+    # One page lost: fewer ids than the portal reports, so nothing is tombstoned
+    deleted = sweep_deleted_items(con, FakeGIS(items[:-2], reported=ITEM_COUNT))
+    ok = check(f"partial enumeration skipped ({deleted} tombstoned)", deleted == 0 and not _tombstoned(con))
+
+    # A capped fetch did not see every item: the sweep enumerates ids itself
+    gis = FakeGIS(items)
+    snapshot(con, gis, max_items=5, sweep_deletions=True)
+    ok &= check(f"capped run enumerates ids separately ({gis.content.page_requests} page requests)",
+                gis.content.page_requests == 2 and not _tombstoned(con))
+
+    # A full fetch saw every live item: the sweep reuses its ids
+    gis = FakeGIS(items[:-2])
+    sweep_run = snapshot(con, gis, sweep_deletions=True)
+    ok &= check(f"full run reuses the fetched ids ({gis.content.page_requests} page request)",
+                gis.content.page_requests == 1)
+    ok &= check("missing items tombstoned", _tombstoned(con) == removed)
+    open_versions = con.sql(f"""
+        SELECT COUNT(*) FROM items_history
+        WHERE is_current AND item_id IN ({', '.join(f"'{i}'" for i in removed)})
+    """).fetchone()[0]
+    ok &= check("their history versions closed", open_versions == 0)
+    ok &= check("'deleted' events logged", _events(con, sweep_run, 'deleted') == removed)
+    ok &= check("repeat sweep tombstones nothing new", sweep_deleted_items(con, FakeGIS(items[:-2])) == 0)
+
+    # The items come back
+    restore_run = snapshot(con, FakeGIS(items))
+    ok &= check("reappearing items un-tombstoned", not _tombstoned(con))
+    ok &= check("'restored' events logged", _events(con, restore_run, 'restored') == removed)
+    ok &= check("no 'new' events for restored items", not (_events(con, restore_run, 'new') & removed))
+    con.close()
+    return ok
+
+if __name__ == "__main__":
+    try:
+        print("Deletion sweep:")
+        passed = verify_sweep()
+    except Exception as e:
+        print(f"[FAIL] Verification failed: {e}")
+        sys.exit(1)
+    print("\n[OK] Deletion sweep verification passed." if passed else "\n[FAIL] Deletion sweep verification failed.")
+    sys.exit(0 if passed else 1)
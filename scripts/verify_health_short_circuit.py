@@ -0,0 +1,172 @@
+import sys
+import os
+import socket
+import threading
+import uuid
+import duckdb
+from collections import Counter
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.storage.duckdb_client import init_db
+from src.pipeline import health
+from src.pipeline.health import run_health_checks, StreamingHealthChecker
+
+BREAKER_THRESHOLD = 3
+
+# host -> (number of service endpoints, items per endpoint)
+HOSTS = {
+    'live.example.com': (3, 1),
+    'dead.example.com': (6, 1), # refuses connections: its circuit opens
+    'busy.example.com': (4, 1), # answers HTTP 500: never trips the breaker
+    'nx.example.invalid': (3, 2), # NXDOMAIN: never probed
+}
+
+class FakeNetwork:
+    """Stands in for DNS (socket.getaddrinfo) and the HTTP probe (check_url_health)."""
+
+    def __init__(self):
+        self.lookups = Counter()
+        self.probes = Counter()
+
+    def getaddrinfo(self, host, *args, **kwargs):
+        self.lookups[host] += 1
+        if host.endswith('.invalid'):
+            raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, '', ('192.0.2.1', 443))]
+
+    async def check_url_health(self, session, url, timeout=None, headers=None):
+        host = url.split('/')[2]
+        self.probes[host] += 1
+        if host == 'dead.example.com':
+            return {'ok': False, 'status_code': None, 'latency_ms': None,
+                    'error_message': "Cannot connect to host dead.example.com:443"}
+        status = 500 if host == 'busy.example.com' else 200
+        return {'ok': status < 400, 'status_code': status, 'latency_ms': 5,
+                'error_message': None if status < 400 else f"HTTP {status}"}
+
+def _items():
+    items = []
+    for host, (endpoints, per_endpoint) in HOSTS.items():
+        for e in range(endpoints):
+            for k in range(per_endpoint):
+                # Layers of one service share its endpoint
+                items.append({'item_id': f"{host}-{e}-{k}",
+                              'url': f"https://{host}/arcgis/rest/services/S{e}/MapServer/{k}"})
+    return items
+
+def _check(label, ok):
+    print(f"[{'OK' if ok else 'FAIL'}] {label}")
+    return ok
+
+def _verify_rows(label, rows, network):
+    by_host = {host: [r for r in rows if r['item_id'].startswith(host)] for host in HOSTS}
+    ok = _check(f"{label}: one row per item ({len(rows)})",
+                len(rows) == sum(n * k for n, k in HOSTS.values()))
+
+    ok &= _check(f"{label}: each hostname resolved once ({dict(network.lookups)})",
+                 all(network.lookups[host] == 1 for host in HOSTS))
+
+    nx = by_host['nx.example.invalid']
+    endpoints = Counter(r['endpoint_url'] for r in nx)
+    ok &= _check(f"{label}: NXDOMAIN host probed {network.probes['nx.example.invalid']} times",
+                 network.probes['nx.example.invalid'] == 0)
+    ok &= _check(f"{label}: NXDOMAIN recorded once per endpoint ({len(endpoints)} endpoints, "
+                 f"{HOSTS['nx.example.invalid'][1]} items each)",
+                 len(endpoints) == HOSTS['nx.example.invalid'][0]
+                 and set(endpoints.values()) == {HOSTS['nx.example.invalid'][1]}
+                 and all('DNS resolution failed' in r['error_message'] for r in nx))
+
+    dead = by_host['dead.example.com']
+    circuit_open = [r for r in dead if r['error_message'].startswith('circuit_open')]
+    ok &= _check(f"{label}: breaker opens after {network.probes['dead.example.com']} connection failures",
+                 network.probes['dead.example.com'] == BREAKER_THRESHOLD)
+    ok &= _check(f"{label}: later endpoints on the host get circuit_open without a probe ({len(circuit_open)})",
+                 len(circuit_open) == HOSTS['dead.example.com'][0] - BREAKER_THRESHOLD
+                 and all(not r['ok'] for r in dead))
+
+    ok &= _check(f"{label}: HTTP errors do not trip the breaker ({network.probes['busy.example.com']} probes)",
+                 network.probes['busy.example.com'] == HOSTS['busy.example.com'][0]
+                 and all(r['status_code'] == 500 for r in by_host['busy.example.com']))
+    ok &= _check(f"{label}: live host unaffected", all(r['ok'] for r in by_host['live.example.com']))
+    return ok
+
+def _with_fake_network(run):
+    network = FakeNetwork()
+    real_getaddrinfo, real_check = socket.getaddrinfo, health.check_url_health
+    socket.getaddrinfo, health.check_url_health = network.getaddrinfo, network.check_url_health
+    try:
+        return run(), network
+    finally:
+        socket.getaddrinfo, health.check_url_health = real_getaddrinfo, real_check
+
+def verify_batch_checks():
+    # One probe at a time, so the breaker trips at exactly the threshold
+    rows, network = _with_fake_network(lambda: run_health_checks(
+        _items(), uuid.uuid4(), max_concurrency=1, per_host_limit=1, breaker_threshold=BREAKER_THRESHOLD
+    ))
+    return _verify_rows("run_health_checks", rows, network)
+
+def verify_streaming_checks():
+    con = duckdb.connect(":memory:")
+    init_db(con)
+
+    def run():
+        checker = StreamingHealthChecker(con, uuid.uuid4(), max_concurrency=1, per_host_limit=1,
+                                         breaker_threshold=BREAKER_THRESHOLD)
+        try:
+            items = _items()
+            rows = []
+            for i in range(0, len(items), 5): # pages of items, as the fetch loads them
+                rows += checker.add(items[i:i + 5]) + checker.collect()
+            return rows + checker.close()
+        finally:
+            checker.abort()
+
+    rows, network = _with_fake_network(run)
+    con.close()
+    return _verify_rows("StreamingHealthChecker", rows, network)
+
+def verify_prober_failure():
+    """The prober thread dies before probing anything: add() must raise, not block on a probe slot."""
+    con = duckdb.connect(":memory:")
+    init_db(con)
+    outcome = {}
+
+    def broken_connector(*args, **kwargs):
+        raise OSError("no sockets left")
+
+    def run():
+        checker = StreamingHealthChecker(con, uuid.uuid4(), max_concurrency=1, max_pending=1)
+        try:
+            for item in _items():
+                checker.add([item])
+            outcome['error'] = None
+        except RuntimeError as e:
+            outcome['error'] = e
+
+    real_connector = health.aiohttp.TCPConnector
+    health.aiohttp.TCPConnector = broken_connector
+    try:
+        adder = threading.Thread(target=run, daemon=True)
+        adder.start()
+        adder.join(timeout=10)
+    finally:
+        health.aiohttp.TCPConnector = real_connector
+    con.close()
+    return _check(f"add() raises once the prober is dead ({outcome.get('error', 'still blocked')})",
+                  not adder.is_alive() and isinstance(outcome.get('error'), RuntimeError))
+
+if __name__ == "__main__":
+    try:
+        print("Batch health checks:")
+        passed = verify_batch_checks()
+        print("\nStreaming health checks:")
+        passed &= verify_streaming_checks()
+        print("\nProber failure:")
+        passed &= verify_prober_failure()
+    except Exception as e:
+        print(f"[FAIL] Verification failed: {e}")
+        sys.exit(1)
+    print("\n[OK] Health short-circuit verification passed." if passed else "\n[FAIL] Health short-circuit verification failed.")
+    sys.exit(0 if passed else 1)
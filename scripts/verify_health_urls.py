@@ -0,0 +1,87 @@
+import sys
+import os
+import uuid
+from datetime import datetime, timezone
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.pipeline.health import canonicalize_url, plan_health_checks, _fan_out
+
+SERVICES = "https://gis.example.com/arcgis/rest/services"
+
+# (item URL, endpoint it is probed at)
+CANONICAL_CASES = [
+    # Scheme and host case, surrounding whitespace
+    ("HTTPS://GIS.Example.COM/arcgis/rest/services/Roads/MapServer", f"{SERVICES}/Roads/MapServer"),
+    ("  https://gis.example.com/data  ", "https://gis.example.com/data"),
+    # Default ports dropped, others kept
+    ("https://gis.example.com:443/data", "https://gis.example.com/data"),
+    ("http://gis.example.com:80/data", "http://gis.example.com/data"),
+    ("https://gis.example.com:8443/data", "https://gis.example.com:8443/data"),
+    ("http://gis.example.com:443/data", "http://gis.example.com:443/data"),
+    # Trailing slashes
+    ("https://gis.example.com/data/", "https://gis.example.com/data"),
+    (f"{SERVICES}/Roads/MapServer/", f"{SERVICES}/Roads/MapServer"),
+    # Layer URLs collapse to the service root
+    (f"{SERVICES}/Parcels/FeatureServer/0", f"{SERVICES}/Parcels/FeatureServer"),
+    (f"{SERVICES}/Parcels/FeatureServer/12/", f"{SERVICES}/Parcels/FeatureServer"),
+    (f"{SERVICES}/Imagery/ImageServer/3", f"{SERVICES}/Imagery/ImageServer"),
+    (f"{SERVICES}/Parcels/featureserver/1", f"{SERVICES}/Parcels/featureserver"),
+    # ... but not operations or non-numeric sub-paths
+    (f"{SERVICES}/Parcels/FeatureServer/0/query", f"{SERVICES}/Parcels/FeatureServer/0/query"),
+    (f"{SERVICES}/Parcels/FeatureServer/layers", f"{SERVICES}/Parcels/FeatureServer/layers"),
+    # Path case is significant and kept
+    ("https://gis.example.com/ArcGIS/rest/services/Roads/MapServer",
+     "https://gis.example.com/ArcGIS/rest/services/Roads/MapServer"),
+    # Query parameters sorted (blank values kept), fragments dropped
+    ("https://gis.example.com/data?f=json&a=1", "https://gis.example.com/data?a=1&f=json"),
+    ("https://gis.example.com/data?token=&f=pjson", "https://gis.example.com/data?f=pjson&token="),
+    ("https://gis.example.com/data#section", "https://gis.example.com/data"),
+]
+
+def _check(label, ok):
+    print(f"[{'OK' if ok else 'FAIL'}] {label}")
+    return ok
+
+def verify_canonicalization():
+    ok = True
+    for url, expected in CANONICAL_CASES:
+        actual = canonicalize_url(url)
+        ok &= _check(f"{url.strip()} -> {actual}" + ("" if actual == expected else f" (expected {expected})"),
+                     actual == expected)
+    return ok
+
+def verify_plan_and_rows():
+    items = [
+        {'item_id': 'layer0', 'url': f"{SERVICES}/Parcels/FeatureServer/0"},
+        {'item_id': 'layer1', 'url': f"{SERVICES.replace('https://gis', 'https://GIS')}/Parcels/FeatureServer/1/"},
+        {'item_id': 'roads', 'url': f"{SERVICES}/Roads/MapServer"},
+        {'item_id': 'no_url', 'url': None},
+    ]
+    plan = plan_health_checks(items)
+    expected = {f"{SERVICES}/Parcels/FeatureServer": ['layer0', 'layer1'], f"{SERVICES}/Roads/MapServer": ['roads']}
+    ok = _check(f"plan groups layers of one service: {plan}", plan == expected)
+
+    probe = {'ok': True, 'status_code': 200, 'latency_ms': 12, 'error_message': None,
+             'checked_at': datetime.now(timezone.utc)}
+    rows = _fan_out(plan, {f"{SERVICES}/Parcels/FeatureServer": probe}, uuid.uuid4(),
+                    {item['item_id']: item['url'] for item in items if item['url']})
+    by_item = {row['item_id']: row for row in rows}
+    ok &= _check("one probe recorded for both layers", sorted(by_item) == ['layer0', 'layer1'])
+    ok &= _check("checked_url keeps each item's URL",
+                 all(by_item[i['item_id']]['checked_url'] == i['url'] for i in items[:2]))
+    ok &= _check("endpoint_url is the probed service root",
+                 all(row['endpoint_url'] == f"{SERVICES}/Parcels/FeatureServer" for row in rows))
+    return ok
+
+if __name__ == "__main__":
+    try:
+        print("Canonical endpoints:")
+        passed = verify_canonicalization()
+        print("\nGrouping and health rows:")
+        passed &= verify_plan_and_rows()
+    except Exception as e:
+        print(f"[FAIL] Verification failed: {e}")
+        sys.exit(1)
+    print("\n[OK] Health URL verification passed." if passed else "\n[FAIL] Health URL verification failed.")
+    sys.exit(0 if passed else 1)
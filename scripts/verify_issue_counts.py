@@ -0,0 +1,102 @@
+import sys
+import os
+
+from _fake_portal import TMP_DIR, FakeGIS, make_items, snapshot, check
+from src.storage.duckdb_client import ensure_db_initialized, connect
+from src.services.catalog_store import admin_queries
+from scripts.generate_catalog_report import generate_report_logic
+from scripts.generate_remediation_pack import generate_remediation_pack
+
+# Fewer than admin_queries' LIMIT 50, so its lists are complete
+ITEM_COUNT = 40
+
+# Missing-metadata predicates on the item columns (the reports' definitions before score masks)
+LEGACY_ISSUES = {
+    'missing_tags': "COALESCE(tags_count,0)=0",
+    'missing_description': "COALESCE(has_description,false)=false",
+    'missing_extent': "COALESCE(has_extent,false)=false",
+}
+
+def _legacy_counts(con):
+    counts = {name: con.sql(f"SELECT COUNT(*) FROM items_active WHERE {pred}").fetchone()[0]
+              for name, pred in LEGACY_ISSUES.items()}
+    owners = con.sql(f"""
+        SELECT owner, COUNT(CASE WHEN {LEGACY_ISSUES['missing_tags']} THEN 1 END),
+               COUNT(CASE WHEN {LEGACY_ISSUES['missing_description']} THEN 1 END)
+        FROM items_active GROUP BY owner ORDER BY owner
+    """).fetchall()
+    return counts, owners
+
+def _expect(label, expected, actual):
+    if expected != actual:
+        return check(f"{label}: expected {expected}, got {actual}", False)
+    return check(f"{label}: {actual}", True)
+
+def _check_run(run_id, label):
+    con = connect(read_only=True)
+    expected, expected_owners = _legacy_counts(con)
+    scored = con.execute("SELECT COUNT(*) FROM quality_scores WHERE run_id = ?", (run_id,)).fetchone()[0]
+    con.close()
+    print(f"\n[{label}] run {run_id}, {scored} score rows")
+    ok = True
+
+    # App issue lists and owner summary
+    results = admin_queries(run_id)
+    for name in LEGACY_ISSUES:
+        ok &= _expect(f"admin {name}", expected[name], len(results[name]))
+    owners = sorted((r.owner, r.missing_tags, r.missing_desc) for r in results['owner_summary'].itertuples())
+    ok &= _expect("admin owner_summary", expected_owners, owners)
+
+    # Catalog report CSVs
+    out_dir = os.path.join(TMP_DIR, f"report_{label.replace(' ', '_')}")
+    con = connect(read_only=True)
+    report = generate_report_logic(con, run_id, out_dir)
+    con.close()
+    for name in LEGACY_ISSUES:
+        path = next(p for p in report['csv_paths'] if p.endswith(f"_{name}.csv"))
+        ok &= _expect(f"report {name}", expected[name], _csv_rows(path))
+
+    # Remediation pack CSVs
+    out_dir = os.path.join(TMP_DIR, f"remediation_{label.replace(' ', '_')}")
+    generate_remediation_pack(run_id, out_dir)
+    for name in ('missing_tags', 'missing_description'):
+        path = next(os.path.join(out_dir, f) for f in os.listdir(out_dir) if f.endswith(f"_{name}.csv"))
+        ok &= _expect(f"remediation {name}", expected[name], _csv_rows(path))
+    return ok
+
+def _snapshot(items, **kwargs):
+    con = connect()
+    run_id = snapshot(con, FakeGIS(items), **kwargs)
+    con.close()
+    return run_id
+
+def _csv_rows(path):
+    with open(path, encoding="utf-8") as f:
+        return max(sum(1 for _ in f) - 1, 0)
+
+def verify_issue_counts():
+    ensure_db_initialized()
+    items = make_items(ITEM_COUNT)
+    ok = True
+
+    scored_run = _snapshot(items)
+    ok &= _check_run(scored_run, "with scores")
+
+    unscored_run = _snapshot(items, enable_scores=False)
+    ok &= _check_run(unscored_run, "no scores")
+
+    # Scores archived (or otherwise gone) after the run
+    con = connect()
+    con.execute("DELETE FROM quality_scores WHERE run_id = ?", (scored_run,))
+    con.close()
+    ok &= _check_run(scored_run, "scores removed")
+    return ok
+
+if __name__ == "__main__":
+    try:
+        passed = verify_issue_counts()
+    except Exception as e:
+        print(f"[FAIL] Verification failed: {e}")
+        sys.exit(1)
+    print("\n[OK] Issue counts match with and without scores." if passed else "\n[FAIL] Issue counts differ.")
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,155 @@
+import sys
+import os
+import time
+import requests
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.services import request_governor
+from src.services.request_governor import RequestGovernor, ThrottledError, get_governor
+
+class FakeClock:
+    """Stands in for the governor's `time` module: sleeps advance the clock instantly."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return time.time()
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+class FakeTransport:
+    """A callable that raises the queued errors in order, then returns 'ok'."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return 'ok'
+
+def _http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(f"HTTP {status}", response=response)
+
+def _check(label, ok):
+    print(f"[{'OK' if ok else 'FAIL'}] {label}")
+    return ok
+
+def verify_limit_adapts(clock):
+    ok = True
+    for label, error in [("429", ThrottledError("429", status_code=429)),
+                         ("503", ThrottledError("503", status_code=503)),
+                         ("HTTPError 502", _http_error(502)),
+                         ("timeout", requests.Timeout("read timed out"))]:
+        governor = RequestGovernor(f"limit-{label}", initial_limit=8, max_limit=16)
+        clock.now += 10
+        governor.call(FakeTransport(error))
+        ok &= _check(f"{label}: limit halved 8 -> {int(governor.limit)}", int(governor.limit) == 4)
+
+    governor = RequestGovernor("burst", initial_limit=8, decrease_interval=1.0)
+    clock.now += 10
+    for _ in range(3):
+        governor.acquire()
+        governor.release(throttled=True)
+    ok &= _check(f"burst within one interval halves once: {int(governor.limit)}", int(governor.limit) == 4)
+    clock.now += 1.0
+    governor.acquire()
+    governor.release(throttled=True)
+    ok &= _check(f"next interval halves again: {int(governor.limit)}", int(governor.limit) == 2)
+    for _ in range(4):
+        clock.now += 1.0
+        governor.acquire()
+        governor.release(throttled=True)
+    ok &= _check(f"limit never below min_limit: {int(governor.limit)}", int(governor.limit) == 1)
+
+    for _ in range(20):
+        governor.acquire()
+        governor.release()
+    ok &= _check(f"successes raise the limit again: {governor.limit:.2f}", governor.limit > 2)
+
+    failing = FakeTransport(ValueError("bad request"))
+    governor = RequestGovernor("non-retryable", initial_limit=8)
+    try:
+        governor.call(failing)
+        ok &= _check("non-retryable error raised", False)
+    except ValueError:
+        ok &= _check("non-retryable error raised at once, limit kept",
+                     failing.calls == 1 and int(governor.limit) == 8 and governor.retries == 0)
+    return ok
+
+def verify_retry_after_shared(clock):
+    clock.sleeps.clear()
+    clock.now += 100
+    # Two URLs on one host share one governor, and so its pause
+    first, second = get_governor("https://verify-pause.example.com/a"), get_governor("https://verify-pause.example.com/b")
+    ok = _check("same host, same governor", first is second)
+
+    first.acquire()
+    first.release(throttled=True, retry_after=30)
+    wait = second._try_acquire()
+    ok &= _check(f"Retry-After pauses other callers on the host ({wait:.0f}s left)", wait == 30)
+    ok &= _check("other hosts are not paused", get_governor("https://verify-other.example.com")._try_acquire() == 0)
+    get_governor("https://verify-other.example.com").release()
+    clock.now += 30
+    ok &= _check("pause over after Retry-After", second._try_acquire() == 0)
+    second.release()
+
+    clock.sleeps.clear()
+    result = first.call(FakeTransport(ThrottledError("429", status_code=429, retry_after=7)))
+    ok &= _check(f"retry waits the Retry-After delay: {clock.sleeps}", result == 'ok' and clock.sleeps == [7])
+    clock.sleeps.clear()
+    first.call(FakeTransport(ThrottledError("429", status_code=429, retry_after=600)))
+    ok &= _check(f"Retry-After capped at max_delay: {clock.sleeps}", clock.sleeps == [request_governor.GOVERNOR_MAX_DELAY_SECONDS])
+    return ok
+
+def verify_retry_limit(clock):
+    clock.sleeps.clear()
+    governor = RequestGovernor("retry-limit", base_delay=0.5, max_delay=60)
+    attempts = request_governor.GOVERNOR_MAX_RETRIES + 1
+    transport = FakeTransport(*[ThrottledError("503", status_code=503) for _ in range(attempts + 3)])
+    try:
+        governor.call(transport)
+        ok = _check("gives up after max retries", False)
+    except ThrottledError:
+        ok = _check(f"gives up after {transport.calls} tries ({governor.retries} retries)",
+                    transport.calls == attempts and governor.retries == attempts - 1)
+    caps = [0.5 * 2 ** n for n in range(attempts - 1)]
+    ok &= _check(f"backoff is full-jitter exponential: {[round(s, 2) for s in clock.sleeps]}",
+                 len(clock.sleeps) == len(caps) and all(0 <= s <= cap for s, cap in zip(clock.sleeps, caps)))
+
+    clock.sleeps.clear()
+    recovering = FakeTransport(ThrottledError("429", status_code=429), _http_error(500))
+    result = RequestGovernor("recovers").call(recovering)
+    ok &= _check("succeeds once the server recovers", result == 'ok' and recovering.calls == 3)
+    return ok
+
+if __name__ == "__main__":
+    clock = FakeClock()
+    real_time = request_governor.time
+    request_governor.time = clock
+    try:
+        print("Concurrency limit:")
+        passed = verify_limit_adapts(clock)
+        print("\nRetry-After:")
+        passed &= verify_retry_after_shared(clock)
+        print("\nRetries:")
+        passed &= verify_retry_limit(clock)
+    except Exception as e:
+        print(f"[FAIL] Verification failed: {e}")
+        sys.exit(1)
+    finally:
+        request_governor.time = real_time
+    print("\n[OK] Request governor verification passed." if passed else "\n[FAIL] Request governor verification failed.")
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,229 @@
+import sys
+import os
+import socket
+import subprocess
+import time
+import duckdb
+from datetime import datetime
+
+from _fake_portal import TMP_DIR, FakeGIS, make_items, snapshot
+from src.storage.duckdb_client import init_db
+from src.pipeline.scheduler import CronSchedule, SnapshotScheduler, ScheduledJob
+from src.pipeline.leases import acquire_lease, hold_lease, renew_lease_if_due, LeaseHeldError
+from src.pipeline.snapshot import sweep_deleted_items
+
+# (expression, after, expected next fire time)
+CRON_CASES = [
+    # Ranges and steps within hours and weekdays: Friday evening -> Monday morning
+    ("*/15 9-17 * * 1-5", datetime(2026, 10, 16, 17, 50), datetime(2026, 10, 19, 9, 0)),
+    ("*/15 9-17 * * 1-5", datetime(2026, 10, 19, 9, 0), datetime(2026, 10, 19, 9, 15)),
+    ("5-20/5 * * * *", datetime(2026, 10, 17, 10, 20), datetime(2026, 10, 17, 11, 5)),
+    ("0 0 1 */3 *", datetime(2026, 10, 17, 0, 0), datetime(2027, 1, 1, 0, 0)),
+    ("30 8 * * *", datetime(2026, 10, 17, 8, 30, 59), datetime(2026, 10, 18, 8, 30)),
+    # Both day fields restricted: the 13th OR any Friday
+    ("0 0 13 * 5", datetime(2026, 10, 13, 0, 0), datetime(2026, 10, 16, 0, 0)),
+    ("0 0 13 * 5", datetime(2026, 11, 6, 0, 0), datetime(2026, 11, 13, 0, 0)),
+    # A '*/N' day field counts as unrestricted: odd days AND Mondays, not OR
+    ("0 3 */2 * 1", datetime(2026, 10, 17, 0, 0), datetime(2026, 10, 19, 3, 0)),
+    ("0 3 */2 * 1", datetime(2026, 10, 19, 3, 0), datetime(2026, 11, 9, 3, 0)),
+    ("0 3 1 * */2", datetime(2026, 10, 17, 0, 0), datetime(2026, 11, 1, 3, 0)),
+    # Only one restricted: it alone decides
+    ("0 0 13 * *", datetime(2026, 10, 13, 0, 0), datetime(2026, 11, 13, 0, 0)),
+    ("0 0 * * 0", datetime(2026, 10, 17, 12, 0), datetime(2026, 10, 18, 0, 0)),
+    ("0 12 * * 7", datetime(2026, 10, 17, 13, 0), datetime(2026, 10, 18, 12, 0)),
+    # Aliases
+    ("@monthly", datetime(2026, 12, 15, 6, 0), datetime(2027, 1, 1, 0, 0)),
+    ("@hourly", datetime(2026, 10, 17, 23, 59), datetime(2026, 10, 18, 0, 0)),
+    ("@weekly", datetime(2026, 10, 17, 0, 0), datetime(2026, 10, 18, 0, 0)),
+]
+
+# Expressions that must be rejected
+INVALID_CRON = ["61 * * * *", "* * *", "*/0 * * * *", "0 0 30 2 *"]
+
+# Failed runs: the portal fails on this page of the first two attempts
+FAILING_PAGE = 3
+
+# Lease renewal: a job of SLOW_PAGES pages outlasts the TTL several times over
+SHORT_TTL_SECONDS = 0.6
+SLOW_PAGE_SECONDS = 0.3
+SLOW_PAGES = 6
+
+def _check(label, ok):
+    print(f"[{'OK' if ok else 'FAIL'}] {label}")
+    return ok
+
+def verify_cron():
+    ok = True
+    for expression, after, expected in CRON_CASES:
+        actual = CronSchedule(expression).next_after(after)
+        ok &= _check(f"'{expression}' after {after} -> {actual} (expected {expected})", actual == expected)
+    for expression in INVALID_CRON:
+        try:
+            CronSchedule(expression).next_after(datetime(2026, 1, 1))
+            ok &= _check(f"'{expression}' rejected", False)
+        except ValueError as e:
+            ok &= _check(f"'{expression}' rejected ({e})", True)
+    return ok
+
+def verify_coalescing():
+    scheduler = SnapshotScheduler(None, [
+        ScheduledJob('full', 'full', '@daily'),
+        ScheduledJob('incremental', 'incremental', '*/5 * * * *'),
+    ])
+    scheduler.enqueue('incremental')
+    scheduler.enqueue('incremental')
+    ok = _check("repeated trigger coalesced", scheduler.pending == ['incremental'])
+    scheduler.enqueue('full')
+    ok &= _check("pending full drops pending incremental", scheduler.pending == ['full'])
+    scheduler.enqueue('incremental')
+    ok &= _check("incremental skipped behind pending full", scheduler.pending == ['full'])
+    return ok
+
+def _dead_holder() -> str:
+    """A holder id naming a process on this host that has exited."""
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return f"{socket.gethostname()}:{proc.pid}"
+
+def _holder(con):
+    row = con.execute("SELECT holder FROM run_leases WHERE lease_name = 'verify'").fetchone()
+    return row[0] if row else None
+
+def verify_leases():
+    con = duckdb.connect(":memory:")
+    init_db(con)
+    ok = True
+
+    acquired, _ = acquire_lease(con, 'full', 'verify', ttl_seconds=300, holder='other-host:1')
+    ok &= _check("first holder acquires", acquired)
+    acquired, current = acquire_lease(con, 'incremental', 'verify', ttl_seconds=300, holder='other-host:2')
+    ok &= _check("live lease refused to a second holder", not acquired and current['holder'] == 'other-host:1')
+    acquired, _ = acquire_lease(con, 'full', 'verify', ttl_seconds=300, holder='other-host:1')
+    ok &= _check("holder re-acquires its own lease", acquired)
+
+    # Expired: a TTL in the past
+    acquire_lease(con, 'full', 'verify', ttl_seconds=-1, holder='other-host:1')
+    acquired, _ = acquire_lease(con, 'incremental', 'verify', ttl_seconds=300, holder='other-host:2')
+    ok &= _check("expired lease taken over", acquired and _holder(con) == 'other-host:2')
+
+    # Unexpired, but the holder process on this host has exited
+    dead = _dead_holder()
+    con.execute("DELETE FROM run_leases")
+    acquire_lease(con, 'full', 'verify', ttl_seconds=300, holder=dead)
+    acquired, _ = acquire_lease(con, 'incremental', 'verify', ttl_seconds=300, holder='other-host:3')
+    ok &= _check(f"lease of exited process {dead} taken over", acquired and _holder(con) == 'other-host:3')
+
+    # hold_lease: refused while held, renewed by the job, released on exit
+    try:
+        with hold_lease(con, 'full', 'verify'):
+            ok &= _check("hold_lease entered while held", False)
+    except LeaseHeldError as e:
+        ok &= _check(f"hold_lease refused ({e})", True)
+    con.execute("DELETE FROM run_leases")
+
+    with hold_lease(con, 'full', 'verify', ttl_seconds=0):
+        before = con.execute("SELECT expires_at FROM run_leases WHERE lease_name = 'verify'").fetchone()[0]
+        renew_lease_if_due(con)
+        after = con.execute("SELECT expires_at FROM run_leases WHERE lease_name = 'verify'").fetchone()[0]
+        ok &= _check("renew_lease_if_due extends the lease", after > before)
+
+        con.execute("UPDATE run_leases SET holder = 'other-host:4' WHERE lease_name = 'verify'")
+        try:
+            renew_lease_if_due(con)
+            ok &= _check("renewal after takeover raises", False)
+        except LeaseHeldError:
+            ok &= _check("renewal after takeover raises LeaseHeldError", True)
+    ok &= _check("release leaves the new holder's lease alone", _holder(con) == 'other-host:4')
+
+    con.execute("DELETE FROM run_leases")
+    with hold_lease(con, 'full', 'verify'):
+        pass
+    ok &= _check("lease released on exit", _holder(con) is None)
+    con.close()
+    return ok
+
+def verify_lease_renewal():
+    con = duckdb.connect(":memory:")
+    init_db(con)
+    rival = con.cursor()
+    refused = []
+
+    def slow_page():
+        # Another writer tries to take the lease while each page is served
+        time.sleep(SLOW_PAGE_SECONDS)
+        acquired, _ = acquire_lease(rival, 'incremental', holder='other-host:5')
+        refused.append(not acquired)
+
+    items = make_items(SLOW_PAGES * 100)
+    ok = True
+    for label, job in [("deletion sweep", lambda gis: sweep_deleted_items(con, gis)),
+                       ("snapshot fetch", lambda gis: snapshot(con, gis))]:
+        refused.clear()
+        started = time.monotonic()
+        with hold_lease(con, 'full', ttl_seconds=SHORT_TTL_SECONDS):
+            job(FakeGIS(items, on_page=slow_page))
+        elapsed = time.monotonic() - started
+        ok &= _check(f"{label} of {len(refused)} slow pages ({elapsed:.1f}s, TTL {SHORT_TTL_SECONDS}s) kept the lease",
+                     len(refused) == SLOW_PAGES and all(refused))
+    rival.close()
+    con.close()
+    return ok
+
+def verify_failed_run_resume():
+    db_path = os.path.join(TMP_DIR, "scheduler.duckdb")
+
+    def connect_fn():
+        con = duckdb.connect(db_path)
+        # Runs are found by id, whatever the session time zone
+        con.execute("SET TimeZone = 'Pacific/Auckland'")
+        return con
+
+    con = connect_fn()
+    init_db(con)
+    con.close()
+
+    attempts = {'pages': 0, 'failures': 0}
+    def flaky_page():
+        attempts['pages'] += 1
+        if attempts['failures'] < 2 and attempts['pages'] == FAILING_PAGE:
+            attempts['pages'], attempts['failures'] = 0, attempts['failures'] + 1
+            raise ValueError("malformed search page") # not retried: fails the run
+
+    job = ScheduledJob('full', 'full', '@daily', {'max_items': None, 'enable_health': False})
+    scheduler = SnapshotScheduler(FakeGIS(make_items(500), on_page=flaky_page), [job], connect_fn=connect_fn)
+
+    def run_once():
+        scheduler.enqueue('full')
+        scheduler._run_next()
+        con = connect_fn()
+        rows = con.sql("SELECT CAST(run_id AS VARCHAR), finished_at IS NOT NULL FROM runs").fetchall()
+        con.close()
+        return dict(rows)
+
+    runs = run_once()
+    failed = job.failed_run_id
+    ok = _check(f"failed run {failed} kept for resume", failed is not None and runs == {failed: False})
+    runs = run_once()
+    ok &= _check("failed resume keeps the run id", job.failed_run_id == failed and runs == {failed: False})
+    runs = run_once()
+    ok &= _check("next trigger resumes and finishes the same run",
+                 job.failed_run_id is None and runs == {failed: True})
+    return ok
+
+if __name__ == "__main__":
+    try:
+        print("Cron schedules:")
+        passed = verify_cron()
+        print("\nCoalescing:")
+        passed &= verify_coalescing()
+        print("\nLeases:")
+        passed &= verify_leases()
+        print("\nFailed runs:")
+        passed &= verify_failed_run_resume()
+        print("\nLease renewal:")
+        passed &= verify_lease_renewal()
+    except Exception as e:
+        print(f"[FAIL] Verification failed: {e}")
+        sys.exit(1)
+    print("\n[OK] Scheduler verification passed." if passed else "\n[FAIL] Scheduler verification failed.")
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,43 @@
+import json
+import logging
+import uuid
+import duckdb
+from datetime import datetime, timezone
+from typing import Dict, Optional, Any
+
+from src.pipeline.leases import renew_lease_if_due
+
+logger = logging.getLogger(__name__)
+
+# Stage status values in run_checkpoints
+STAGE_RUNNING = 'running'
+STAGE_DONE = 'done'
+
+def load_checkpoints(con: duckdb.DuckDBPyConnection, run_id: uuid.UUID) -> Dict[str, dict]:
+    """
+    Returns the stored progress of a run: {stage: {'status', 'state', 'rows_done'}}.
+    """
+    rows = con.execute("""
+        SELECT stage, status, state_json, rows_done FROM run_checkpoints WHERE run_id = ?
+    """, (str(run_id),)).fetchall()
+    return {
+        stage: {'status': status, 'state': json.loads(state) if state else {}, 'rows_done': rows_done or 0}
+        for stage, status, state, rows_done in rows
+    }
+
+def save_checkpoint(con: duckdb.DuckDBPyConnection, run_id: uuid.UUID, stage: str, status: str,
+                    state: Optional[Dict[str, Any]] = None, rows_done: int = 0) -> None:
+    """
+    Records the progress of one stage of a run. `state` must be JSON-serializable
+    and holds whatever the stage needs to continue (cursors, counters, options).
+    Also renews the writer lease held on `con`, if due.
+    """
+    renew_lease_if_due(con)
+    con.execute("""
+        INSERT OR REPLACE INTO run_checkpoints (run_id, stage, status, state_json, rows_done, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (str(run_id), stage, status, json.dumps(state or {}), rows_done, datetime.now(timezone.utc)))
+
+def stage_done(checkpoints: Dict[str, dict], stage: str) -> bool:
+    """True when `stage` completed in an earlier attempt of the run."""
+    return checkpoints.get(stage, {}).get('status') == STAGE_DONE
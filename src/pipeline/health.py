@@ -0,0 +1,686 @@
+import asyncio
+import ipaddress
+import logging
+import math
+import queue
+import re
+import threading
+import time
+import uuid
+import aiohttp
+import duckdb
+import pandas as pd
+from datetime import datetime, timezone, timedelta
+from typing import List, Dict, Any, Optional, Callable
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from src.storage.bulk_load import bulk_insert
+from src.services.request_governor import get_governor, host_of, parse_retry_after
+
+logger = logging.getLogger(__name__)
+
+# Defaults for the health-check stage
+HEALTH_CONCURRENCY = 64 # probes in flight across all hosts
+HEALTH_PER_HOST_LIMIT = 8 # open connections per host
+HEALTH_TIMEOUT_SECONDS = 5
+HEALTH_CACHE_TTL_MINUTES = 60 # OK results younger than this are reused without probing
+HEALTH_BREAKER_THRESHOLD = 3 # consecutive connection failures/timeouts before a host is skipped
+DNS_TIMEOUT_SECONDS = 5
+HEALTH_COVERAGE_WINDOW_HOURS = 24 # every endpoint is probed at least once per window
+PROBER_POLL_SECONDS = 1.0 # how often a blocked StreamingHealthChecker.add checks the prober is alive
+HEALTH_MAX_RETRIES = 2 # re-probes of an endpoint that answered 429/503
+# Only throttling is retried; other 5xx are recorded as the endpoint's health
+HEALTH_RETRY_STATUS = (429, 503)
+
+# ArcGIS service roots; layer sub-paths (/FeatureServer/3) are probed at the root
+_SERVICE_ROOT_RE = re.compile(
+    r'^(.*/(?:FeatureServer|MapServer|ImageServer|SceneServer|VectorTileServer|'
+    r'GeocodeServer|GPServer|GeometryServer|NAServer|StreamServer))(?:/\d+)?/?$',
+    re.IGNORECASE
+)
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+def canonicalize_url(url: str) -> str:
+    """
+    Normalizes a service URL to the endpoint that should be probed.
+
+    Lowercases scheme and host, drops default ports, fragments and trailing
+    slashes, sorts query parameters, and collapses ArcGIS layer URLs to their
+    service root.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    netloc = host
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        netloc = f"{host}:{parts.port}"
+    if parts.username:
+        netloc = f"{parts.username}@{netloc}"
+
+    path = parts.path.rstrip('/')
+    match = _SERVICE_ROOT_RE.match(path)
+    if match:
+        path = match.group(1)
+
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, path, query, ''))
+
+def plan_health_checks(items: List[dict]) -> Dict[str, List[str]]:
+    """
+    Groups items with URLs by canonical endpoint: {endpoint: [item_id, ...]}.
+    Items may be dicts or records (HealthTarget, ItemRecord) with item_id/url.
+    """
+    plan = {}
+    for item in items:
+        if not item.get('url'):
+            continue
+        plan.setdefault(canonicalize_url(item['url']), []).append(item['item_id'])
+    return plan
+
+async def check_url_health(session: aiohttp.ClientSession, url: str,
+                           timeout: float = HEALTH_TIMEOUT_SECONDS,
+                           headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    Performs a HEAD request (GET when HEAD is not allowed) to check URL health.
+
+    `headers` may carry conditional validators (If-None-Match / If-Modified-Since);
+    a 304 counts as healthy. The response's ETag and Last-Modified are returned
+    under 'etag' / 'last_modified' for the health cache, and a 429/503's
+    Retry-After (in seconds) under 'retry_after'.
+    """
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    start = time.perf_counter()
+    try:
+        # Try HEAD first
+        async with session.head(url, timeout=client_timeout, allow_redirects=True, headers=headers) as response:
+            status = response.status
+            validators = response.headers
+
+        # If method not allowed, try GET (headers only, body is never read)
+        if status == 405:
+            start = time.perf_counter()
+            async with session.get(url, timeout=client_timeout, allow_redirects=True, headers=headers) as response:
+                status = response.status
+                validators = response.headers
+
+        latency_ms = int((time.perf_counter() - start) * 1000)
+        return {
+            'ok': status < 400,
+            'status_code': status,
+            'latency_ms': latency_ms,
+            'error_message': None if status < 400 else f"HTTP {status}",
+            'etag': validators.get('ETag'),
+            'last_modified': validators.get('Last-Modified'),
+            'retry_after': parse_retry_after(validators.get('Retry-After')) if status in HEALTH_RETRY_STATUS else None
+        }
+    except asyncio.TimeoutError:
+        return {
+            'ok': False,
+            'status_code': None,
+            'latency_ms': None,
+            'error_message': f"Timeout after {timeout}s"
+        }
+    except Exception as e:
+        return {
+            'ok': False,
+            'status_code': None,
+            'latency_ms': None,
+            'error_message': str(e) or type(e).__name__
+        }
+
+# --- Health Cache ---
+
+def load_health_cache(con: duckdb.DuckDBPyConnection, endpoints: List[str],
+                      ttl_minutes: float = HEALTH_CACHE_TTL_MINUTES) -> Dict[str, dict]:
+    """
+    Returns cached results for `endpoints`: {endpoint: row}. Each row has a
+    'fresh' flag, true when the last result was OK and is younger than the TTL.
+    """
+    if not endpoints:
+        return {}
+    cutoff = datetime.now(timezone.utc) - timedelta(minutes=ttl_minutes)
+    con.register("_health_endpoints", pd.DataFrame({'checked_url': endpoints}))
+    try:
+        df = con.execute("""
+            SELECT c.checked_url, c.ok, c.status_code, c.latency_ms, c.error_message,
+                   c.etag, c.last_modified, epoch_ms(CAST(c.checked_at AS TIMESTAMPTZ)) AS checked_at_ms,
+                   COALESCE(c.ok AND c.checked_at >= ?, false) AS fresh
+            FROM health_cache c
+            JOIN _health_endpoints e ON c.checked_url = e.checked_url
+        """, (cutoff,)).df()
+    finally:
+        con.unregister("_health_endpoints")
+    df = df.astype(object).where(df.notna(), None)
+    cache = {}
+    for row in df.to_dict('records'):
+        row['checked_at'] = datetime.fromtimestamp(row.pop('checked_at_ms') / 1000.0, tz=timezone.utc)
+        cache[row['checked_url']] = row
+    return cache
+
+def save_health_cache(con: duckdb.DuckDBPyConnection, probes: Dict[str, Dict[str, Any]],
+                      cache: Dict[str, dict]) -> None:
+    """Upserts fresh probe results; validators survive a 304 that omits them."""
+    rows = []
+    for url, res in probes.items():
+        previous = cache.get(url) or {}
+        rows.append({
+            'checked_url': url,
+            'ok': res['ok'],
+            'status_code': res['status_code'],
+            'latency_ms': res['latency_ms'],
+            'error_message': res['error_message'],
+            'etag': res.get('etag') or (previous.get('etag') if res['ok'] else None),
+            'last_modified': res.get('last_modified') or (previous.get('last_modified') if res['ok'] else None),
+            'checked_at': res['checked_at']
+        })
+    bulk_insert(con, "health_cache", rows, replace=True, key="checked_url")
+
+def _conditional_headers(cached: Optional[dict]) -> Optional[Dict[str, str]]:
+    """Validators from the last OK result; failed URLs are always fully re-checked."""
+    if not cached or not cached.get('ok'):
+        return None
+    headers = {}
+    if cached.get('etag'):
+        headers['If-None-Match'] = cached['etag']
+    if cached.get('last_modified'):
+        headers['If-Modified-Since'] = cached['last_modified']
+    return headers or None
+
+def _host_key(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.hostname or ''}:{parts.port or _DEFAULT_PORTS.get(parts.scheme, '')}"
+
+def _failed_result(message: str) -> Dict[str, Any]:
+    return {
+        'ok': False,
+        'status_code': None,
+        'latency_ms': None,
+        'error_message': message,
+        'checked_at': datetime.now(timezone.utc)
+    }
+
+def _circuit_open_result(host: str, failures: int) -> Dict[str, Any]:
+    return _failed_result(f"circuit_open: {host} failed {failures} consecutive probes")
+
+def _update_breaker(host: str, res: Dict[str, Any], consecutive_failures: Dict[str, int],
+                    open_circuits: set, breaker_threshold: int) -> None:
+    """Counts consecutive connection failures/timeouts per host and opens its circuit at the threshold."""
+    # No status code means the host never answered (connect error or timeout)
+    if res['status_code'] is None:
+        consecutive_failures[host] = consecutive_failures.get(host, 0) + 1
+        if consecutive_failures[host] >= breaker_threshold and host not in open_circuits:
+            open_circuits.add(host)
+            logger.warning(f"Circuit open for {host} after {consecutive_failures[host]} failures")
+    else:
+        consecutive_failures[host] = 0
+
+async def _resolve_hosts(hostnames: List[str]) -> Dict[str, Optional[str]]:
+    """Resolves each hostname once: {hostname: None if resolvable, else error}."""
+    loop = asyncio.get_running_loop()
+
+    async def resolve(host):
+        try:
+            ipaddress.ip_address(host)
+            return None
+        except ValueError:
+            pass
+        try:
+            await asyncio.wait_for(loop.getaddrinfo(host, None), timeout=DNS_TIMEOUT_SECONDS)
+            return None
+        except asyncio.TimeoutError:
+            return f"DNS resolution timed out for {host}"
+        except Exception as e:
+            return f"DNS resolution failed for {host}: {e}"
+
+    errors = await asyncio.gather(*[resolve(h) for h in hostnames])
+    return dict(zip(hostnames, errors))
+
+async def _governed_probe(session: aiohttp.ClientSession, url: str, timeout: float,
+                          cached: Optional[dict], per_host_limit: int,
+                          deadline: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Probes `url` within its host's RequestGovernor (shared with the other
+    outbound ArcGIS calls to that host). A 429/503 or a timeout shrinks the
+    host's concurrency limit; 429/503 are re-probed after Retry-After or a
+    jittered backoff, up to HEALTH_MAX_RETRIES times and within the deadline.
+    """
+    governor = get_governor(host_of(url), initial_limit=per_host_limit, max_limit=per_host_limit)
+    attempt = 0
+    while True:
+        await governor.acquire_async()
+        try:
+            res = await check_url_health(session, url, timeout, _conditional_headers(cached))
+        except BaseException:
+            governor.release()
+            raise
+        throttled = res['status_code'] in HEALTH_RETRY_STATUS
+        timed_out = res['status_code'] is None and (res['error_message'] or '').startswith('Timeout')
+        governor.release(throttled=throttled or timed_out, retry_after=res.get('retry_after'))
+        if not throttled or attempt >= HEALTH_MAX_RETRIES:
+            return res
+        attempt += 1
+        delay = governor.backoff(attempt, res.get('retry_after'))
+        if deadline is not None and time.perf_counter() + delay >= deadline:
+            return res
+        await asyncio.sleep(delay)
+
+async def _probe_endpoints(endpoints: List[str], max_concurrency: int, per_host_limit: int,
+                           timeout: float, cache: Dict[str, dict],
+                           breaker_threshold: int = HEALTH_BREAKER_THRESHOLD,
+                           deadline: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+    results = {}
+
+    # Unresolvable hosts fail once, up front, for all of their endpoints
+    hostnames = sorted({urlsplit(u).hostname for u in endpoints if urlsplit(u).hostname})
+    dns_errors = {h: e for h, e in (await _resolve_hosts(hostnames)).items() if e}
+    pending = asyncio.Queue()
+    for url in endpoints:
+        error = dns_errors.get(urlsplit(url).hostname)
+        if error:
+            results[url] = _failed_result(error)
+        else:
+            pending.put_nowait(url)
+    if dns_errors:
+        logger.warning(f"{len(dns_errors)} hosts did not resolve; skipped their endpoints")
+
+    # Per-host circuit breaker: consecutive connection failures/timeouts
+    consecutive_failures = {}
+    open_circuits = set()
+
+    connector = aiohttp.TCPConnector(limit=max_concurrency, limit_per_host=per_host_limit, ttl_dns_cache=300)
+    async with aiohttp.ClientSession(connector=connector) as session:
+
+        async def worker():
+            while True:
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return # time budget spent; the rest waits for a later run
+                try:
+                    url = pending.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                host = _host_key(url)
+                if host in open_circuits:
+                    results[url] = _circuit_open_result(host, consecutive_failures[host])
+                    continue
+                try:
+                    res = await _governed_probe(session, url, timeout, cache.get(url), per_host_limit, deadline)
+                    res['checked_at'] = datetime.now(timezone.utc)
+                    results[url] = res
+                except Exception as e:
+                    logger.error(f"Health check execution error for {url}: {e}")
+                    continue
+
+                _update_breaker(host, res, consecutive_failures, open_circuits, breaker_threshold)
+
+        n_workers = min(max_concurrency, pending.qsize())
+        if n_workers:
+            await asyncio.gather(*[worker() for _ in range(n_workers)])
+
+    return results
+
+# --- Budgeted Scheduling ---
+
+def prioritize_endpoints(con: Optional[duckdb.DuckDBPyConnection], plan: Dict[str, List[str]],
+                         cache: Dict[str, dict],
+                         coverage_window_hours: float = HEALTH_COVERAGE_WINDOW_HOURS) -> List[str]:
+    """
+    Orders endpoints for a budgeted health run.
+
+    Overdue endpoints (never checked, or last checked longer ago than the
+    coverage window) come first, oldest first, so consecutive runs cover the
+    whole catalog within the window. The rest are ranked by risk: a failed
+    last check, item views, watchlisted items and time since the last check.
+    """
+    views, watched = {}, set()
+    if con is not None:
+        pairs = pd.DataFrame(
+            [(url, item_id) for url, item_ids in plan.items() for item_id in item_ids],
+            columns=['endpoint', 'item_id']
+        )
+        con.register("_health_plan", pairs)
+        try:
+            rows = con.execute("""
+                SELECT p.endpoint,
+                       COALESCE(SUM(i.num_views), 0) AS views,
+                       bool_or(w.item_id IS NOT NULL) AS watched
+                FROM _health_plan p
+                LEFT JOIN items_current i ON i.item_id = p.item_id
+                LEFT JOIN watchlist_items w ON w.item_id = p.item_id
+                GROUP BY p.endpoint
+            """).fetchall()
+        finally:
+            con.unregister("_health_plan")
+        for endpoint, endpoint_views, is_watched in rows:
+            views[endpoint] = int(endpoint_views or 0)
+            if is_watched:
+                watched.add(endpoint)
+
+    now = datetime.now(timezone.utc)
+    window_seconds = coverage_window_hours * 3600
+
+    def sort_key(url):
+        cached = cache.get(url)
+        age = (now - cached['checked_at']).total_seconds() if cached else math.inf
+        if age >= window_seconds:
+            return (0, -age)
+        risk = 0.0
+        if not cached['ok']:
+            risk += 100
+        if url in watched:
+            risk += 50
+        risk += 10 * math.log10(1 + views.get(url, 0))
+        risk += 50 * age / window_seconds
+        return (1, -risk)
+
+    return sorted(plan, key=sort_key)
+
+def run_health_checks(items: List[dict], run_id: uuid.UUID,
+                      max_concurrency: int = HEALTH_CONCURRENCY,
+                      per_host_limit: int = HEALTH_PER_HOST_LIMIT,
+                      timeout: float = HEALTH_TIMEOUT_SECONDS,
+                      con: Optional[duckdb.DuckDBPyConnection] = None,
+                      cache_ttl_minutes: float = HEALTH_CACHE_TTL_MINUTES,
+                      breaker_threshold: int = HEALTH_BREAKER_THRESHOLD,
+                      probe_budget: Optional[int] = None,
+                      time_budget_seconds: Optional[float] = None,
+                      coverage_window_hours: float = HEALTH_COVERAGE_WINDOW_HOURS,
+                      batch_size: Optional[int] = None,
+                      on_batch: Optional[Callable[[List[dict]], None]] = None) -> List[dict]:
+    """
+    Runs health checks on item URLs with asyncio over one pooled, keep-alive
+    connection pool.
+
+    URLs are canonicalized and grouped first (see plan_health_checks): each
+    unique endpoint is probed once and its result is recorded for every item
+    pointing at it, with checked_url set to the item's own URL and
+    endpoint_url to the probed endpoint.
+
+    At most `max_concurrency` probes are in flight overall and at most
+    `per_host_limit` connections are open to any single host, so services that
+    share a server reuse warm connections instead of paying a new TCP/TLS
+    handshake per URL.
+
+    With a warehouse connection, results are cached per endpoint in
+    health_cache: endpoints whose last OK result is younger than
+    `cache_ttl_minutes` are not probed (their cached result is recorded, with
+    its original checked_at), other previously-OK endpoints are re-checked with
+    conditional requests, and failed endpoints are always re-checked.
+
+    Hostnames are resolved once up front; endpoints on unresolvable hosts fail
+    without being probed. After `breaker_threshold` consecutive connection
+    failures or timeouts on a host, its remaining endpoints are recorded with a
+    `circuit_open` error instead of waiting out the timeout each time.
+
+    With `probe_budget` (probes) and/or `time_budget_seconds`, endpoints are
+    probed in prioritize_endpoints order until the budget is spent. Endpoints
+    left over keep their last cached result for this run.
+
+    With `batch_size`, endpoints are probed in batches of that many and the
+    rows of each finished batch are passed to `on_batch`, so a caller can
+    persist (and checkpoint) results before the whole stage completes.
+
+    Args:
+        items (List[dict]): Dicts or records (HealthTarget, ItemRecord) with 'item_id' and 'url'.
+        run_id (uuid.UUID): Run the results belong to.
+        con (duckdb.DuckDBPyConnection, optional): Enables the health cache and
+            risk-based prioritization.
+
+    Returns:
+        List[dict]: health_checks rows.
+    """
+    plan = plan_health_checks(items)
+    if not plan:
+        return []
+    item_urls = {item['item_id']: item['url'] for item in items if item.get('url')}
+    n_items = sum(len(group) for group in plan.values())
+    logger.info(f"Probing {len(plan)} unique endpoints for {n_items} items")
+
+    cache = load_health_cache(con, list(plan), cache_ttl_minutes) if con is not None else {}
+    cached = {url: row for url, row in cache.items() if row['fresh']}
+    to_probe = [url for url in plan if url not in cached]
+    if cached:
+        logger.info(f"Reusing {len(cached)} cached OK results younger than {cache_ttl_minutes} min")
+
+    budgeted = probe_budget is not None or time_budget_seconds is not None
+    if budgeted:
+        to_probe = prioritize_endpoints(con, {url: plan[url] for url in to_probe}, cache, coverage_window_hours)
+        if probe_budget is not None:
+            to_probe = to_probe[:probe_budget]
+    deadline = time.perf_counter() + time_budget_seconds if time_budget_seconds is not None else None
+
+    results = []
+
+    def record(endpoint_results: Dict[str, Dict[str, Any]]):
+        rows = _fan_out(plan, endpoint_results, run_id, item_urls)
+        results.extend(rows)
+        if on_batch is not None and rows:
+            on_batch(rows)
+
+    record(cached)
+    probes = {}
+    step = batch_size or len(to_probe) or 1
+    for i in range(0, len(to_probe), step):
+        if deadline is not None and time.perf_counter() >= deadline:
+            break
+        batch = asyncio.run(
+            _probe_endpoints(to_probe[i:i + step], max_concurrency, per_host_limit, timeout,
+                             cache, breaker_threshold, deadline)
+        )
+        if con is not None and batch:
+            save_health_cache(con, batch, cache)
+        probes.update(batch)
+        record(batch)
+
+    if budgeted:
+        deferred = [url for url in plan if url not in probes and url not in cached]
+        if deferred:
+            logger.info(f"Budget spent after {len(probes)} probes; deferred {len(deferred)} endpoints to later runs")
+        # Deferred endpoints keep their last known result for this run
+        record({url: cache[url] for url in deferred if url in cache})
+    return results
+
+def _fan_out(plan: Dict[str, List[str]], endpoint_results: Dict[str, Dict[str, Any]],
+             run_id: uuid.UUID, item_urls: Dict[str, str]) -> List[dict]:
+    """
+    Fans each endpoint result back out to every item that points at it
+    (checked_url: the item's URL from `item_urls`, endpoint_url: the endpoint).
+    """
+    rows = []
+    for endpoint, probe in endpoint_results.items():
+        for item_id in plan.get(endpoint, []):
+            rows.append({
+                'run_id': str(run_id),
+                'item_id': item_id,
+                'checked_url': item_urls.get(item_id, endpoint),
+                'endpoint_url': endpoint,
+                'ok': probe['ok'],
+                'status_code': probe['status_code'],
+                'latency_ms': probe['latency_ms'],
+                'error_message': probe['error_message'],
+                'checked_at': probe['checked_at']
+            })
+    return rows
+
+# --- Streaming (overlapped with the snapshot fetch) ---
+
+class StreamingHealthChecker:
+    """
+    Health checks that run while the snapshot is still loading pages.
+
+    Probes run on a background thread with its own event loop, using the same
+    pooled session, per-host governors, DNS pre-check and circuit breaker as
+    run_health_checks. Everything that touches the warehouse (health cache
+    lookups and saves) stays on the caller's thread, which owns the DuckDB
+    connection:
+
+        add(targets)  plans a page of items and returns the rows that are
+                      already known (fresh cache entries, endpoints probed
+                      for an earlier page); other endpoints are queued.
+        collect()     returns the rows of probes finished since the last call.
+        close()       waits for the queued probes and returns their rows.
+
+    At most `max_pending` endpoints wait for a probe; add() blocks beyond
+    that, so a fast fetch cannot queue up the whole catalog. If the prober
+    thread dies, add() and close() raise instead of waiting for it.
+    """
+
+    def __init__(self, con: duckdb.DuckDBPyConnection, run_id: uuid.UUID,
+                 max_concurrency: int = HEALTH_CONCURRENCY,
+                 per_host_limit: int = HEALTH_PER_HOST_LIMIT,
+                 timeout: float = HEALTH_TIMEOUT_SECONDS,
+                 cache_ttl_minutes: float = HEALTH_CACHE_TTL_MINUTES,
+                 breaker_threshold: int = HEALTH_BREAKER_THRESHOLD,
+                 max_pending: Optional[int] = None):
+        self.con = con
+        self.run_id = run_id
+        self.max_concurrency = max_concurrency
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.cache_ttl_minutes = cache_ttl_minutes
+        self.breaker_threshold = breaker_threshold
+        self.plan = {} # endpoint -> [item_id, ...]
+        self.item_urls = {} # item_id -> item URL
+        self.known = {} # endpoint -> result
+        self.cache = {} # endpoint -> health_cache row
+        self.seen_items = set()
+        self.probed = 0
+        self.reused = 0
+        self._slots = threading.Semaphore(max_pending or max_concurrency * 4)
+        self._done = queue.Queue()
+        self._ready = threading.Event()
+        self._loop = None
+        self._main_task = None
+        self._pending = None
+        self._error: Optional[BaseException] = None # what stopped the prober thread
+        self._thread = threading.Thread(target=self._run, name="health-prober", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        self._check_prober()
+
+    # --- Caller (writer) thread ---
+
+    def add(self, targets: List[dict]) -> List[dict]:
+        """Plans items (dicts/records with item_id and url); returns rows that need no probe."""
+        page_plan = {}
+        for target in targets:
+            if not target.get('url') or target['item_id'] in self.seen_items:
+                continue
+            self.seen_items.add(target['item_id'])
+            self.item_urls[target['item_id']] = target['url']
+            page_plan.setdefault(canonicalize_url(target['url']), []).append(target['item_id'])
+
+        new = [url for url in page_plan if url not in self.plan]
+        for url, item_ids in page_plan.items():
+            self.plan.setdefault(url, []).extend(item_ids)
+
+        rows = _fan_out(page_plan, {url: self.known[url] for url in page_plan if url in self.known},
+                        self.run_id, self.item_urls)
+        cache = load_health_cache(self.con, new, self.cache_ttl_minutes)
+        self.cache.update(cache)
+        for url in new:
+            cached = cache.get(url)
+            if cached and cached['fresh']:
+                self.known[url] = cached
+                self.reused += 1
+                rows.extend(_fan_out(page_plan, {url: cached}, self.run_id, self.item_urls))
+            else:
+                # Backpressure: wait for a free probe slot while the prober is alive
+                while not self._slots.acquire(timeout=PROBER_POLL_SECONDS):
+                    self._check_prober()
+                self._check_prober()
+                self._loop.call_soon_threadsafe(self._pending.put_nowait, (url, cached))
+        return rows
+
+    def collect(self) -> List[dict]:
+        """Saves finished probes to the health cache and returns their rows."""
+        batch = {}
+        while True:
+            try:
+                url, res = self._done.get_nowait()
+            except queue.Empty:
+                break
+            batch[url] = res
+        if not batch:
+            return []
+        save_health_cache(self.con, batch, self.cache)
+        self.known.update(batch)
+        self.probed += len(batch)
+        return _fan_out(self.plan, batch, self.run_id, self.item_urls)
+
+    def close(self) -> List[dict]:
+        """Waits for all queued probes and returns the remaining rows."""
+        self._check_prober()
+        for _ in range(self.max_concurrency):
+            self._loop.call_soon_threadsafe(self._pending.put_nowait, (None, None))
+        self._thread.join()
+        if self._error is not None:
+            raise RuntimeError(f"Health prober failed: {self._error}") from self._error
+        return self.collect()
+
+    def abort(self) -> None:
+        """Cancels queued and running probes (their results are discarded)."""
+        if self._thread.is_alive():
+            self._loop.call_soon_threadsafe(self._main_task.cancel)
+            self._thread.join()
+
+    def _check_prober(self) -> None:
+        """Raises when the prober thread has stopped (with the error that stopped it)."""
+        if not self._thread.is_alive():
+            raise RuntimeError(f"Health prober stopped: {self._error or 'thread exited'}") from self._error
+
+    # --- Prober thread ---
+
+    def _run(self):
+        try:
+            asyncio.run(self._main())
+        except asyncio.CancelledError:
+            pass
+        except BaseException as e:
+            logger.error(f"Health prober failed: {e}")
+            self._error = e
+        finally:
+            self._ready.set() # in case it failed before the loop started
+
+    async def _main(self):
+        self._loop = asyncio.get_running_loop()
+        self._main_task = asyncio.current_task()
+        self._pending = asyncio.Queue()
+        self._ready.set()
+
+        dns = {} # hostname -> resolution task
+        consecutive_failures = {}
+        open_circuits = set()
+
+        async def probe(url, cached):
+            hostname = urlsplit(url).hostname
+            if hostname:
+                if hostname not in dns:
+                    dns[hostname] = asyncio.ensure_future(_resolve_hosts([hostname]))
+                error = (await dns[hostname])[hostname]
+                if error:
+                    return _failed_result(error)
+            host = _host_key(url)
+            if host in open_circuits:
+                return _circuit_open_result(host, consecutive_failures[host])
+            res = await _governed_probe(session, url, self.timeout, cached, self.per_host_limit)
+            res['checked_at'] = datetime.now(timezone.utc)
+            _update_breaker(host, res, consecutive_failures, open_circuits, self.breaker_threshold)
+            return res
+
+        async def worker():
+            while True:
+                url, cached = await self._pending.get()
+                if url is None:
+                    return
+                try:
+                    self._done.put((url, await probe(url, cached)))
+                except Exception as e:
+                    # Its items get no row now; the snapshot's health stage picks them up afterwards
+                    logger.error(f"Health check execution error for {url}: {e}")
+                finally:
+                    self._slots.release()
+
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency, limit_per_host=self.per_host_limit,
+                                         ttl_dns_cache=300)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            await asyncio.gather(*[worker() for _ in range(self.max_concurrency)])
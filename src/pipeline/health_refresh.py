@@ -0,0 +1,145 @@
+import logging
+import uuid
+import duckdb
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from src.pipeline.health import (
+    run_health_checks, HEALTH_CONCURRENCY, HEALTH_PER_HOST_LIMIT, HEALTH_BREAKER_THRESHOLD
+)
+from src.pipeline.records import HealthTarget
+from src.pipeline.instrumentation import track_stage
+from src.pipeline.leases import renew_lease_if_due
+from src.services.request_governor import total_retries
+from src.storage.bulk_load import bulk_insert
+
+logger = logging.getLogger(__name__)
+
+# runs.source of health-only runs (they have health_checks rows but no items or scores of their own)
+HEALTH_RUN_SOURCE = 'health'
+
+# Endpoints probed per saved batch of health_checks rows
+HEALTH_REFRESH_BATCH = 500
+
+def latest_health_run_id(con: duckdb.DuckDBPyConnection, as_of_run_id: Optional[str] = None) -> Optional[str]:
+    """
+    The most recent finished run (snapshot or health-only) that has health
+    results. Unfinished runs (running, or failed part-way) are skipped, as
+    their health_checks cover only part of the catalog.
+
+    With `as_of_run_id` (a snapshot), only that run and the health-only runs
+    started after it and before the next snapshot are considered, so a report
+    on an older snapshot shows the health results of its time.
+    """
+    as_of = """
+        AND r.started_at >= (SELECT started_at FROM runs WHERE run_id = $as_of)
+        AND r.started_at < COALESCE((
+            SELECT MIN(n.started_at) FROM runs n
+            WHERE COALESCE(n.source, '') <> $health
+              AND n.started_at > (SELECT started_at FROM runs WHERE run_id = $as_of)
+        ), 'infinity'::TIMESTAMP)
+    """ if as_of_run_id else ""
+    params = {'as_of': str(as_of_run_id), 'health': HEALTH_RUN_SOURCE} if as_of_run_id else {}
+    row = con.execute(f"""
+        SELECT CAST(r.run_id AS VARCHAR) FROM runs r
+        WHERE r.finished_at IS NOT NULL
+          AND EXISTS (SELECT 1 FROM health_checks h WHERE h.run_id = r.run_id) {as_of}
+        ORDER BY r.started_at DESC LIMIT 1
+    """, params).fetchone()
+    return row[0] if row else None
+
+def run_health_refresh(con: duckdb.DuckDBPyConnection, only_failing: bool = False,
+                       base_run_id: Optional[str] = None,
+                       health_concurrency: int = HEALTH_CONCURRENCY,
+                       health_per_host: int = HEALTH_PER_HOST_LIMIT,
+                       health_cache_ttl_minutes: float = 0,
+                       health_breaker_threshold: int = HEALTH_BREAKER_THRESHOLD,
+                       triggered_by: str = 'manual') -> Dict[str, Any]:
+    """
+    Re-probes item URLs from items_active without fetching anything from the
+    portal, and records the results as a new health-only run
+    (`runs.source = 'health'`). Items, history and scores are not touched.
+
+    With `only_failing`, only items whose result in the base run (default:
+    the latest run with health results) failed are probed; the base run's
+    results for all other items are copied into the new run, so every run's
+    health_checks stay a complete picture of the catalog.
+
+    The health cache TTL defaults to 0 here: every selected endpoint is
+    probed (previously OK ones with conditional requests).
+
+    Returns:
+        dict: run_id, probed (items), ok, failed, fixed (failed in the base
+            run, OK now) and broken (OK in the base run, failing now).
+    """
+    base_run_id = base_run_id or latest_health_run_id(con)
+    if only_failing and base_run_id is None:
+        raise ValueError("No earlier health results to take failing items from")
+
+    run_id = uuid.uuid4()
+    # Portal of the latest snapshot, for the runs row
+    source = con.execute("""
+        SELECT portal_url, org_id FROM runs WHERE source <> ? ORDER BY started_at DESC LIMIT 1
+    """, (HEALTH_RUN_SOURCE,)).fetchone() or (None, None)
+    con.execute("""
+        INSERT INTO runs (run_id, started_at, source, portal_url, org_id, triggered_by, pipeline_version)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (str(run_id), datetime.now(timezone.utc), HEALTH_RUN_SOURCE, *source, triggered_by, 'v1'))
+    logger.info(f"Starting health-only run {run_id}"
+                + (f" (failing items of run {base_run_id})" if only_failing else ""))
+
+    failing_filter = """
+        AND i.item_id IN (SELECT item_id FROM health_checks WHERE run_id = ? AND NOT ok)
+    """ if only_failing else ""
+    targets = [HealthTarget(item_id, url) for item_id, url in con.execute(f"""
+        SELECT i.item_id, i.url FROM items_active i
+        WHERE COALESCE(i.url, '') <> '' {failing_filter}
+    """, (base_run_id,) if only_failing else ()).fetchall()]
+
+    def save_batch(rows):
+        bulk_insert(con, "health_checks", rows)
+        renew_lease_if_due(con)
+
+    try:
+        with track_stage(con, run_id, 'health', rows_in=len(targets)) as health_m:
+            retries_before = total_retries()
+            results = run_health_checks(targets, run_id, max_concurrency=health_concurrency,
+                                        per_host_limit=health_per_host, con=con,
+                                        cache_ttl_minutes=health_cache_ttl_minutes,
+                                        breaker_threshold=health_breaker_threshold,
+                                        batch_size=HEALTH_REFRESH_BATCH,
+                                        on_batch=save_batch)
+            health_m['rows_out'] = len(results)
+            health_m['retries'] = total_retries() - retries_before
+
+        with track_stage(con, run_id, 'finalize'):
+            if only_failing:
+                # Unprobed items keep their base-run result
+                con.execute("""
+                    INSERT INTO health_checks (run_id, item_id, checked_url, endpoint_url, ok, status_code, latency_ms, error_message, checked_at)
+                    SELECT ?, b.item_id, b.checked_url, b.endpoint_url, b.ok, b.status_code, b.latency_ms, b.error_message, b.checked_at
+                    FROM health_checks b
+                    JOIN items_active i ON i.item_id = b.item_id
+                    WHERE b.run_id = ?
+                    AND NOT EXISTS (SELECT 1 FROM health_checks c WHERE c.run_id = ? AND c.item_id = b.item_id)
+                """, (str(run_id), base_run_id, str(run_id)))
+            summary = con.execute("""
+                SELECT COUNT(*) FILTER (WHERE n.ok),
+                       COUNT(*) FILTER (WHERE NOT n.ok),
+                       COUNT(*) FILTER (WHERE n.ok AND b.ok = false),
+                       COUNT(*) FILTER (WHERE NOT n.ok AND b.ok)
+                FROM health_checks n
+                LEFT JOIN health_checks b ON b.run_id = ? AND b.item_id = n.item_id
+                WHERE n.run_id = ?
+            """, (base_run_id, str(run_id))).fetchone()
+            con.execute("UPDATE runs SET finished_at = ? WHERE run_id = ?", (datetime.now(timezone.utc), str(run_id)))
+    except Exception as e:
+        # Unlike snapshots there is nothing worth resuming: start a new refresh instead
+        logger.error(f"Health-only run {run_id} failed: {e}")
+        raise
+
+    ok, failed, fixed, broken = (int(v or 0) for v in summary)
+    logger.info(f"Health-only run complete: {len(results)} items probed, {ok} OK, {failed} failing "
+                f"({fixed} fixed, {broken} newly broken since run {base_run_id})")
+    return {'run_id': str(run_id), 'probed': len(results), 'ok': ok, 'failed': failed,
+            'fixed': fixed, 'broken': broken}
@@ -0,0 +1,109 @@
+import json
+import logging
+import sys
+import time
+import uuid
+import duckdb
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Any, Iterator, List, Optional
+
+from src.pipeline.leases import renew_lease_if_due
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process so far, in MB (None where unsupported)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+@contextmanager
+def track_stage(con: duckdb.DuckDBPyConnection, run_id: uuid.UUID, stage: str,
+                rows_in: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Times a pipeline stage and appends one row to run_stages when it exits,
+    including when it fails.
+
+    The yielded dict can be filled in by the stage: rows_in, rows_out,
+    bytes_fetched, retries, and busy_ms for stages that share wall-clock time
+    with others (fetch/normalize/upsert are interleaved page by page). Without
+    busy_ms, the wall-clock duration is recorded. Entering a stage also
+    renews the writer lease held on `con`, so a stage whose work is one long
+    statement (history, scores) starts with a full TTL.
+    """
+    renew_lease_if_due(con, force=True)
+    metrics = {'rows_in': rows_in, 'rows_out': None, 'bytes_fetched': None, 'retries': 0, 'busy_ms': None}
+    started_at = datetime.now(timezone.utc)
+    t0 = time.perf_counter()
+    status = 'failed'
+    try:
+        yield metrics
+        status = 'ok'
+    finally:
+        wall_ms = int((time.perf_counter() - t0) * 1000)
+        busy_ms = int(metrics['busy_ms']) if metrics['busy_ms'] is not None else wall_ms
+        try:
+            attempt = con.execute(
+                "SELECT COUNT(*) FROM run_stages WHERE run_id = ? AND stage = ?", (str(run_id), stage)
+            ).fetchone()[0] + 1
+            con.execute("""
+                INSERT INTO run_stages (run_id, stage, attempt, status, started_at, finished_at, busy_ms,
+                                        rows_in, rows_out, bytes_fetched, retries, peak_rss_mb)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (str(run_id), stage, attempt, status, started_at, datetime.now(timezone.utc), busy_ms,
+                  metrics['rows_in'], metrics['rows_out'], metrics['bytes_fetched'], metrics['retries'],
+                  peak_rss_mb()))
+        except duckdb.Error as e:
+            logger.warning(f"Could not record metrics for stage {stage}: {e}")
+
+@contextmanager
+def busy(metrics: Dict[str, Any]) -> Iterator[None]:
+    """Adds the time spent in the block to metrics['busy_ms']."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics['busy_ms'] = (metrics['busy_ms'] or 0) + (time.perf_counter() - t0) * 1000
+
+def metered_pages(pages: Iterator[List[dict]], metrics: Dict[str, Any]) -> Iterator[List[dict]]:
+    """
+    Passes pages through, adding the time spent waiting on the source to
+    busy_ms and counting rows_out and bytes_fetched (JSON size of the results).
+    """
+    metrics['rows_out'] = metrics['rows_out'] or 0
+    metrics['bytes_fetched'] = metrics['bytes_fetched'] or 0
+    pages = iter(pages)
+    while True:
+        with busy(metrics):
+            page = next(pages, None)
+        if page is None:
+            return
+        metrics['rows_out'] += len(page)
+        metrics['bytes_fetched'] += len(json.dumps(page, default=str))
+        yield page
+
+def load_run_stages(con: duckdb.DuckDBPyConnection, run_id: str):
+    """
+    Returns the stage breakdown of a run as a DataFrame (one row per stage
+    attempt, in execution order), or None if the warehouse predates run_stages.
+    """
+    exists = con.execute(
+        "SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = 'main' AND table_name = 'run_stages'"
+    ).fetchone()[0]
+    if not exists:
+        return None
+    return con.execute("""
+        SELECT stage, attempt, status, busy_ms / 1000.0 AS seconds,
+               rows_in, rows_out, bytes_fetched, retries, peak_rss_mb, started_at, finished_at
+        FROM run_stages
+        WHERE run_id = ?
+        ORDER BY started_at, stage
+    """, (str(run_id),)).df()
@@ -0,0 +1,128 @@
+import logging
+import os
+import socket
+import time
+import duckdb
+from contextlib import contextmanager
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# The lease every warehouse-writing job (snapshot, scheduler job) takes
+WRITER_LEASE = 'warehouse_writer'
+LEASE_TTL_SECONDS = 300 # renewed (per page, at checkpoints) once TTL/3 has passed while the holder runs
+
+class LeaseHeldError(RuntimeError):
+    """Another live process holds the lease."""
+
+# Leases held through hold_lease, by id() of the job's connection: {name, ttl, renew_at}
+_held_leases: Dict[int, dict] = {}
+
+def lease_holder_id() -> str:
+    """Identifies this process as a lease holder: "<hostname>:<pid>"."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def _holder_is_dead(holder: str) -> bool:
+    """True if `holder` is a process on this host that no longer exists."""
+    host, _, pid = holder.rpartition(':')
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        return False
+    return False
+
+def acquire_lease(con: duckdb.DuckDBPyConnection, job: str, name: str = WRITER_LEASE,
+                  ttl_seconds: float = LEASE_TTL_SECONDS,
+                  holder: Optional[str] = None) -> Tuple[bool, Optional[dict]]:
+    """
+    Takes the lease `name` for this process if it is free, expired, already
+    ours, or held by a process on this host that has exited.
+
+    Returns:
+        (bool, dict): Whether the lease was acquired, and the current holder's
+            row ({'holder', 'job', 'acquired_at', 'expires_at'}) when it was not.
+    """
+    holder = holder or lease_holder_id()
+    now = datetime.now(timezone.utc)
+    con.begin()
+    try:
+        row = con.execute("""
+            SELECT holder, job, acquired_at, expires_at, expires_at < ? AS expired
+            FROM run_leases WHERE lease_name = ?
+        """, (now, name)).fetchone()
+        if row is not None and row[0] != holder and not row[4] and not _holder_is_dead(row[0]):
+            con.rollback()
+            return False, {'holder': row[0], 'job': row[1], 'acquired_at': row[2], 'expires_at': row[3]}
+        if row is not None and row[0] != holder:
+            logger.warning(f"Taking over lease '{name}' from {row[0]} (expired or exited)")
+        con.execute("""
+            INSERT OR REPLACE INTO run_leases (lease_name, holder, job, acquired_at, expires_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, (name, holder, job, now, now + timedelta(seconds=ttl_seconds)))
+        con.commit()
+        return True, None
+    except Exception:
+        con.rollback()
+        raise
+
+def renew_lease(con: duckdb.DuckDBPyConnection, name: str = WRITER_LEASE,
+                ttl_seconds: float = LEASE_TTL_SECONDS, holder: Optional[str] = None) -> bool:
+    """Extends our lease; False if it is no longer ours."""
+    renewed = con.execute("""
+        UPDATE run_leases SET expires_at = ? WHERE lease_name = ? AND holder = ? RETURNING lease_name
+    """, (datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds), name, holder or lease_holder_id())).fetchall()
+    return bool(renewed)
+
+def release_lease(con: duckdb.DuckDBPyConnection, name: str = WRITER_LEASE, holder: Optional[str] = None) -> None:
+    con.execute("DELETE FROM run_leases WHERE lease_name = ? AND holder = ?", (name, holder or lease_holder_id()))
+
+def renew_lease_if_due(con: duckdb.DuckDBPyConnection, force: bool = False) -> None:
+    """
+    Renews the lease held on `con` (see hold_lease) once a third of its TTL
+    has passed, or right away with `force` (before a long statement that
+    cannot renew midway); otherwise does nothing. Jobs call this from every
+    long loop (save_checkpoint, track_stage and the page loops do), so the
+    renewal is serialized with the job's writes on the same connection.
+
+    Raises:
+        LeaseHeldError: If another process has taken the lease over; the job
+            must stop writing.
+    """
+    lease = _held_leases.get(id(con))
+    if lease is None or (not force and time.monotonic() < lease['renew_at']):
+        return
+    if not renew_lease(con, lease['name'], lease['ttl']):
+        del _held_leases[id(con)]
+        raise LeaseHeldError(f"Lease '{lease['name']}' was taken over by another process")
+    lease['renew_at'] = time.monotonic() + lease['ttl'] / 3
+
+@contextmanager
+def hold_lease(con: duckdb.DuckDBPyConnection, job: str, name: str = WRITER_LEASE,
+               ttl_seconds: float = LEASE_TTL_SECONDS) -> Iterator[None]:
+    """
+    Holds the lease for the duration of the block and releases it on exit.
+    The job renews it through renew_lease_if_due on `con` (per page, at
+    checkpoints and stage boundaries), so a single statement must not run
+    longer than the TTL.
+
+    Raises:
+        LeaseHeldError: If another live process holds the lease (on entry,
+            or from renew_lease_if_due once it has been taken over).
+    """
+    acquired, current = acquire_lease(con, job, name, ttl_seconds)
+    if not acquired:
+        raise LeaseHeldError(
+            f"Lease '{name}' is held by {current['holder']} (job '{current['job']}', "
+            f"since {current['acquired_at']}, expires {current['expires_at']})"
+        )
+    _held_leases[id(con)] = {'name': name, 'ttl': ttl_seconds, 'renew_at': time.monotonic() + ttl_seconds / 3}
+    try:
+        yield
+    finally:
+        _held_leases.pop(id(con), None)
+        release_lease(con, name)
@@ -0,0 +1,91 @@
+import sys
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+# items_current columns produced by normalize_item, in load order
+ITEM_COLUMNS = (
+    'item_id', 'title', 'item_type', 'owner', 'url', 'access', 'created_at', 'modified_at',
+    'tags_json', 'tags_count', 'snippet', 'snippet_len', 'description', 'description_len',
+    'thumbnail', 'has_thumbnail', 'extent_xmin', 'extent_ymin', 'extent_xmax', 'extent_ymax',
+    'has_extent', 'has_description', 'num_views', 'content_hash', 'raw_fingerprint',
+    'last_seen_run_id', 'last_seen_at'
+)
+# Held as epoch ms ints in <name>_ms slots and converted on access / per batch
+TIMESTAMP_COLUMNS = ('created_at', 'modified_at', 'last_seen_at')
+
+def _ms_slot(column: str) -> str:
+    return column[:-len('_at')] + '_ms' if column in TIMESTAMP_COLUMNS else column
+
+def ms_to_datetime(ms: Optional[int]) -> Optional[datetime]:
+    return datetime.fromtimestamp(ms / 1000.0, tz=timezone.utc) if ms is not None else None
+
+class _SlottedRecord:
+    """Read-only dict-style access, so code written against row dicts keeps working."""
+    __slots__ = ()
+    _columns = ()
+
+    def __getitem__(self, key: str):
+        if key not in self._columns:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default=None):
+        return self[key] if key in self._columns else default
+
+    def keys(self):
+        return self._columns
+
+    def as_dict(self) -> dict:
+        return {column: getattr(self, column) for column in self._columns}
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{c}={getattr(self, c)!r}' for c in self._columns[:2])}, ...)"
+
+class ItemRecord(_SlottedRecord):
+    """
+    A normalized item (one items_current row) in compact form.
+
+    Slotted instead of a per-item dict, timestamps kept as epoch milliseconds
+    (created_at / modified_at / last_seen_at are derived on access) and
+    repeated strings (type, owner, access, run id) interned by normalize_item.
+    """
+    __slots__ = tuple(_ms_slot(c) for c in ITEM_COLUMNS)
+    _columns = ITEM_COLUMNS
+
+    def __init__(self, **values):
+        for slot in self.__slots__:
+            setattr(self, slot, values[slot])
+
+    created_at = property(lambda self: ms_to_datetime(self.created_ms))
+    modified_at = property(lambda self: ms_to_datetime(self.modified_ms))
+    last_seen_at = property(lambda self: ms_to_datetime(self.last_seen_ms))
+
+class HealthTarget(_SlottedRecord):
+    """An item URL to health check."""
+    __slots__ = ('item_id', 'url')
+    _columns = __slots__
+
+    def __init__(self, item_id: str, url: Optional[str]):
+        self.item_id = item_id
+        self.url = url
+
+def intern_str(value: Optional[str]) -> Optional[str]:
+    """Interns low-cardinality strings repeated across items."""
+    return sys.intern(value) if isinstance(value, str) else value
+
+def records_to_columns(records: List[ItemRecord]) -> Dict[str, object]:
+    """
+    Converts records into a columnar batch ({column: values}) for bulk_insert or
+    a DataFrame. Timestamp columns become UTC datetime64 arrays in one
+    vectorized conversion instead of one datetime object per value.
+    """
+    columns = {}
+    for column in ITEM_COLUMNS:
+        slot = _ms_slot(column)
+        values = [getattr(r, slot) for r in records]
+        if column in TIMESTAMP_COLUMNS:
+            values = pd.to_datetime(pd.array(values, dtype="Int64"), unit='ms', utc=True)
+        columns[column] = values
+    return columns
@@ -0,0 +1,256 @@
+import logging
+import threading
+import time
+import uuid
+import duckdb
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from src.storage.duckdb_client import connect
+from src.pipeline.leases import hold_lease, LeaseHeldError
+from src.pipeline.snapshot import run_snapshot, resume_snapshot, RunNotResumableError
+from src.pipeline.health_refresh import run_health_refresh
+from src.storage.retention import archive_old_runs
+
+logger = logging.getLogger(__name__)
+
+JOB_KINDS = ('full', 'incremental', 'health', 'retention')
+
+# A pending job of the key kind makes a pending job of these kinds redundant
+SUPERSEDES = {'full': ('incremental',)}
+
+# Seconds to wait before retrying a job whose lease (or database file) is held by another process
+LEASE_RETRY_SECONDS = 30
+
+# Longest sleep between schedule checks, so stop requests and clock changes are noticed
+SCHEDULER_TICK_SECONDS = 30
+
+_CRON_ALIASES = {
+    '@hourly': '0 * * * *',
+    '@daily': '0 0 * * *',
+    '@midnight': '0 0 * * *',
+    '@weekly': '0 0 * * 0',
+    '@monthly': '0 0 1 * *',
+}
+
+# (min, max) of minute, hour, day of month, month, day of week (0 = Sunday; 7 is accepted too)
+_CRON_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+def _parse_cron_field(field: str, low: int, high: int) -> frozenset:
+    values = set()
+    for part in field.split(','):
+        step = 1
+        if '/' in part:
+            part, step_text = part.split('/', 1)
+            step = int(step_text)
+            if step < 1:
+                raise ValueError(f"Invalid step in cron field '{field}'")
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start, end = (int(v) for v in part.split('-', 1))
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if not low <= start <= end <= high:
+            raise ValueError(f"Cron field '{field}' out of range {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+class CronSchedule:
+    """
+    A standard 5-field cron expression ("minute hour day-of-month month
+    day-of-week", with *, lists, ranges and /steps) or one of @hourly, @daily,
+    @midnight, @weekly, @monthly. Evaluated in local time. As in cron, when
+    both day fields are restricted (neither starts with '*') a day matching
+    either one fires.
+    """
+
+    def __init__(self, expression: str):
+        self.expression = expression.strip()
+        fields = _CRON_ALIASES.get(self.expression.lower(), self.expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: '{expression}'")
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            _parse_cron_field(f, low, high) for f, (low, high) in zip(fields, _CRON_RANGES)
+        )
+        self.weekdays = frozenset(d % 7 for d in weekdays)
+        # As in cron, a field starting with '*' (including '*/N') counts as unrestricted
+        self._any_day = fields[2].startswith('*')
+        self._any_weekday = fields[4].startswith('*')
+
+    def _day_matches(self, dt: datetime) -> bool:
+        day_ok = dt.day in self.days
+        weekday_ok = (dt.weekday() + 1) % 7 in self.weekdays
+        if self._any_day or self._any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, after: datetime) -> datetime:
+        """The first fire time strictly after `after`."""
+        dt = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = dt + timedelta(days=366 * 5)
+        while dt < limit:
+            if dt.month not in self.months:
+                dt = (dt.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(dt):
+                dt = dt.replace(hour=0, minute=0) + timedelta(days=1)
+            elif dt.hour not in self.hours:
+                dt = dt.replace(minute=0) + timedelta(hours=1)
+            elif dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+            else:
+                return dt
+        raise ValueError(f"Cron expression never fires: '{self.expression}'")
+
+    def __repr__(self):
+        return f"CronSchedule({self.expression!r})"
+
+class ScheduledJob:
+    """A snapshot job of one kind (see JOB_KINDS) with its schedule and run_snapshot options."""
+
+    def __init__(self, name: str, kind: str, cron: str, options: Optional[dict] = None):
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind '{kind}' (expected one of {', '.join(JOB_KINDS)})")
+        self.name = name
+        self.kind = kind
+        self.schedule = CronSchedule(cron)
+        self.options = options or {}
+        self.next_at: Optional[datetime] = None
+        self.failed_run_id: Optional[str] = None # resumed on the next trigger
+        self.coalesced = 0
+
+class SnapshotScheduler:
+    """
+    Runs snapshot jobs on their cron schedules, one at a time.
+
+    Due jobs go into a pending queue. A job that fires again while it is
+    still pending (for example because a long run covered several of its
+    fire times) is queued only once, and a pending full snapshot drops
+    pending incremental ones. Each job runs on a fresh connection while
+    holding the warehouse writer lease; the connection is closed between
+    jobs so the app and manual runs can use the database. The portal
+    session (`gis`) is created once by the caller and reused by every job.
+    A snapshot job that fails leaves its run unfinished, and that run is
+    resumed from its checkpoint the next time the job fires. Health jobs
+    (run_health_refresh) start a new run every time; retention jobs
+    (archive_old_runs) create no run.
+    """
+
+    def __init__(self, gis, jobs: List[ScheduledJob],
+                 connect_fn: Callable[[], duckdb.DuckDBPyConnection] = connect,
+                 lease_retry_seconds: float = LEASE_RETRY_SECONDS):
+        names = [job.name for job in jobs]
+        if len(set(names)) != len(names):
+            raise ValueError("Scheduled job names must be unique")
+        self.gis = gis
+        self.jobs: Dict[str, ScheduledJob] = {job.name: job for job in jobs}
+        self.connect_fn = connect_fn
+        self.lease_retry_seconds = lease_retry_seconds
+        self.pending: List[str] = []
+        self._retry_at = 0.0
+        self._stop = threading.Event()
+
+    def stop(self) -> None:
+        """Stops after the job in progress (if any) has finished."""
+        self._stop.set()
+
+    def enqueue(self, name: str) -> None:
+        """Queues a job, coalescing it with a pending run of itself or of a job that supersedes it."""
+        job = self.jobs[name]
+        if name in self.pending:
+            job.coalesced += 1
+            logger.info(f"Job '{name}' is already pending; trigger coalesced")
+            return
+        for other in self.pending:
+            if job.kind in SUPERSEDES.get(self.jobs[other].kind, ()):
+                job.coalesced += 1
+                logger.info(f"Job '{name}' skipped: pending job '{other}' covers it")
+                return
+        superseded = [other for other in self.pending if self.jobs[other].kind in SUPERSEDES.get(job.kind, ())]
+        for other in superseded:
+            self.pending.remove(other)
+            self.jobs[other].coalesced += 1
+            logger.info(f"Pending job '{other}' dropped: job '{name}' covers it")
+        self.pending.append(name)
+
+    def _check_due(self, now: datetime) -> None:
+        for job in self.jobs.values():
+            if job.next_at is None:
+                job.next_at = job.schedule.next_after(now)
+                logger.info(f"Job '{job.name}' ({job.kind}, '{job.schedule.expression}') next at {job.next_at}")
+            elif now >= job.next_at:
+                # Fire times missed while another job ran collapse into this one trigger
+                self.enqueue(job.name)
+                job.next_at = job.schedule.next_after(now)
+
+    def run_job(self, job: ScheduledJob, con: duckdb.DuckDBPyConnection):
+        """
+        Runs (or resumes) one job on `con`. Returns run_snapshot's /
+        run_health_refresh's result. When a snapshot run fails part-way, its
+        id is kept in `job.failed_run_id` so the next trigger resumes it.
+        """
+        if job.kind == 'health':
+            return run_health_refresh(con, triggered_by='schedule', **job.options)
+        if job.kind == 'retention':
+            return archive_old_runs(con, **job.options)
+        if job.failed_run_id:
+            run_id = job.failed_run_id
+            try:
+                logger.info(f"Job '{job.name}': resuming failed run {run_id}")
+                result = resume_snapshot(con, self.gis, run_id)
+                job.failed_run_id = None
+                return result
+            except RunNotResumableError as e:
+                # Finished or resumed elsewhere in the meantime: start a new run
+                logger.info(f"Job '{job.name}': run {run_id} not resumable ({e})")
+                job.failed_run_id = None
+        run_id = str(uuid.uuid4())
+        try:
+            return run_snapshot(con, self.gis, incremental=job.kind == 'incremental',
+                                triggered_by='schedule', run_id=run_id, **job.options)
+        except Exception:
+            # Failed before the runs row was written (e.g. the incremental cap check): nothing to resume
+            row = con.execute("SELECT 1 FROM runs WHERE run_id = ? AND finished_at IS NULL", (run_id,)).fetchone()
+            job.failed_run_id = run_id if row else None
+            raise
+
+    def _run_next(self) -> None:
+        job = self.jobs[self.pending[0]]
+        try:
+            con = self.connect_fn()
+        except duckdb.IOException as e:
+            logger.warning(f"Database busy ({e}); job '{job.name}' retries in {self.lease_retry_seconds:.0f}s")
+            self._retry_at = time.monotonic() + self.lease_retry_seconds
+            return
+        started = time.perf_counter()
+        try:
+            with hold_lease(con, job.kind):
+                self.pending.pop(0)
+                logger.info(f"Job '{job.name}' started")
+                try:
+                    self.run_job(job, con)
+                    logger.info(f"Job '{job.name}' finished in {time.perf_counter() - started:.1f}s")
+                except Exception as e:
+                    logger.error(f"Job '{job.name}' failed: {e}"
+                                 + (f" (run {job.failed_run_id} will be resumed)" if job.failed_run_id else ""))
+        except LeaseHeldError as e:
+            logger.warning(f"{e}; job '{job.name}' retries in {self.lease_retry_seconds:.0f}s")
+            self._retry_at = time.monotonic() + self.lease_retry_seconds
+        finally:
+            con.close()
+
+    def run_forever(self) -> None:
+        """Runs until stop() is called (e.g. from a SIGTERM handler)."""
+        logger.info(f"Scheduler started with jobs: {', '.join(self.jobs)}")
+        while not self._stop.is_set():
+            self._check_due(datetime.now())
+            if self.pending and time.monotonic() >= self._retry_at:
+                self._run_next()
+                continue
+            wake = min(job.next_at for job in self.jobs.values())
+            wait = (wake - datetime.now()).total_seconds()
+            if self.pending:
+                wait = min(wait, self._retry_at - time.monotonic())
+            self._stop.wait(min(max(wait, 0.1), SCHEDULER_TICK_SECONDS))
+        logger.info("Scheduler stopped")
@@ -1,17 +1,51 @@
+import collections
+import contextlib
+import copy
 import hashlib
 import json
 import logging
+import os
 import uuid
 import duckdb
-import requests
 import concurrent.futures
+import multiprocessing
+import queue
+import threading
+import time
 from datetime import datetime, timezone
-from typing import List, Dict, Optional, Tuple, Any
+from typing import List, Dict, Optional, Tuple, Iterator
+
+from src.pipeline.health import (
+    run_health_checks, StreamingHealthChecker, HEALTH_CONCURRENCY, HEALTH_PER_HOST_LIMIT,
+    HEALTH_CACHE_TTL_MINUTES, HEALTH_BREAKER_THRESHOLD, HEALTH_COVERAGE_WINDOW_HOURS
+)
+from src.pipeline.records import ItemRecord, HealthTarget, intern_str, records_to_columns
+from src.pipeline.instrumentation import track_stage, busy, metered_pages
+from src.services.portal_search import PortalSearchClient
+from src.services.request_governor import governed, get_governor, total_retries
+from src.pipeline.checkpoints import load_checkpoints, save_checkpoint, stage_done, STAGE_RUNNING, STAGE_DONE
+from src.pipeline.leases import renew_lease_if_due
+from src.storage.bulk_load import bulk_insert, rows_to_frame
+from src.storage.raw_archive import RawArchiveWriter, archive_exists, iter_archive_pages
+from src.tools.scoring import compute_quality_scores
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# ArcGIS search paging: max page size and the start+num window a single query can reach
+SEARCH_PAGE_SIZE = 100
+SEARCH_WINDOW_LIMIT = 10000
+
+# Incremental runs re-read this much before the watermark to absorb search index lag
+INCREMENTAL_LOOKBACK_MINUTES = 15
+
+# Endpoints probed between health-stage checkpoints
+HEALTH_CHECKPOINT_BATCH = 500
+
+# Fetched pages that may wait for the loader (bounds memory when loading is the bottleneck)
+PREFETCH_PAGES = 4
+
 def generate_content_hash(item: dict) -> str:
     """Computes a stable SHA256 hash of relevant item fields."""
     # usage of a few key fields that determine 'content' change
@@ -28,23 +62,33 @@ def generate_content_hash(item: dict) -> str:
     serialized = json.dumps(data, sort_keys=True, default=str)
     return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
 
-def normalize_item(raw: dict, run_id: uuid.UUID) -> dict:
-    """Normalizes a raw ArcGIS item dict into the DB schema format."""
-    
-    # 1. Basic Fields
-    now_utc = datetime.now(timezone.utc)
-    
-    # Handle timestamps (ArcGIS uses epoch ms)
-    def ms_to_datetime(ms):
-        if ms:
-            try:
-                return datetime.fromtimestamp(ms / 1000.0, tz=timezone.utc)
-            except:
-                return None
+# Raw fields normalize_item reads. Bump FINGERPRINT_VERSION whenever normalization
+# changes, so the next run re-normalizes every item instead of skipping them.
+FINGERPRINT_FIELDS = (
+    'id', 'title', 'type', 'owner', 'url', 'access', 'created', 'modified',
+    'tags', 'snippet', 'description', 'thumbnail', 'extent', 'numViews'
+)
+FINGERPRINT_VERSION = 1
+
+def raw_fingerprint(raw: dict) -> str:
+    """
+    Cheap fingerprint of everything normalize_item reads from a raw item.
+
+    Unlike content_hash (the history change key), it covers every stored field,
+    including numViews, and skips JSON serialization and SHA-256.
+    """
+    values = repr((FINGERPRINT_VERSION,) + tuple(raw.get(k) for k in FINGERPRINT_FIELDS))
+    return hashlib.blake2b(values.encode('utf-8'), digest_size=16).hexdigest()
+
+def _epoch_ms(value) -> Optional[int]:
+    """ArcGIS timestamps are epoch ms; missing, zero or malformed values become None."""
+    try:
+        return int(value) if value else None
+    except (TypeError, ValueError):
         return None
 
-    created = ms_to_datetime(raw.get('created'))
-    modified = ms_to_datetime(raw.get('modified'))
+def normalize_item(raw: dict, run_id: uuid.UUID) -> ItemRecord:
+    """Normalizes a raw ArcGIS item dict into the DB schema format (a compact ItemRecord)."""
     
     # Handle Tags
     tags = raw.get('tags', [])
@@ -73,339 +117,1064 @@ def normalize_item(raw: dict, run_id: uuid.UUID) -> dict:
     description = raw.get('description') or ""
     thumbnail = raw.get('thumbnail')
     
-    # Calculate Hash
-    content_hash = generate_content_hash(raw)
-    
-    return {
-        'item_id': raw.get('id'),
-        'title': raw.get('title') or "Untitled",
-        'item_type': raw.get('type') or "Unknown",
-        'owner': raw.get('owner') or "Unknown",
-        'url': raw.get('url'),
-        'access': raw.get('access'),
-        'created_at': created,
-        'modified_at': modified,
-        'tags_json': tags_json,
-        'tags_count': len(tags),
-        'snippet': snippet,
-        'snippet_len': len(snippet),
-        'description': description,
-        'description_len': len(description),
-        'thumbnail': thumbnail,
-        'has_thumbnail': bool(thumbnail),
-        'extent_xmin': xmin,
-        'extent_ymin': ymin,
-        'extent_xmax': xmax,
-        'extent_ymax': ymax,
-        'has_extent': has_extent,
-        'has_description': bool(description),
-        'num_views': raw.get('numViews', 0),
-        'content_hash': content_hash,
-        'last_seen_run_id': str(run_id),
-        'last_seen_at': now_utc
-    }
+    return ItemRecord(
+        item_id=raw.get('id'),
+        title=raw.get('title') or "Untitled",
+        item_type=intern_str(raw.get('type') or "Unknown"),
+        owner=intern_str(raw.get('owner') or "Unknown"),
+        url=raw.get('url'),
+        access=intern_str(raw.get('access')),
+        created_ms=_epoch_ms(raw.get('created')),
+        modified_ms=_epoch_ms(raw.get('modified')),
+        tags_json=tags_json,
+        tags_count=len(tags),
+        snippet=snippet,
+        snippet_len=len(snippet),
+        description=description,
+        description_len=len(description),
+        thumbnail=thumbnail,
+        has_thumbnail=bool(thumbnail),
+        extent_xmin=xmin,
+        extent_ymin=ymin,
+        extent_xmax=xmax,
+        extent_ymax=ymax,
+        has_extent=has_extent,
+        has_description=bool(description),
+        num_views=raw.get('numViews', 0),
+        content_hash=generate_content_hash(raw),
+        raw_fingerprint=raw_fingerprint(raw),
+        last_seen_run_id=intern_str(str(run_id)),
+        last_seen_ms=int(time.time() * 1000)
+    )
 
-def fetch_items(gis, max_items: int, query: str = None, item_types: List[str] = None) -> List[dict]:
-    """Fetches items from ArcGIS."""
-    
-    # Build Query
+def normalize_batch(raw_items: List[dict], run_id: uuid.UUID) -> Dict[str, list]:
+    """
+    Normalizes a chunk of raw items into a columnar batch ({column: values}),
+    which pickles compactly between processes and loads directly with bulk_insert.
+    """
+    if not raw_items:
+        return {}
+    return records_to_columns([normalize_item(r, run_id) for r in raw_items])
+
+# Pages normalized inline before a process pool is started: spawning the workers takes about
+# 0.5-1 s each (they import the pipeline), normalizing a page about 7 ms, so shorter runs never
+# win it back
+NORMALIZE_POOL_MIN_PAGES = 100
+
+def normalize_workers(workers: int) -> int:
+    """Normalize processes worth starting for `workers`: none (1, inline) on a single CPU."""
+    cpus = os.cpu_count() or 1
+    return min(workers, cpus) if cpus >= 2 else 1
+
+def create_normalize_pool(workers: int) -> concurrent.futures.ProcessPoolExecutor:
+    """
+    Process pool for normalize_batch. Uses 'spawn' so workers never inherit the
+    parent's DuckDB connection or harvest threads.
+    """
+    return concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context('spawn')
+    )
+
+def build_search_query(query: str = None, item_types: List[str] = None) -> str:
+    """Builds the ArcGIS search query string used by the fetch stage."""
     base_query = query if query else 'access:public'
     if item_types:
         types_q = " OR ".join([f'type:"{t}"' for t in item_types])
         base_query = f"({base_query}) AND ({types_q})"
-        
-    logger.info(f"Fetching max {max_items} items with query: {base_query}")
-    
-    results = []
-    
-    try:
-        # Paging logic using advanced_search if possible, or basic search
-        # For simplicity in this implementation, we'll use search() which handles max_items internally roughly
-        # usually up to 10k. 
-        # advanced_search is better for deep paging but search() is simpler for the requested verification scope.
-        # We will request 100 at a time manually if needed, but gis.content.search does paging.
-        
-        items = gis.content.search(query=base_query, max_items=max_items, outside_org=True)
-        
-        for item in items:
-            # Normalize to dict right away
-            results.append(dict(item))
-            
-    except Exception as e:
-        logger.error(f"Error fetching items: {e}")
-        # If basics fail, try a very simple query fallback if it was complex? No, just fail for now or return partial
-        pass
-        
-    return results
+    return base_query
 
-def calculate_quality_scores(items: List[dict], run_id: uuid.UUID) -> List[dict]:
-    """Calculates quality scores for a batch of items."""
-    scores = []
-    now = datetime.now(timezone.utc)
-    
-    for item in items:
-        score = 0
-        breakdown = {}
-        missing = []
-        
-        # 1. Description (+20)
-        if item['has_description']:
-            score += 20
-            breakdown['has_description'] = 20
-        else:
-            missing.append('description')
-            
-        # 2. Tags (+15)
-        if item['tags_count'] >= 3:
-            score += 15
-            breakdown['tags_count'] = 15
-        elif item['tags_count'] == 0:
-            missing.append('tags')
-            
-        # 3. Extent (+15)
-        if item['has_extent']:
-            score += 15
-            breakdown['has_extent'] = 15
-            
-        # 4. Thumbnail (+5)
-        if item['has_thumbnail']:
-            score += 5
-            breakdown['has_thumbnail'] = 5
+def _created_range_term(lower_ms: int, upper_ms: int) -> str:
+    """ArcGIS date range filters expect zero-padded epoch milliseconds."""
+    return f"created:[{int(lower_ms):019d} TO {int(upper_ms):019d}]"
+
+def _search(gis, **kwargs):
+    """gis.content.advanced_search through the portal host's request governor."""
+    if isinstance(gis, PortalSearchClient):
+        return gis.content.advanced_search(**kwargs) # governs its own requests
+    return governed(gis.url, gis.content.advanced_search, **kwargs)
+
+def iter_item_pages(gis, query: str, max_items: Optional[int] = None,
+                    page_size: int = SEARCH_PAGE_SIZE, cursor: Optional[dict] = None) -> Iterator[List[dict]]:
+    """
+    Yields raw ArcGIS item dicts page by page.
+
+    Pages with explicit start/num/nextStart cursors (advanced search), sorted by
+    creation date. When the cursor gets close to the search API's deep-paging
+    window, the query is re-anchored on the last seen `created` timestamp and
+    paging restarts at start=1, so harvests are not capped at the window size.
+    Items sharing the anchor timestamp are de-duplicated across the restart.
+
+    When `cursor` is given, paging continues from its state and the dict is
+    updated in place (JSON-serializable) just before each page is yielded, so a
+    caller that saves it after loading a page records where to resume.
+
+    Searches go through the portal's request governor, which retries throttled
+    and transient failures; an error that persists is raised rather than
+    ending the harvest early with a partial result.
+    """
+    state = {
+        'start': 1, 'window_query': query, 'anchor_ms': None, 'anchor_ids': [],
+        'last_created': None, 'last_created_ids': [], 'yielded': 0, 'done': False
+    }
+    if cursor:
+        state.update(cursor)
+    if state['done']:
+        return
+    yielded = state['yielded']
+    start = state['start']
+    window_query = state['window_query']
+    anchor_ms = state['anchor_ms']
+    anchor_ids = set(state['anchor_ids'])
+    last_created = state['last_created']
+    last_created_ids = set(state['last_created_ids'])
+
+    while True:
+        num = page_size
+        if max_items is not None:
+            num = min(num, max_items - yielded)
+            if num <= 0:
+                return
+
+        try:
+            response = _search(
+                gis, query=window_query, start=start, max_items=num,
+                sort_field='created', sort_order='asc', as_dict=True
+            )
+        except Exception as e:
+            logger.error(f"Error fetching items (start={start}): {e}")
+            raise
+
+        results = response.get('results') or []
+        page = []
+        for raw in results:
+            created = raw.get('created')
+            if anchor_ms is not None and created == anchor_ms and raw.get('id') in anchor_ids:
+                continue
+            if created != last_created:
+                last_created = created
+                last_created_ids = set()
+            last_created_ids.add(raw.get('id'))
+            page.append(raw)
+        yielded += len(page)
+
+        finished = False
+        next_start = response.get('nextStart', -1)
+        if not results or next_start is None or next_start < 1:
+            finished = True
+        elif next_start + page_size - 1 > SEARCH_WINDOW_LIMIT:
+            # Re-anchor: continue from the last created timestamp in a fresh window
+            if last_created is None or last_created == anchor_ms and last_created_ids <= anchor_ids:
+                logger.warning("Deep paging stalled: a single created timestamp fills the search window")
+                finished = True
+            else:
+                if last_created == anchor_ms:
+                    last_created_ids |= anchor_ids
+                anchor_ms = last_created
+                anchor_ids = set(last_created_ids)
+                upper_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+                window_query = f"({query}) AND {_created_range_term(anchor_ms, upper_ms)}"
+                start = 1
+                logger.info(f"Re-anchored search window at created={anchor_ms} after {yielded} items")
         else:
-            missing.append('thumbnail')
-            
-        # 5. Snippet Length (+5)
-        if 20 <= item['snippet_len'] <= 200:
-            score += 5
-            breakdown['snippet_len'] = 5
-            
-        # 6. Title Length (+5)
-        if 10 <= len(item.get('title', '')) <= 120:
-             score += 5
-             breakdown['title_len'] = 5
-             
-        # 7. Freshness (+20)
-        if item['modified_at']:
-            age = (now - item['modified_at']).days
-            if age <= 180:
-                score += 20
-                breakdown['freshness'] = 20
-        
-        # 8. URL (+10)
-        if item['url']:
-            score += 10
-            breakdown['url'] = 10
-            
-        # Clamp
-        score = min(max(score, 0), 100)
-        
-        scores.append({
-            'run_id': str(run_id),
-            'item_id': item['item_id'],
-            'score': score,
-            'breakdown_json': json.dumps(breakdown),
-            'missing_json': json.dumps(missing),
-            'computed_at': now
-        })
-        
-    return scores
+            start = next_start
+
+        if cursor is not None:
+            cursor.update({
+                'start': start, 'window_query': window_query, 'anchor_ms': anchor_ms,
+                'anchor_ids': sorted(anchor_ids), 'last_created': last_created,
+                'last_created_ids': sorted(last_created_ids), 'yielded': yielded, 'done': finished
+            })
+        if page:
+            yield page
+        if finished:
+            return
+
+PARTITION_STRATEGIES = ('type', 'owner', 'modified')
+
+# Upper bound of an open-ended `modified` range: the largest 19-digit value the search index compares
+MODIFIED_OPEN_UPPER = "9" * 19
+
+def _modified_range_term(lower_ms: int, upper_ms: Optional[int] = None) -> str:
+    """`modified` range query term; without `upper_ms` the range is open-ended."""
+    upper = MODIFIED_OPEN_UPPER if upper_ms is None else f"{int(upper_ms):019d}"
+    return f"modified:[{int(lower_ms):019d} TO {upper}]"
+
+def build_partitions(gis, query: str, strategy: str, item_types: List[str] = None,
+                     owners: List[str] = None, num_partitions: int = 4) -> List[dict]:
+    """
+    Splits a search into disjoint partitions for parallel harvesting.
+
+    Strategies:
+        type: one partition per entry of item_types.
+        owner: one partition per owner, plus a remainder for everyone else.
+        modified: num_partitions equal `modified` date ranges, from the oldest
+            matching item up to now. The last range is open-ended, so items
+            modified while the harvest runs are not missed.
+
+    Returns:
+        List[dict]: [{'name': str, 'query': str}, ...]
+    """
+    if strategy == 'type':
+        if not item_types:
+            raise ValueError("Partitioning by type requires item types")
+        return [{'name': f"type={t}", 'query': build_search_query(query, [t])} for t in item_types]
+
+    base_query = build_search_query(query, item_types)
+
+    if strategy == 'owner':
+        if not owners:
+            raise ValueError("Partitioning by owner requires a list of owners")
+        partitions = [{'name': f"owner={o}", 'query': f'({base_query}) AND owner:"{o}"'} for o in owners]
+        owners_q = " OR ".join([f'owner:"{o}"' for o in owners])
+        partitions.append({'name': "owner=<other>", 'query': f"({base_query}) AND NOT ({owners_q})"})
+        return partitions
+
+    if strategy == 'modified':
+        oldest = _search(
+            gis, query=base_query, start=1, max_items=1,
+            sort_field='modified', sort_order='asc', as_dict=True
+        ).get('results') or []
+        upper_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+        if not oldest or not oldest[0].get('modified'):
+            return [{'name': "all", 'query': base_query}]
+        lower_ms = int(oldest[0]['modified'])
+        step = max((upper_ms - lower_ms) // max(num_partitions, 1) + 1, 1)
+        partitions = []
+        for lo in range(lower_ms, upper_ms + 1, step):
+            hi = lo + step - 1 if lo + step <= upper_ms else None
+            partitions.append({
+                'name': f"modified={datetime.fromtimestamp(lo / 1000.0, tz=timezone.utc):%Y-%m-%d}",
+                'query': f"({base_query}) AND {_modified_range_term(lo, hi)}"
+            })
+        return partitions
 
-def check_url_health(url: str, timeout: int = 5) -> Dict[str, Any]:
-    """Performs a HEAD/GET request to check URL health."""
+    raise ValueError(f"Unknown partition strategy '{strategy}' (expected one of {PARTITION_STRATEGIES})")
+
+def iter_partitioned_pages(gis, partitions: List[dict], max_items: Optional[int] = None,
+                           max_workers: int = 4, timings: Optional[List[dict]] = None,
+                           cursor: Optional[dict] = None) -> Iterator[List[dict]]:
+    """
+    Harvests partitions concurrently in a bounded thread pool and yields
+    de-duplicated pages of raw item dicts as they arrive.
+
+    Workers hand pages over through a bounded queue, so a slow consumer applies
+    backpressure instead of letting fetched pages pile up in memory. Per-partition
+    timings are appended to `timings` when provided.
+
+    `cursor` works as in iter_item_pages: {'yielded': n, 'partitions': [...]}
+    holds one page cursor per partition and is updated before each page is
+    yielded, to the position of pages the caller has actually received.
+    """
+    if cursor is not None:
+        cursor.setdefault('yielded', 0)
+        cursor.setdefault('partitions', [{} for _ in partitions])
+    pages = queue.Queue(maxsize=max_workers * 2)
+    stop = threading.Event()
+    done = object()
+
+    def put(entry):
+        while not stop.is_set():
+            try:
+                pages.put(entry, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def harvest(index, partition):
+        t0 = time.perf_counter()
+        n_items = n_pages = 0
+        # Private copy: the shared cursor only advances as the consumer receives pages
+        partition_cursor = dict(cursor['partitions'][index]) if cursor is not None else None
+        error = None
+        try:
+            for page in iter_item_pages(gis, partition['query'], max_items=max_items, cursor=partition_cursor):
+                n_items += len(page)
+                n_pages += 1
+                snapshot = dict(partition_cursor) if partition_cursor is not None else None
+                if not put((index, page, snapshot)):
+                    break
+        except Exception as e:
+            error = e
+        finally:
+            put((done, {
+                'partition': partition['name'],
+                'items': n_items,
+                'pages': n_pages,
+                'seconds': round(time.perf_counter() - t0, 3),
+                'error': error
+            }))
+
+    seen_ids = set()
+    yielded = cursor['yielded'] if cursor is not None else 0
+    remaining = len(partitions)
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
     try:
-        # Try HEAD first
-        response = requests.head(url, timeout=timeout, allow_redirects=True)
-        # If method not allowed, try GET
-        if response.status_code == 405:
-            response = requests.get(url, timeout=timeout, stream=True)
-            response.close() # Close quickly
-            
-        if response.status_code < 400:
-            return {
-                'ok': True,
-                'status_code': response.status_code,
-                'latency_ms': int(response.elapsed.total_seconds() * 1000),
-                'error_message': None
-            }
-        else:
-            return {
-                'ok': False,
-                'status_code': response.status_code,
-                'latency_ms': int(response.elapsed.total_seconds() * 1000),
-                'error_message': f"HTTP {response.status_code}"
-            }
-    except Exception as e:
-        return {
-            'ok': False,
-            'status_code': None,
-            'latency_ms': None,
-            'error_message': str(e)
-        }
-
-def run_health_checks(items: List[dict], run_id: uuid.UUID, max_workers: int = 10) -> List[dict]:
-    """Runs concurrent health checks on item URLs."""
-    results = []
-    
-    # Filter items with URLs
-    items_to_check = [i for i in items if i.get('url')]
-    
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Map futures to item_ids
-        future_to_item = {
-            executor.submit(check_url_health, item['url']): item 
-            for item in items_to_check
-        }
-        
-        for future in concurrent.futures.as_completed(future_to_item):
-            item = future_to_item[future]
+        for index, partition in enumerate(partitions):
+            executor.submit(harvest, index, partition)
+
+        while remaining:
+            entry = pages.get()
+            if isinstance(entry, tuple) and entry[0] is done:
+                remaining -= 1
+                stats = entry[1]
+                logger.info(f"Partition {stats['partition']}: {stats['items']} items, "
+                            f"{stats['pages']} pages in {stats['seconds']}s")
+                if timings is not None:
+                    timings.append(stats)
+                if stats['error'] is not None:
+                    raise stats['error']
+                continue
+
+            index, raw_page, snapshot = entry
+            page = []
+            for raw in raw_page:
+                if raw.get('id') in seen_ids:
+                    continue
+                seen_ids.add(raw.get('id'))
+                page.append(raw)
+            if max_items is not None:
+                page = page[:max_items - yielded]
+            yielded += len(page)
+            if cursor is not None:
+                cursor['partitions'][index] = snapshot
+                cursor['yielded'] = yielded
+            if page:
+                yield page
+            if max_items is not None and yielded >= max_items:
+                return
+    finally:
+        stop.set()
+        executor.shutdown(wait=True)
+
+def prefetch_pages(pages: Iterator[List[dict]], cursor: Optional[dict] = None,
+                   max_pages: int = PREFETCH_PAGES) -> Iterator[Tuple[List[dict], Optional[dict]]]:
+    """
+    Runs a page iterator on a background thread, so the next pages are fetched
+    while the caller normalizes and loads the current one.
+
+    Yields (page, cursor_snapshot), where the snapshot is a copy of `cursor` as
+    of that page (the shared cursor runs ahead of the caller). At most
+    `max_pages` fetched pages wait in the queue; the fetch thread blocks beyond
+    that. Errors raised while fetching are re-raised in the caller.
+    """
+    handoff = queue.Queue(maxsize=max_pages)
+    stop = threading.Event()
+    end = object()
+
+    def put(entry):
+        while not stop.is_set():
             try:
-                res = future.result()
-                res['run_id'] = str(run_id)
-                res['item_id'] = item['item_id']
-                res['checked_url'] = item['url']
-                res['checked_at'] = datetime.now(timezone.utc)
-                results.append(res)
-            except Exception as e:
-                logger.error(f"Health check execution error for {item['item_id']}: {e}")
-                
-    return results
+                handoff.put(entry, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for page in pages:
+                if not put((page, copy.deepcopy(cursor) if cursor is not None else None)):
+                    break
+        except Exception as e:
+            put((end, e))
+            return
+        finally:
+            if hasattr(pages, 'close'):
+                pages.close()
+        put((end, None))
+
+    producer = threading.Thread(target=produce, name="snapshot-fetch", daemon=True)
+    producer.start()
+    try:
+        while True:
+            page, snapshot = handoff.get()
+            if page is end:
+                if snapshot is not None:
+                    raise snapshot
+                return
+            yield page, snapshot
+    finally:
+        stop.set()
+        producer.join()
+
+def touch_unchanged_items(con: duckdb.DuckDBPyConnection, raw_page: List[dict],
+                          run_id: uuid.UUID, seen_at: datetime) -> List[dict]:
+    """
+    Fast path for re-harvested items: bumps last_seen_run_id/last_seen_at in one
+    statement for items whose raw_fingerprint matches items_current, and
+    returns only the raw items that still need normalizing and upserting.
+    """
+    fingerprints = rows_to_frame(
+        [{'item_id': r.get('id'), 'raw_fingerprint': raw_fingerprint(r)} for r in raw_page],
+        columns=['item_id', 'raw_fingerprint']
+    )
+    con.register("_page_fingerprints", fingerprints)
+    try:
+        unchanged = con.execute("""
+            UPDATE items_current
+            SET last_seen_run_id = $run_id, last_seen_at = $seen_at
+            FROM _page_fingerprints f
+            WHERE items_current.item_id = f.item_id
+            AND items_current.raw_fingerprint = f.raw_fingerprint
+            RETURNING items_current.item_id
+        """, {'run_id': str(run_id), 'seen_at': seen_at}).fetchall()
+    finally:
+        con.unregister("_page_fingerprints")
+    unchanged_ids = {row[0] for row in unchanged}
+    return [r for r in raw_page if r.get('id') not in unchanged_ids]
+
+# --- Incremental Snapshots ---
+
+def get_watermark(con: duckdb.DuckDBPyConnection, portal_url: str, search_query: str) -> Optional[dict]:
+    """Returns the stored modified-time high-water mark for a portal/query, if any."""
+    row = con.execute("""
+        SELECT max_modified_ms, run_id FROM snapshot_watermarks
+        WHERE portal_url = ? AND search_query = ?
+    """, (portal_url, search_query)).fetchone()
+    if not row:
+        return None
+    return {'max_modified_ms': row[0], 'run_id': str(row[1]) if row[1] else None}
+
+def save_watermark(con: duckdb.DuckDBPyConnection, portal_url: str, search_query: str,
+                   max_modified_ms: Optional[int], run_id: uuid.UUID) -> None:
+    """Advances the high-water mark (never moves it backwards) and records the run."""
+    con.execute("""
+        INSERT INTO snapshot_watermarks (portal_url, search_query, max_modified_ms, max_modified_at, run_id, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (portal_url, search_query) DO UPDATE SET
+            max_modified_ms = GREATEST(COALESCE(excluded.max_modified_ms, 0), COALESCE(snapshot_watermarks.max_modified_ms, 0)),
+            max_modified_at = CASE
+                WHEN COALESCE(excluded.max_modified_ms, 0) > COALESCE(snapshot_watermarks.max_modified_ms, 0)
+                THEN excluded.max_modified_at ELSE snapshot_watermarks.max_modified_at END,
+            run_id = excluded.run_id,
+            updated_at = excluded.updated_at
+    """, (
+        portal_url, search_query, max_modified_ms,
+        datetime.fromtimestamp(max_modified_ms / 1000.0, tz=timezone.utc) if max_modified_ms else None,
+        str(run_id), datetime.now(timezone.utc)
+    ))
+
+def plan_incremental_fetch(con: duckdb.DuckDBPyConnection, gis, query: str = None,
+                           item_types: List[str] = None,
+                           lookback_minutes: int = INCREMENTAL_LOOKBACK_MINUTES) -> Tuple[str, str, Optional[dict]]:
+    """
+    Returns (search_query, fetch_query, watermark) for an incremental run:
+    with a stored watermark, fetch_query only matches items modified since
+    the watermark minus `lookback_minutes`; without one it is the full query.
+    """
+    search_query = build_search_query(query, item_types)
+    watermark = get_watermark(con, gis.url, search_query)
+    if not watermark or not watermark['max_modified_ms']:
+        return search_query, query, watermark
+    lower_ms = max(int(watermark['max_modified_ms']) - lookback_minutes * 60 * 1000, 0)
+    upper_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+    return search_query, f"({query if query else 'access:public'}) AND {_modified_range_term(lower_ms, upper_ms)}", watermark
+
+def check_incremental_cap(con: duckdb.DuckDBPyConnection, gis, max_items: Optional[int], query: str = None,
+                          item_types: List[str] = None,
+                          lookback_minutes: int = INCREMENTAL_LOOKBACK_MINUTES) -> None:
+    """
+    Raises ValueError when an incremental run would match more items than
+    `max_items`: a truncated fetch never advances the watermark, so every
+    later run would fetch the same items again.
+    """
+    if max_items is None:
+        return
+    _, fetch_query, _ = plan_incremental_fetch(con, gis, query, item_types, lookback_minutes)
+    matching = _search(gis, query=build_search_query(fetch_query, item_types), return_count=True) or 0
+    if matching > max_items:
+        raise ValueError(f"Incremental run matches {matching} items but max_items is {max_items}; "
+                         f"the watermark could never advance. Raise max_items or fetch all items")
+
+# --- History (SCD2) ---
+
+# items_history columns compared for item_changes field diffs
+HISTORY_DIFF_FIELDS = [
+    'title', 'item_type', 'owner', 'url', 'access', 'modified_at', 'tags_json',
+    'description_len', 'has_extent', 'extent_xmin', 'extent_ymin', 'extent_xmax', 'extent_ymax'
+]
+
+def merge_item_history(con: duckdb.DuckDBPyConnection, run_id: uuid.UUID, changed_at: datetime) -> Dict[str, int]:
+    """
+    Merges this run's items_current rows into items_history (SCD2) and appends
+    change events to item_changes.
+
+    One hash join of the run's items against the current history versions picks
+    out new and changed items (content_hash differs); only those rows are
+    touched: their open version is closed and a new one inserted. Unchanged
+    items are left alone, so the open version's last sighting is
+    items_current.last_seen_run_id rather than items_history.last_seen_run_id.
+
+    Events are 'new', 'restored' (reappeared after its history was closed, e.g.
+    by the deletion sweep) or 'modified', with a {field: {old, new}} diff over
+    HISTORY_DIFF_FIELDS. Changes to fields history does not keep (snippet,
+    thumbnail) produce a 'modified' event with an empty diff.
+
+    Returns:
+        Dict[str, int]: Event counts by change type.
+    """
+    diff = ", ".join(
+        f"CASE WHEN h.{f} IS DISTINCT FROM s.{f} "
+        f"THEN '\"{f}\": ' || json_object('old', h.{f}, 'new', s.{f})::VARCHAR END"
+        for f in HISTORY_DIFF_FIELDS
+    )
+    con.begin()
+    try:
+        con.execute(f"""
+            CREATE OR REPLACE TEMP TABLE stg_history_changes AS
+            SELECT
+                s.*,
+                CASE
+                    WHEN h.item_id IS NOT NULL THEN 'modified'
+                    WHEN s.item_id IN (SELECT item_id FROM items_history) THEN 'restored'
+                    ELSE 'new'
+                END AS change_type,
+                CASE WHEN h.item_id IS NOT NULL
+                     THEN CAST('{{' || concat_ws(', ', {diff}) || '}}' AS JSON) END AS changed_fields
+            FROM items_current s
+            LEFT JOIN items_history h ON h.item_id = s.item_id AND h.is_current
+            WHERE s.last_seen_run_id = $run_id
+            AND (h.item_id IS NULL OR h.content_hash IS DISTINCT FROM s.content_hash)
+        """, {'run_id': str(run_id)})
+
+        # Close the open versions of changed items
+        con.execute("""
+            UPDATE items_history
+            SET valid_to = $changed_at, is_current = false
+            FROM stg_history_changes c
+            WHERE items_history.item_id = c.item_id
+            AND items_history.is_current
+            AND c.change_type = 'modified'
+        """, {'changed_at': changed_at})
+
+        con.execute("""
+            INSERT INTO items_history (
+                item_id, content_hash, valid_from, valid_to, is_current,
+                title, item_type, owner, url, access, modified_at,
+                tags_json, description_len, has_extent,
+                extent_xmin, extent_ymin, extent_xmax, extent_ymax,
+                first_seen_run_id, last_seen_run_id
+            )
+            SELECT
+                item_id, content_hash, $changed_at, NULL, true,
+                title, item_type, owner, url, access, modified_at,
+                tags_json, description_len, has_extent,
+                extent_xmin, extent_ymin, extent_xmax, extent_ymax,
+                $run_id, $run_id
+            FROM stg_history_changes
+        """, {'changed_at': changed_at, 'run_id': str(run_id)})
+
+        con.execute("""
+            INSERT INTO item_changes (run_id, item_id, change_type, changed_fields, changed_at)
+            SELECT $run_id, item_id, change_type, changed_fields, $changed_at
+            FROM stg_history_changes
+        """, {'changed_at': changed_at, 'run_id': str(run_id)})
+
+        counts = dict(con.execute("""
+            SELECT change_type, COUNT(*) FROM stg_history_changes GROUP BY change_type
+        """).fetchall())
+        con.execute("DROP TABLE stg_history_changes")
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    return counts
+
+# --- Deletion Sweep ---
+
+def sweep_deleted_items(con: duckdb.DuckDBPyConnection, gis, query: str = None,
+                        item_types: List[str] = None, swept_at: datetime = None,
+                        run_id: Optional[uuid.UUID] = None, seen_run_id: Optional[uuid.UUID] = None) -> int:
+    """
+    Tombstones items that are no longer returned by the portal (deleted or made private).
+
+    The live ids are loaded into a temp table and anti-joined against
+    items_current. With `seen_run_id`, a complete, unfiltered snapshot run that
+    just fetched the same query, they are the ids that run saw and no search
+    beyond the count is made. Otherwise they are enumerated with paged searches;
+    the search API has no field projection, so whole result pages are read but
+    only ids are kept (nothing is normalized or written per item).
+    Missing items get is_deleted/deleted_at set and their current items_history
+    row closed; with a `run_id`, a 'deleted' event is added to item_changes for
+    each. Only items_current rows in scope of the sweep (matching
+    item_types, when given) are considered, so the sweep should use the same
+    query as the snapshots that populate the warehouse.
+
+    Returns:
+        int: Number of newly tombstoned items.
+    """
+    swept_at = swept_at or datetime.now(timezone.utc)
+    search_query = build_search_query(query, item_types)
+
+    expected = _search(gis, query=search_query, return_count=True)
+
+    con.execute("CREATE OR REPLACE TEMP TABLE sweep_ids (item_id VARCHAR)")
+    enumerated = 0
+    try:
+        if seen_run_id is not None:
+            logger.info(f"Sweeping for deletions: {expected} live ids, taking the ids fetched by run {seen_run_id}")
+            con.execute("""
+                INSERT INTO sweep_ids SELECT item_id FROM items_current WHERE last_seen_run_id = ?
+            """, (str(seen_run_id),))
+            enumerated = con.execute("SELECT COUNT(*) FROM sweep_ids").fetchone()[0]
+        else:
+            logger.info(f"Sweeping for deletions: enumerating {expected} ids with query: {search_query}")
+            for page in iter_item_pages(gis, search_query):
+                renew_lease_if_due(con)
+                enumerated += bulk_insert(con, "sweep_ids", [{'item_id': r['id']} for r in page if r.get('id')])
+
+        if enumerated < (expected or 0):
+            # A partial enumeration would tombstone live items; try again next run
+            logger.warning(f"Deletion sweep aborted: enumerated {enumerated} of {expected} ids")
+            return 0
+
+        scope_sql = ""
+        if item_types:
+            scope_sql = f"AND c.item_type IN ({', '.join(['?'] * len(item_types))})"
+
+        con.execute(f"""
+            CREATE OR REPLACE TEMP TABLE swept_deleted AS
+            SELECT c.item_id
+            FROM items_current c
+            ANTI JOIN sweep_ids s ON c.item_id = s.item_id
+            WHERE COALESCE(c.is_deleted, false) = false
+            {scope_sql}
+        """, item_types or [])
+
+        deleted = con.execute("SELECT COUNT(*) FROM swept_deleted").fetchone()[0]
+        if deleted:
+            con.execute("""
+                UPDATE items_current SET is_deleted = true, deleted_at = ?
+                WHERE item_id IN (SELECT item_id FROM swept_deleted)
+            """, (swept_at,))
+            con.execute("""
+                UPDATE items_history SET valid_to = ?, is_current = false
+                WHERE is_current = true
+                AND item_id IN (SELECT item_id FROM swept_deleted)
+            """, (swept_at,))
+            if run_id is not None:
+                con.execute("""
+                    INSERT INTO item_changes (run_id, item_id, change_type, changed_fields, changed_at)
+                    SELECT ?, item_id, 'deleted', NULL, ? FROM swept_deleted
+                """, (str(run_id), swept_at))
+        logger.info(f"Deletion sweep: {enumerated} live ids, {deleted} items tombstoned")
+        return deleted
+    finally:
+        con.execute("DROP TABLE IF EXISTS sweep_ids")
+        con.execute("DROP TABLE IF EXISTS swept_deleted")
+
+def load_item_pages(con: duckdb.DuckDBPyConnection, run_id: uuid.UUID, pages: Iterator[List[dict]],
+                    state: dict, portal_url: Optional[str] = None, renormalize: bool = False,
+                    workers: int = 1, archive_raw: bool = True, health_options: Optional[dict] = None,
+                    health_done: int = 0) -> int:
+    """
+    The fetch stage of run_snapshot: fetches `pages`, normalizes them and
+    loads them into items_current, page by page, then marks the stage done.
+
+    `state` is the fetch checkpoint state; its counters, high-water mark and
+    archive position are updated in place and saved with every page. Unchanged
+    items only get last_seen bumped, unless `renormalize` (replays). With
+    `archive_raw`, pages are appended to the run's raw archive. With
+    `health_options` (StreamingHealthChecker arguments), loaded items are
+    health-checked while the fetch runs; `health_done` is the number of
+    health_checks rows the run already has.
+
+    Returns:
+        int: Number of health_checks rows the run has afterwards.
+    """
+    # Pipelined: pages are fetched on a background thread (prefetch_pages), normalized inline or
+    # in a process pool (workers > 1, started once NORMALIZE_POOL_MIN_PAGES pages have been
+    # normalized inline, on machines with 2+ CPUs) and loaded in order on this thread, which owns the
+    # connection; each page is checkpointed with the cursor as of that page. With health_options,
+    # loaded items are health-checked concurrently by a background prober.
+    # Every hand-off is a bounded queue, so memory stays flat whichever stage is slowest.
+    pool_workers = normalize_workers(workers)
+    if pool_workers < workers:
+        logger.info(f"Normalizing with {pool_workers} process(es) instead of {workers}: {os.cpu_count()} CPU(s)")
+    pool = None
+    pages_seen = 0
+    in_flight = collections.deque()
+    archive = RawArchiveWriter(run_id, position=state.get('archive')) if archive_raw else None
+    prober = StreamingHealthChecker(con, run_id, **health_options) if health_options is not None else None
+
+    def save_health_rows(rows):
+        nonlocal health_done
+        if rows:
+            bulk_insert(con, "health_checks", rows)
+            health_done += len(rows)
+            save_checkpoint(con, run_id, 'health', STAGE_RUNNING, rows_done=health_done)
+
+    def load_page(raw_page, changed_page, normalized, cursor_snapshot):
+        with busy(normalize_m):
+            if normalized is None:
+                columns = normalize_batch(changed_page, run_id)
+            else:
+                columns = normalized.result()
+        normalize_m['rows_in'] += len(raw_page)
+        normalize_m['rows_out'] = (normalize_m['rows_out'] or 0) + len(changed_page)
+
+        with busy(upsert_m):
+            if columns:
+                bulk_insert(con, "items_current", columns, replace=True, key="item_id")
+
+            page_modified = [r['modified'] for r in raw_page if r.get('modified')]
+            if page_modified:
+                state['max_modified_ms'] = max(state['max_modified_ms'] or 0, max(page_modified))
+
+            state['fetched'] += len(raw_page)
+            state['unchanged'] = state.get('unchanged', 0) + len(raw_page) - len(changed_page)
+            if archive is not None:
+                archive.write_page(raw_page)
+                state['archive'] = archive.position()
+            save_checkpoint(con, run_id, 'fetch', STAGE_RUNNING,
+                            dict(state, cursor=cursor_snapshot), state['fetched'])
+        upsert_m['rows_in'] += len(changed_page)
+        upsert_m['rows_out'] = upsert_m['rows_in']
+        logger.info(f"Loaded page of {len(raw_page)} items ({state['fetched']} so far)")
+
+        if prober is not None:
+            with busy(health_m):
+                targets = [HealthTarget(r['id'], r['url']) for r in raw_page if r.get('url')]
+                health_m['rows_in'] += len(targets)
+                save_health_rows(prober.add(targets) + prober.collect())
+
+    try:
+        with contextlib.ExitStack() as stages:
+            fetch_m = stages.enter_context(track_stage(con, run_id, 'fetch'))
+            normalize_m = stages.enter_context(track_stage(con, run_id, 'normalize', rows_in=0))
+            upsert_m = stages.enter_context(track_stage(con, run_id, 'upsert', rows_in=0))
+            if prober is not None:
+                health_m = stages.enter_context(track_stage(con, run_id, 'health', rows_in=0))
+                health_rows_before = health_done
+            portal_governor = get_governor(portal_url) if portal_url else None
+            retries_before = total_retries()
+            portal_retries_before = portal_governor.retries if portal_governor else 0
+
+            fetched_pages = prefetch_pages(metered_pages(pages, fetch_m), state['cursor'])
+            fetch_error = None
+            while True:
+                try:
+                    raw_page, cursor_snapshot = next(fetched_pages)
+                except StopIteration:
+                    break
+                except Exception as e:
+                    # Fetch failed: still load (and checkpoint) the pages already in flight
+                    fetch_error = e
+                    break
+                renew_lease_if_due(con)
+                # Unchanged items only get last_seen bumped; the rest are normalized and upserted.
+                # A replay re-normalizes everything: that is what it is for.
+                if renormalize:
+                    changed_page = raw_page
+                else:
+                    with busy(upsert_m):
+                        changed_page = touch_unchanged_items(con, raw_page, run_id, datetime.now(timezone.utc))
+                pages_seen += 1
+                if pool is None and pool_workers > 1 and pages_seen > NORMALIZE_POOL_MIN_PAGES:
+                    pool = create_normalize_pool(pool_workers)
+                normalized = pool.submit(normalize_batch, changed_page, run_id) if pool and changed_page else None
+                in_flight.append((raw_page, changed_page, normalized, cursor_snapshot))
+                while len(in_flight) > (pool_workers * 2 if pool else 0):
+                    load_page(*in_flight.popleft())
+            while in_flight:
+                load_page(*in_flight.popleft())
+            if fetch_error is not None:
+                logger.error(f"Fetch failed after {state['fetched']} items: {fetch_error}")
+                raise fetch_error
+            fetch_m['retries'] = portal_governor.retries - portal_retries_before if portal_governor else 0
+
+            if prober is not None:
+                save_health_rows(prober.close())
+                health_m['rows_out'] = health_done - health_rows_before
+                health_m['retries'] = total_retries() - retries_before - fetch_m['retries']
+                logger.info(f"Health checks overlapped with fetch: {prober.probed} endpoints probed, "
+                            f"{prober.reused} cached results reused, {health_m['rows_out']} items")
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        if prober is not None:
+            prober.abort()
+        if archive is not None:
+            archive.close()
+
+    save_checkpoint(con, run_id, 'fetch', STAGE_DONE, state, state['fetched'])
+    if archive is not None:
+        archive.finish()
+    return health_done
 
 # --- Main Pipeline Orchestrator ---
 
+class RunNotResumableError(ValueError):
+    """The run to resume is unknown, already finished or has no checkpoints."""
+
+def resume_snapshot(con: duckdb.DuckDBPyConnection, gis, run_id: str):
+    """
+    Continues an unfinished run from its last checkpoint, with the options it
+    was started with. Completed stages are skipped; the fetch stage continues
+    from its last saved page cursor and the health stage from the items still
+    without a result.
+
+    Returns:
+        str: The run id (`run_id`).
+    """
+    options = load_checkpoints(con, run_id).get('options')
+    if options is None:
+        raise RunNotResumableError(f"Run {run_id} has no checkpoints to resume from")
+    return run_snapshot(con, gis, **options['state'], resume_run_id=run_id)
+
 def run_snapshot(con: duckdb.DuckDBPyConnection, gis, max_items: int = 200, 
                 query: str = None, item_types: List[str] = None,
                 enable_history: bool = True, enable_scores: bool = True,
-                enable_health: bool = True):
-    
-    run_id = uuid.uuid4()
-    start_time = datetime.now(timezone.utc)
-    
-    # 1. Create Run
-    logger.info(f"Starting run {run_id}")
-    con.execute("""
-        INSERT INTO runs (run_id, started_at, source, portal_url, org_id, triggered_by, pipeline_version)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, (str(run_id), start_time, 'arcgis', gis.url, getattr(gis.properties, 'id', 'unknown'), 'manual', 'v1'))
+                enable_health: bool = True, partition_by: str = None,
+                partition_owners: List[str] = None, num_partitions: int = 4,
+                harvest_workers: int = 4, incremental: bool = False,
+                incremental_lookback_minutes: int = INCREMENTAL_LOOKBACK_MINUTES,
+                sweep_deletions: bool = False,
+                health_concurrency: int = HEALTH_CONCURRENCY,
+                health_per_host: int = HEALTH_PER_HOST_LIMIT,
+                health_cache_ttl_minutes: float = HEALTH_CACHE_TTL_MINUTES,
+                health_breaker_threshold: int = HEALTH_BREAKER_THRESHOLD,
+                health_probe_budget: Optional[int] = None,
+                health_time_budget_seconds: Optional[float] = None,
+                health_coverage_window_hours: float = HEALTH_COVERAGE_WINDOW_HOURS,
+                workers: int = 1,
+                archive_raw: bool = True,
+                replay_run_id: Optional[str] = None,
+                resume_run_id: Optional[str] = None,
+                triggered_by: str = 'manual',
+                run_id: Optional[str] = None):
+    """
+    Runs a snapshot: fetch, normalize and load items, then history, deletion
+    sweep, quality scores and health checks.
+
+    With `archive_raw`, the raw search results are archived under the run id
+    (see src/storage/raw_archive.py). With `replay_run_id`, items are read from
+    that run's archive instead of the portal and all of them are re-normalized;
+    no network is used (gis may be None), so health checks, the deletion sweep,
+    incremental fetches and partitioning are not available.
+
+    `triggered_by` is recorded on the runs row ('manual', 'schedule', ...).
+    `run_id` sets the id of the new run (default: a random one), so a caller
+    knows which run to resume even when this raises.
+
+    Returns:
+        str: The run id.
+    """
+    # Saved with the run so a resume uses the same options
+    options = {k: v for k, v in locals().items() if k not in ('con', 'gis', 'resume_run_id', 'triggered_by', 'run_id')}
+
+    if replay_run_id:
+        if enable_health or sweep_deletions or incremental or partition_by:
+            raise ValueError("Replay runs offline: disable health checks, deletion sweep, incremental and partitioning")
+        if not archive_exists(replay_run_id):
+            raise FileNotFoundError(f"No raw archive for run {replay_run_id}")
+        archive_raw = False # the replayed archive already holds these payloads
+
+    if incremental and not resume_run_id and gis is not None:
+        check_incremental_cap(con, gis, max_items, query, item_types, incremental_lookback_minutes)
+
+    if resume_run_id:
+        run_id = uuid.UUID(str(resume_run_id))
+        row = con.execute("""
+            SELECT epoch_ms(CAST(started_at AS TIMESTAMPTZ)), finished_at FROM runs WHERE run_id = ?
+        """, (str(run_id),)).fetchone()
+        if row is None:
+            raise RunNotResumableError(f"Unknown run {run_id}")
+        if row[1] is not None:
+            raise RunNotResumableError(f"Run {run_id} already finished")
+        start_time = datetime.fromtimestamp(row[0] / 1000.0, tz=timezone.utc)
+        checkpoints = load_checkpoints(con, run_id)
+        completed = [stage for stage in checkpoints if stage_done(checkpoints, stage)]
+        logger.info(f"Resuming run {run_id} (completed stages: {', '.join(completed) or 'none'})")
+    else:
+        run_id = uuid.UUID(str(run_id)) if run_id else uuid.uuid4()
+        start_time = datetime.now(timezone.utc)
+        checkpoints = {}
+
+        # 1. Create Run
+        if replay_run_id:
+            source = con.execute("SELECT portal_url, org_id FROM runs WHERE run_id = ?", (str(replay_run_id),)).fetchone()
+            if source is None:
+                raise ValueError(f"Unknown run {replay_run_id}")
+            run_row = ('replay', source[0], source[1], 'replay')
+            logger.info(f"Starting run {run_id} (replay of run {replay_run_id})")
+        else:
+            run_row = ('arcgis', gis.url, getattr(gis.properties, 'id', 'unknown'), triggered_by)
+            logger.info(f"Starting run {run_id}")
+        con.execute("""
+            INSERT INTO runs (run_id, started_at, source, portal_url, org_id, triggered_by, pipeline_version)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (str(run_id), start_time, *run_row, 'v1'))
+        save_checkpoint(con, run_id, 'options', STAGE_DONE, options)
     
     try:
-        # 2. Extraction
-        raw_items = fetch_items(gis, max_items, query, item_types)
-        logger.info(f"Fetched {len(raw_items)} items")
-        
-        if not raw_items:
+        # 2-4. Extraction, Normalization, Upsert (streamed page by page)
+        fetch = checkpoints.get('fetch')
+        if fetch:
+            state = fetch['state']
+        else:
+            search_query, fetch_query, watermark = plan_incremental_fetch(
+                con, gis, query, item_types, incremental_lookback_minutes
+            ) if incremental and gis is not None else (build_search_query(query, item_types), query, None)
+            if watermark and watermark['max_modified_ms']:
+                logger.info(f"Incremental run from watermark {watermark['max_modified_ms']} (run {watermark['run_id']})")
+            elif incremental:
+                logger.info("No watermark stored for this portal/query yet, running a full snapshot")
+
+            partitions = None
+            if partition_by:
+                partitions = build_partitions(
+                    gis, fetch_query, partition_by, item_types=item_types,
+                    owners=partition_owners, num_partitions=num_partitions
+                )
+            state = {
+                'search_query': search_query, 'fetch_query': fetch_query, 'watermark': watermark,
+                'partitions': partitions, 'cursor': {}, 'fetched': 0, 'max_modified_ms': None
+            }
+
+        search_query = state['search_query']
+        watermark = state['watermark']
+        health_done = checkpoints.get('health', {}).get('rows_done', 0)
+        # Budgeted health checks need the whole catalog to prioritize, so they run after the fetch
+        stream_health = (enable_health and not stage_done(checkpoints, 'health')
+                         and health_probe_budget is None and health_time_budget_seconds is None)
+        if stage_done(checkpoints, 'fetch'):
+            logger.info(f"Fetch already complete ({state['fetched']} items)")
+        else:
+            if state['fetched']:
+                logger.info(f"Resuming fetch after {state['fetched']} items")
+            else:
+                logger.info(f"Fetching max {max_items} items with query: "
+                            f"{build_search_query(state['fetch_query'], item_types)}")
+            save_checkpoint(con, run_id, 'fetch', STAGE_RUNNING, state, state['fetched'])
+
+            if replay_run_id:
+                logger.info(f"Replaying raw archive of run {replay_run_id}")
+                pages = iter_archive_pages(replay_run_id, cursor=state['cursor'])
+            elif state['partitions'] is not None:
+                logger.info(f"Harvesting {len(state['partitions'])} '{partition_by}' partitions with {harvest_workers} workers")
+                pages = iter_partitioned_pages(gis, state['partitions'], max_items=max_items,
+                                               max_workers=harvest_workers, cursor=state['cursor'])
+            else:
+                pages = iter_item_pages(gis, build_search_query(state['fetch_query'], item_types),
+                                        max_items=max_items, cursor=state['cursor'])
+
+            health_options = {
+                'max_concurrency': health_concurrency, 'per_host_limit': health_per_host,
+                'cache_ttl_minutes': health_cache_ttl_minutes, 'breaker_threshold': health_breaker_threshold,
+            } if stream_health else None
+            health_done = load_item_pages(con, run_id, pages, state, portal_url=gis.url if gis is not None else None,
+                                          renormalize=bool(replay_run_id), workers=workers,
+                                          archive_raw=archive_raw, health_options=health_options,
+                                          health_done=health_done)
+
+            logger.info(f"Fetched {state['fetched']} items ({state.get('unchanged', 0)} unchanged, not re-normalized)")
+
+        fetched = state['fetched']
+        max_modified_ms = state['max_modified_ms']
+
+        if not fetched and not watermark:
             logger.warning("No items found. Finishing run.")
             con.execute("UPDATE runs SET finished_at = ? WHERE run_id = ?", (datetime.now(timezone.utc), str(run_id)))
-            return
-        
-        # 3. Normalization
-        norm_items = [normalize_item(r, run_id) for r in raw_items]
-        
-        # 4. Upsert items_current
-        # DuckDB generic upsert approach (some versions support INSERT OR REPLACE, others ON CONFLICT)
-        # Using INSERT OR REPLACE for simplicity with DuckDB > 1.0 logic, or verify constraint
-        # The schema has PRIMARY KEY on item_id, so INSERT OR REPLACE works.
-        
-        # We need to construct the INSERT statement using parameters
-        # DuckDB python client can insert from a Pandas DF comfortably, or we can use executemany
-        # Let's use executemany with a prepared statement
-        
-        keys = list(norm_items[0].keys())
-        cols = ", ".join(keys)
-        placeholders = ", ".join(["?"] * len(keys))
-        
-        # Prepare data tuple based on keys order
-        data_tuples = []
-        for item in norm_items:
-            data_tuples.append([item[k] for k in keys])
-            
-        con.executemany(f"INSERT OR REPLACE INTO items_current ({cols}) VALUES ({placeholders})", data_tuples)
-        logger.info(f"Upserted {len(norm_items)} items into items_current")
-        
+            return str(run_id)
+
+        logger.info(f"Upserted {fetched} items into items_current")
+
+        # Items that reappear after a deletion sweep are live again
+        con.execute("""
+            UPDATE items_current SET is_deleted = false, deleted_at = NULL
+            WHERE is_deleted AND last_seen_run_id = ?
+        """, (str(run_id),))
+
         # 5. History (SCD2)
-        if enable_history:
-            # Process SCD2
-            # a) Identify changed items (where content_hash differs from last history record)
-            # b) Close old records
-            # c) Insert new records
-            
-            # For MVP, simpler approach:
-            # Check latest history for each item. 
-            # If no history -> Insert New
-            # If history exists and hash matches -> Update last_seen_run_id (Optional optimization, or just do nothing if we only care about changes)
-            # If history exists and hash differs -> Close old (valid_to = now), Insert New
-            
-            # We can do this with SQL set operations more efficiently
-            # Create temp table with current batch
-            con.execute("CREATE TEMP TABLE stg_items AS SELECT * FROM items_current WHERE last_seen_run_id = ?", (str(run_id),))
-            
-            # Detect Changes: existing current history with different hash
-            # Close old
-            con.execute("""
-                UPDATE items_history 
-                SET valid_to = ?, is_current = false
-                WHERE is_current = true
-                AND item_id IN (SELECT item_id FROM stg_items)
-                AND content_hash != (SELECT content_hash FROM stg_items WHERE stg_items.item_id = items_history.item_id)
-            """, (start_time,))
-            
-            # Insert New Versions (for Changed or New items)
-            # Find items where no current history exists (either brand new, or just closed above)
-            con.execute("""
-                INSERT INTO items_history (
-                    item_id, content_hash, valid_from, valid_to, is_current,
-                    title, item_type, owner, url, access, modified_at,
-                    tags_json, description_len, has_extent, 
-                    extent_xmin, extent_ymin, extent_xmax, extent_ymax,
-                    first_seen_run_id, last_seen_run_id
-                )
-                SELECT 
-                    s.item_id, s.content_hash, ? as valid_from, NULL as valid_to, true as is_current,
-                    s.title, s.item_type, s.owner, s.url, s.access, s.modified_at,
-                    s.tags_json, s.description_len, s.has_extent,
-                    s.extent_xmin, s.extent_ymin, s.extent_xmax, s.extent_ymax,
-                    ? as first_seen_run_id, ? as last_seen_run_id
-                FROM stg_items s
-                LEFT JOIN items_history h ON s.item_id = h.item_id AND h.is_current = true
-                WHERE h.item_id IS NULL
-            """, (start_time, str(run_id), str(run_id)))
-
-            # Update last_seen_run_id for unchanged items
-            con.execute("""
-                UPDATE items_history
-                SET last_seen_run_id = ?
-                WHERE is_current = true
-                AND item_id IN (SELECT item_id FROM stg_items)
-            """, (str(run_id),))
-            
-            con.execute("DROP TABLE stg_items")
-            logger.info("Processed SCD2 History")
-            
-        # 6. Quality Scores
-        if enable_scores:
-            scores = calculate_quality_scores(norm_items, run_id)
-            s_keys = list(scores[0].keys())
-            s_cols = ", ".join(s_keys)
-            s_ph = ", ".join(["?"] * len(s_keys))
-            s_data = [[s[k] for k in s_keys] for s in scores]
-            con.executemany(f"INSERT INTO quality_scores ({s_cols}) VALUES ({s_ph})", s_data)
-            logger.info(f"Computed {len(scores)} quality scores")
-            
-        # 7. Health Checks
-        if enable_health:
-            health_results = run_health_checks(norm_items, run_id)
-            if health_results:
-                h_keys = list(health_results[0].keys())
-                h_cols = ", ".join(h_keys)
-                h_ph = ", ".join(["?"] * len(h_keys))
-                h_data = [[h[k] for k in h_keys] for h in health_results]
-                con.executemany(f"INSERT INTO health_checks ({h_cols}) VALUES ({h_ph})", h_data)
-                logger.info(f"Ran {len(health_results)} health checks")
+        if enable_history and not stage_done(checkpoints, 'history'):
+            with track_stage(con, run_id, 'history', rows_in=fetched) as history_m:
+                changes = merge_item_history(con, run_id, changed_at=start_time)
+                history_m['rows_out'] = sum(changes.values())
+            save_checkpoint(con, run_id, 'history', STAGE_DONE)
+            logger.info(f"Processed SCD2 History: {', '.join(f'{n} {t}' for t, n in sorted(changes.items())) or 'no changes'}")
+
+        # 6. Deletion Sweep
+        if sweep_deletions and not stage_done(checkpoints, 'sweep'):
+            # A full, uncapped fetch of the sweep's query saw every live id: reuse them
+            complete = state['fetch_query'] == query and not (max_items is not None and fetched >= max_items)
+            with track_stage(con, run_id, 'sweep') as sweep_m:
+                retries_before = total_retries()
+                deleted = sweep_deleted_items(con, gis, query, item_types, swept_at=start_time, run_id=run_id,
+                                              seen_run_id=run_id if complete else None)
+                sweep_m['rows_out'] = deleted
+                sweep_m['retries'] = total_retries() - retries_before
+            save_checkpoint(con, run_id, 'sweep', STAGE_DONE, rows_done=deleted or 0)
+
+        # Incremental runs only fetch changed items, but score and health-check the
+        # whole catalog: freshness depends on the run time and unchanged services
+        # can break (the health cache keeps recently OK endpoints cheap)
+        whole_catalog = bool(watermark and watermark['max_modified_ms'])
+
+        # 7. Quality Scores (set-based over this run's items)
+        if enable_scores and not stage_done(checkpoints, 'scores'):
+            with track_stage(con, run_id, 'scores', rows_in=fetched) as scores_m:
+                # Idempotent: drop anything a crashed attempt left behind
+                con.execute("DELETE FROM quality_scores WHERE run_id = ?", (str(run_id),))
+                scored = compute_quality_scores(con, run_id, now=start_time, all_items=whole_catalog)
+                scores_m['rows_out'] = scored
+            save_checkpoint(con, run_id, 'scores', STAGE_DONE, rows_done=scored)
+            logger.info(f"Computed {scored} quality scores")
+
+        # 8. Health Checks (results are saved, and checkpointed, batch by batch)
+        if enable_health and not stage_done(checkpoints, 'health'):
+            health_targets = [HealthTarget(item_id, url) for item_id, url in con.execute("""
+                SELECT i.item_id, i.url FROM items_current i
+                WHERE (i.last_seen_run_id = ? OR (? AND NOT COALESCE(i.is_deleted, false)))
+                AND COALESCE(i.url, '') <> ''
+                AND i.item_id NOT IN (SELECT item_id FROM health_checks WHERE run_id = ?)
+            """, (str(run_id), whole_catalog, str(run_id))).fetchall()]
+            if health_done:
+                logger.info(f"Health checks: {health_done} items already checked, {len(health_targets)} left")
+
+            def save_health_batch(rows):
+                nonlocal health_done
+                bulk_insert(con, "health_checks", rows)
+                health_done += len(rows)
+                save_checkpoint(con, run_id, 'health', STAGE_RUNNING, rows_done=health_done)
+
+            # Overlapped checks already covered the fetched items unless some were left over
+            # (e.g. after a crash); incremental runs still check the unchanged items here
+            if health_targets or not stream_health:
+                with track_stage(con, run_id, 'health', rows_in=len(health_targets)) as health_m:
+                    retries_before = total_retries()
+                    health_results = run_health_checks(health_targets, run_id, max_concurrency=health_concurrency,
+                                                       per_host_limit=health_per_host, con=con,
+                                                       cache_ttl_minutes=health_cache_ttl_minutes,
+                                                       breaker_threshold=health_breaker_threshold,
+                                                       probe_budget=health_probe_budget,
+                                                       time_budget_seconds=health_time_budget_seconds,
+                                                       coverage_window_hours=health_coverage_window_hours,
+                                                       batch_size=HEALTH_CHECKPOINT_BATCH,
+                                                       on_batch=save_health_batch)
+                    health_m['rows_out'] = len(health_results)
+                    health_m['retries'] = total_retries() - retries_before
+                if health_results:
+                    logger.info(f"Ran {len(health_results)} health checks")
+            save_checkpoint(con, run_id, 'health', STAGE_DONE, rows_done=health_done)
         
-        # 8. Finalize Run
+        # 9. Incremental bookkeeping: advance the watermark
+        with track_stage(con, run_id, 'finalize'):
+            if max_items is not None and fetched >= max_items:
+                # Truncated by max_items: items past the cap were not seen, keep the old mark
+                logger.warning("Fetch hit max_items; watermark not advanced")
+                max_modified_ms = None
+            if not replay_run_id:
+                save_watermark(con, gis.url, search_query, max_modified_ms, run_id)
+
+        # 10. Finalize Run
         con.execute("UPDATE runs SET finished_at = ? WHERE run_id = ?", (datetime.now(timezone.utc), str(run_id)))
         logger.info("Snapshot Run Complete")
+        return str(run_id)
         
     except Exception as e:
         logger.error(f"Snapshot run failed: {e}")
-        # Could fail run in DB, but for now we rely on finished_at being null or log errors
+        # finished_at stays null; the run can be continued with resume_snapshot
+        logger.error(f"Resume with: python scripts/run_snapshot.py --resume {run_id}")
         raise e
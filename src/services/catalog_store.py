@@ -8,6 +8,9 @@ import os
 # Ensure we can import from src.storage
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 from src.storage.duckdb_client import connect, get_db_path
+from src.pipeline.instrumentation import load_run_stages
+from src.pipeline.health_refresh import latest_health_run_id, HEALTH_RUN_SOURCE
+from src.tools.scoring import missing_field_sql, failed_rule_sql
 
 def get_status() -> Dict[str, Any]:
     """
@@ -22,7 +25,7 @@ def get_status() -> Dict[str, Any]:
 
     try:
         # 1. Preflight Checks (Tables)
-        required_tables = ['runs', 'items_current', 'quality_scores', 'health_checks', 'items_history']
+        required_tables = ['runs', 'items_current', 'items_active', 'quality_scores', 'health_checks', 'items_history']
         existing_tables_df = con.sql("SELECT table_name FROM information_schema.tables WHERE table_schema='main'").df()
         existing_tables = set(existing_tables_df['table_name'].tolist())
         
@@ -31,8 +34,11 @@ def get_status() -> Dict[str, Any]:
             con.close()
             return {"ok": False, "error": f"Missing tables: {missing}", "hint": "Run 'python scripts/init_duckdb.py'"}
             
-        # 2. Latest Run
-        runs_df = con.sql("SELECT run_id, started_at, finished_at FROM runs ORDER BY started_at DESC LIMIT 1").df()
+        # 2. Latest Run (snapshot; health-only runs have no items or scores of their own)
+        runs_df = con.execute(
+            "SELECT run_id, started_at, finished_at FROM runs WHERE COALESCE(source, '') <> ? ORDER BY started_at DESC LIMIT 1",
+            (HEALTH_RUN_SOURCE,)
+        ).df()
         
         if runs_df.empty:
             con.close()
@@ -41,11 +47,15 @@ def get_status() -> Dict[str, Any]:
         run = runs_df.iloc[0]
         run_id = str(run['run_id'])
         
-        # 3. Counts
-        item_count = con.sql("SELECT COUNT(*) FROM items_current").fetchone()[0]
-        score_count = con.sql(f"SELECT COUNT(*) FROM quality_scores WHERE run_id = '{run_id}'").fetchone()[0]
-        health_count = con.sql(f"SELECT COUNT(*) FROM health_checks WHERE run_id = '{run_id}'").fetchone()[0]
-        broken_count = con.sql(f"SELECT COUNT(*) FROM health_checks WHERE run_id = '{run_id}' AND ok = false").fetchone()[0]
+        # 3. Counts (health from the newest run with results, which may be a health-only run)
+        health_run_id = latest_health_run_id(con) or run_id
+        item_count = con.sql("SELECT COUNT(*) FROM items_active").fetchone()[0]
+        score_count = con.sql(f"SELECT COUNT(*) FROM quality_scores_all WHERE run_id = '{run_id}'").fetchone()[0]
+        health_count = con.sql(f"SELECT COUNT(*) FROM health_checks_all WHERE run_id = '{health_run_id}'").fetchone()[0]
+        broken_count = con.sql(f"SELECT COUNT(*) FROM health_checks_all WHERE run_id = '{health_run_id}' AND ok = false").fetchone()[0]
+
+        # 4. Stage breakdown (None on warehouses created before run_stages)
+        stages = load_run_stages(con, run_id)
         
         con.close()
         
@@ -59,12 +69,14 @@ def get_status() -> Dict[str, Any]:
                 "started_at": run['started_at'],
                 "finished_at": run['finished_at']
             },
+            "health_run_id": health_run_id,
             "metrics": {
                 "items": item_count,
                 "scores": score_count,
                 "health_checks": health_count,
                 "broken_services": broken_count
-            }
+            },
+            "stages": stages
         }
         
     except Exception as e:
@@ -74,40 +86,49 @@ def get_status() -> Dict[str, Any]:
 def get_latest_run_id() -> Optional[str]:
     try:
         con = connect(read_only=True)
-        res = con.sql("SELECT run_id FROM runs ORDER BY started_at DESC LIMIT 1").fetchone()
+        res = con.execute(
+            "SELECT run_id FROM runs WHERE COALESCE(source, '') <> ? ORDER BY started_at DESC LIMIT 1",
+            (HEALTH_RUN_SOURCE,)
+        ).fetchone()
         con.close()
         return str(res[0]) if res else None
     except:
         return None
 
-def admin_queries(run_id: str) -> Dict[str, pd.DataFrame]:
+def admin_queries(run_id: str, health_run_id: Optional[str] = None) -> Dict[str, pd.DataFrame]:
     """
-    Returns DataFrames for admin/governance dashboards.
+    Returns DataFrames for admin/governance dashboards. Broken services come
+    from `health_run_id` (e.g. a newer health-only run) when given.
     """
+    health_run_id = health_run_id or run_id
     con = connect(read_only=True)
     results = {}
     
+    # Missing-metadata checks test the run's quality_scores masks, falling back
+    # to the item columns for items the run has no score row for
+    scored = f"items_active i LEFT JOIN quality_scores_all s ON s.item_id = i.item_id AND s.run_id = '{run_id}'"
     queries = {
-        'missing_tags': "SELECT item_id, title, owner, tags_json FROM items_current WHERE COALESCE(tags_count,0)=0 LIMIT 50",
-        'missing_description': "SELECT item_id, title, owner FROM items_current WHERE COALESCE(has_description,false)=false LIMIT 50",
-        'missing_extent': "SELECT item_id, title, owner FROM items_current WHERE COALESCE(has_extent,false)=false LIMIT 50",
-        'stale_items': "SELECT item_id, title, owner, modified_at FROM items_current WHERE modified_at < (now() - INTERVAL '2 years') LIMIT 50",
+        'missing_tags': f"SELECT i.item_id, i.title, i.owner, i.tags_json FROM {scored} WHERE {missing_field_sql('tags')} LIMIT 50",
+        'missing_description': f"SELECT i.item_id, i.title, i.owner FROM {scored} WHERE {missing_field_sql('description')} LIMIT 50",
+        'missing_extent': f"SELECT i.item_id, i.title, i.owner FROM {scored} WHERE {failed_rule_sql('has_extent')} LIMIT 50",
+        'stale_items': "SELECT item_id, title, owner, modified_at FROM items_active WHERE modified_at < (now() - INTERVAL '2 years') LIMIT 50",
         'broken_services': f"""
             SELECT i.title, i.owner, h.checked_url, h.status_code, h.error_message 
-            FROM health_checks h 
-            JOIN items_current i ON h.item_id = i.item_id 
-            WHERE h.run_id = '{run_id}' AND h.ok = false
+            FROM health_checks_all h 
+            JOIN items_active i ON h.item_id = i.item_id 
+            WHERE h.run_id = '{health_run_id}' AND h.ok = false
             LIMIT 50
         """,
-        'owner_summary': """
+        'owner_summary': f"""
             SELECT 
-                owner,
+                i.owner,
                 COUNT(*) as total_items,
-                COUNT(CASE WHEN COALESCE(tags_count,0)=0 THEN 1 END) as missing_tags,
-                COUNT(CASE WHEN COALESCE(has_description,false)=false THEN 1 END) as missing_desc,
-                COUNT(CASE WHEN modified_at < (now() - INTERVAL '2 years') THEN 1 END) as stale
-            FROM items_current
-            GROUP BY owner
+                COUNT(CASE WHEN {missing_field_sql('tags')} THEN 1 END) as missing_tags,
+                COUNT(CASE WHEN {missing_field_sql('description')} THEN 1 END) as missing_desc,
+                COUNT(CASE WHEN i.modified_at < (now() - INTERVAL '2 years') THEN 1 END) as stale
+            FROM items_active i
+            LEFT JOIN quality_scores_all s ON s.item_id = i.item_id AND s.run_id = '{run_id}'
+            GROUP BY i.owner
             ORDER BY total_items DESC
             LIMIT 20
         """
@@ -0,0 +1,226 @@
+import os
+import threading
+import time
+import types
+from functools import lru_cache
+from typing import Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+from src.services.request_governor import get_governor, raise_for_throttling, ThrottledError, RETRYABLE_STATUS
+
+load_dotenv()
+
+# The search API returns at most 100 results per request
+MAX_PAGE_SIZE = 100
+
+# Generated tokens are refreshed this long before they expire
+TOKEN_REFRESH_MARGIN_SECONDS = 60
+TOKEN_EXPIRATION_MINUTES = 60
+
+# Portal error codes for a missing, invalid or expired token
+TOKEN_ERROR_CODES = (498, 499)
+
+def _rest_root(url: str) -> str:
+    """https://host/portal -> https://host/portal/sharing/rest"""
+    url = url.rstrip("/")
+    if url.endswith("/sharing/rest"):
+        return url
+    if url.endswith("/sharing"):
+        return f"{url}/rest"
+    return f"{url}/sharing/rest"
+
+class PortalSearchClient:
+    """
+    Thin client for the portal's `/sharing/rest/search` endpoint.
+
+    Results are returned as the plain JSON dicts the portal sends, without
+    building `arcgis.gis.Item` objects. Requests go through one pooled
+    `requests.Session` (keep-alive, gzip), so concurrent partition harvests
+    share connections, and through the portal host's RequestGovernor, which
+    adapts concurrency and retries throttled requests.
+
+    Exposes `url`, `properties` and `content.advanced_search(...)` like a GIS,
+    so it can be passed to the snapshot pipeline in place of one.
+    """
+
+    def __init__(self, url: str = "https://www.arcgis.com", token: Optional[str] = None,
+                 username: Optional[str] = None, password: Optional[str] = None,
+                 verify_cert: bool = True, timeout: float = 30, pool_size: int = 16):
+        self.url = url.rstrip("/")
+        self.rest_url = _rest_root(self.url)
+        self.timeout = timeout
+        self._username = username
+        self._password = password
+        self._token = token
+        self._token_expires = None  # epoch seconds; None = static token or anonymous
+        self._token_lock = threading.Lock()
+        self._properties = None
+        self.governor = get_governor(self.url)
+
+        self.session = requests.Session()
+        self.session.verify = verify_cert
+        self.session.headers.update({
+            "Accept-Encoding": "gzip, deflate",
+            "Referer": self.url,
+            "User-Agent": "geocatalog-copilot",
+        })
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    # --- GIS-compatible surface used by the snapshot pipeline ---
+
+    @property
+    def content(self) -> "PortalSearchClient":
+        return self
+
+    @property
+    def properties(self) -> types.SimpleNamespace:
+        """The portal's `portals/self` description (empty if it cannot be read)."""
+        if self._properties is None:
+            try:
+                self._properties = types.SimpleNamespace(**self._request("portals/self"))
+            except Exception:
+                self._properties = types.SimpleNamespace()
+        return self._properties
+
+    def advanced_search(self, query: str, start: int = 1, max_items: int = MAX_PAGE_SIZE,
+                        sort_field: Optional[str] = None, sort_order: str = "asc",
+                        as_dict: bool = True, return_count: bool = False):
+        """
+        Mirrors `gis.content.advanced_search` for a single page.
+
+        Returns:
+            dict: The raw search response ({'total', 'start', 'num', 'nextStart', 'results'}),
+                or int: the total number of matches when return_count=True.
+        """
+        if return_count:
+            return self.search(query, start=1, num=0)['total']
+        return self.search(query, start=start, num=max_items,
+                           sort_field=sort_field, sort_order=sort_order)
+
+    # --- Search ---
+
+    def search(self, query: str, start: int = 1, num: int = MAX_PAGE_SIZE,
+               sort_field: Optional[str] = None, sort_order: Optional[str] = None) -> dict:
+        """
+        Runs one search request.
+
+        Args:
+            query (str): ArcGIS search query.
+            start (int): 1-based index of the first result.
+            num (int): Page size (0-100; 0 only returns the total).
+            sort_field (str, optional): Field to sort on, e.g. 'created'.
+            sort_order (str, optional): 'asc' or 'desc'.
+
+        Returns:
+            dict: The raw search response.
+        """
+        params = {"q": query, "start": start, "num": min(num, MAX_PAGE_SIZE)}
+        if sort_field:
+            params["sortField"] = sort_field
+            params["sortOrder"] = sort_order or "asc"
+        return self._request("search", params)
+
+    def iter_results(self, query: str, max_items: Optional[int] = None,
+                     sort_field: Optional[str] = None, sort_order: Optional[str] = None) -> Iterator[dict]:
+        """Yields result dicts for `query`, following nextStart up to max_items."""
+        start, yielded = 1, 0
+        while max_items is None or yielded < max_items:
+            num = MAX_PAGE_SIZE if max_items is None else min(MAX_PAGE_SIZE, max_items - yielded)
+            response = self.search(query, start=start, num=num, sort_field=sort_field, sort_order=sort_order)
+            results = response.get("results") or []
+            for result in results:
+                yield result
+            yielded += len(results)
+            start = response.get("nextStart", -1)
+            if not results or start is None or start < 1:
+                return
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- Transport and tokens ---
+
+    def _request(self, path: str, params: Optional[dict] = None) -> dict:
+        """POSTs to a sharing REST endpoint and returns its JSON, refreshing an expired token once."""
+        for attempt in (1, 2):
+            data = dict(params or {}, f="json")
+            token = self._current_token()
+            if token:
+                data["token"] = token
+            payload = self.governor.call(self._post, path, data)
+            error = payload.get("error") if isinstance(payload, dict) else None
+            if not error:
+                return payload
+            if error.get("code") in TOKEN_ERROR_CODES and self._username and attempt == 1:
+                self._invalidate_token(token)
+                continue
+            raise RuntimeError(f"Portal request '{path}' failed ({error.get('code')}): {error.get('message')}")
+
+    def _post(self, path: str, data: dict) -> dict:
+        response = self.session.post(f"{self.rest_url}/{path}", data=data, timeout=self.timeout)
+        raise_for_throttling(response)
+        response.raise_for_status()
+        payload = response.json()
+        # The portal also reports throttling as a JSON error on an HTTP 200
+        error = payload.get("error") if isinstance(payload, dict) else None
+        if error and error.get("code") in RETRYABLE_STATUS:
+            raise ThrottledError(f"Portal request '{path}' throttled ({error.get('code')}): {error.get('message')}",
+                                 status_code=error.get("code"))
+        return payload
+
+    def _current_token(self) -> Optional[str]:
+        if not (self._username and self._password):
+            return self._token
+        with self._token_lock:
+            if self._token is None or (self._token_expires is not None
+                                       and time.time() > self._token_expires - TOKEN_REFRESH_MARGIN_SECONDS):
+                self._generate_token()
+            return self._token
+
+    def _invalidate_token(self, token: Optional[str]):
+        with self._token_lock:
+            if self._token == token:
+                self._token = None
+
+    def _generate_token(self):
+        payload = self.governor.call(self._post, "generateToken", {
+            "username": self._username,
+            "password": self._password,
+            "client": "referer",
+            "referer": self.url,
+            "expiration": TOKEN_EXPIRATION_MINUTES,
+            "f": "json",
+        })
+        if "token" not in payload:
+            error = payload.get("error") or {}
+            raise RuntimeError(f"Failed to generate a token at {self.url}: {error.get('message', payload)}")
+        self._token = payload["token"]
+        self._token_expires = payload.get("expires", 0) / 1000.0 or None
+
+@lru_cache(maxsize=1)
+def get_search_client() -> PortalSearchClient:
+    """
+    Returns a shared PortalSearchClient configured like get_gis().
+
+    Uses ARCGIS_URL (default: https://www.arcgis.com), then ARCGIS_TOKEN,
+    ARCGIS_USERNAME + ARCGIS_PASSWORD or anonymous access, and ARCGIS_VERIFY_SSL.
+    """
+    token = os.getenv("ARCGIS_TOKEN")
+    return PortalSearchClient(
+        url=os.getenv("ARCGIS_URL", "https://www.arcgis.com"),
+        token=token,
+        username=None if token else os.getenv("ARCGIS_USERNAME"),
+        password=None if token else os.getenv("ARCGIS_PASSWORD"),
+        verify_cert=os.getenv("ARCGIS_VERIFY_SSL", "true").lower() == "true",
+    )
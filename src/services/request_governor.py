@@ -0,0 +1,216 @@
+import asyncio
+import email.utils
+import logging
+import random
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Responses that mean "slow down / try again" rather than a broken request
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+
+# Defaults for outbound ArcGIS requests
+GOVERNOR_INITIAL_LIMIT = 4 # concurrent requests per host to start with
+GOVERNOR_MAX_LIMIT = 16
+GOVERNOR_MAX_RETRIES = 5
+GOVERNOR_BASE_DELAY_SECONDS = 0.5
+GOVERNOR_MAX_DELAY_SECONDS = 60
+
+# Error messages from the arcgis package and urllib3 that indicate throttling or a transient failure
+_TRANSIENT_MESSAGE_RE = re.compile(
+    r'\b(?:429|500|502|503|504)\b|too many requests|throttl|timed? ?out|temporarily unavailable|connection (?:reset|aborted)',
+    re.IGNORECASE
+)
+
+class ThrottledError(RuntimeError):
+    """A request the server asked us to retry (429/5xx), with its Retry-After delay if given."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(when.timestamp() - time.time(), 0.0)
+
+def raise_for_throttling(response: requests.Response) -> None:
+    """Raises ThrottledError for a retryable HTTP status, carrying its Retry-After."""
+    if response.status_code in RETRYABLE_STATUS:
+        raise ThrottledError(
+            f"HTTP {response.status_code} from {urlsplit(response.url).hostname}",
+            status_code=response.status_code,
+            retry_after=parse_retry_after(response.headers.get('Retry-After'))
+        )
+
+def classify_error(error: BaseException) -> Tuple[bool, Optional[float]]:
+    """(retryable, retry_after) for an exception raised by an outbound call."""
+    if isinstance(error, ThrottledError):
+        return True, error.retry_after
+    if isinstance(error, (requests.Timeout, requests.ConnectionError, TimeoutError, ConnectionError)):
+        return True, None
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        if error.response.status_code in RETRYABLE_STATUS:
+            return True, parse_retry_after(error.response.headers.get('Retry-After'))
+        return False, None
+    return bool(_TRANSIENT_MESSAGE_RE.search(str(error))), None
+
+class RequestGovernor:
+    """
+    Adaptive concurrency limit and retry policy for one host.
+
+    The number of requests allowed in flight follows AIMD: it grows by about
+    one per window of successful requests and is cut by `decrease_factor` when
+    the server throttles or times out (at most once per `decrease_interval`,
+    so one burst of errors counts as one congestion signal). Throttled calls
+    are retried with exponential backoff and full jitter; a Retry-After from
+    the server overrides the backoff and pauses all callers on the host.
+    """
+
+    def __init__(self, name: str, initial_limit: int = GOVERNOR_INITIAL_LIMIT,
+                 max_limit: int = GOVERNOR_MAX_LIMIT, min_limit: int = 1,
+                 decrease_factor: float = 0.5, decrease_interval: float = 1.0,
+                 max_retries: int = GOVERNOR_MAX_RETRIES,
+                 base_delay: float = GOVERNOR_BASE_DELAY_SECONDS,
+                 max_delay: float = GOVERNOR_MAX_DELAY_SECONDS):
+        self.name = name
+        self.limit = float(min(max(initial_limit, min_limit), max_limit))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.decrease_interval = decrease_interval
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.in_flight = 0
+        self.retries = 0
+        self.throttled = 0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    # --- Slots ---
+
+    def _try_acquire(self) -> float:
+        """Takes a slot and returns 0, or returns how long to wait before trying again."""
+        with self._cond:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            if self.in_flight >= int(self.limit):
+                return 0.05
+            self.in_flight += 1
+            return 0.0
+
+    def acquire(self) -> None:
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    self._cond.wait(self._paused_until - now)
+                elif self.in_flight >= int(self.limit):
+                    self._cond.wait()
+                else:
+                    self.in_flight += 1
+                    return
+
+    async def acquire_async(self) -> None:
+        """Like acquire, for coroutines (waits without blocking the event loop)."""
+        while True:
+            wait = self._try_acquire()
+            if not wait:
+                return
+            await asyncio.sleep(min(wait, 0.05))
+
+    def release(self, throttled: bool = False, retry_after: Optional[float] = None) -> None:
+        """Frees a slot and adapts the limit: additive increase, multiplicative decrease."""
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                self.throttled += 1
+                if now - self._last_decrease >= self.decrease_interval:
+                    self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                    self._last_decrease = now
+                    logger.info(f"Throttled by {self.name}: concurrency limit now {int(self.limit)}")
+                if retry_after:
+                    self._paused_until = max(self._paused_until, now + min(retry_after, self.max_delay))
+            else:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Delay before retry number `attempt` (1-based): Retry-After, else full-jitter exponential."""
+        with self._cond:
+            self.retries += 1
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    # --- Calls ---
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Runs fn(*args, **kwargs) within the host's concurrency limit, retrying
+        throttling and transient errors (see classify_error) up to max_retries.
+        Other exceptions, and the last one once retries run out, are raised.
+        """
+        attempt = 0
+        while True:
+            self.acquire()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                retryable, retry_after = classify_error(e)
+                self.release(throttled=retryable, retry_after=retry_after)
+                attempt += 1
+                if not retryable or attempt > self.max_retries:
+                    raise
+                delay = self.backoff(attempt, retry_after)
+                logger.warning(f"{self.name}: {e} - retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            self.release()
+            return result
+
+_governors: Dict[str, RequestGovernor] = {}
+_governors_lock = threading.Lock()
+
+def host_of(url: str) -> str:
+    return (urlsplit(url).hostname or url).lower()
+
+def get_governor(url_or_host: str, **options) -> RequestGovernor:
+    """
+    Returns the process-wide governor for a host, creating it with `options`
+    on first use. All outbound calls to the same host share one limit.
+    """
+    host = host_of(url_or_host) if '/' in url_or_host else url_or_host.lower()
+    with _governors_lock:
+        governor = _governors.get(host)
+        if governor is None:
+            governor = _governors[host] = RequestGovernor(host, **options)
+        return governor
+
+def governed(url: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Runs fn(*args, **kwargs) through the governor of `url`'s host."""
+    return get_governor(url).call(fn, *args, **kwargs)
+
+def total_retries() -> int:
+    """Retries made by all governors in this process so far (for stage metrics)."""
+    with _governors_lock:
+        return sum(g.retries for g in _governors.values())
@@ -0,0 +1,63 @@
+import itertools
+import duckdb
+import pandas as pd
+from typing import Dict, List, Optional, Union
+
+_batch_counter = itertools.count()
+
+def rows_to_frame(rows: List[dict], columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Builds a columnar batch (pandas DataFrame) from a list of row dicts.
+
+    Args:
+        rows (List[dict]): Row dicts sharing the same keys.
+        columns (List[str], optional): Column order. Defaults to the keys of the first row.
+
+    Returns:
+        pd.DataFrame: One column per key.
+    """
+    if columns is None:
+        columns = list(rows[0].keys()) if rows else []
+    return pd.DataFrame.from_records(rows, columns=columns)
+
+def bulk_insert(con: duckdb.DuckDBPyConnection, table: str,
+                batch: Union[pd.DataFrame, Dict[str, list], List[dict]], replace: bool = False,
+                key: Optional[str] = None) -> int:
+    """
+    Loads a columnar batch into `table` with a single INSERT ... SELECT over a
+    registered relation, instead of one parameter binding per row.
+
+    Args:
+        con (duckdb.DuckDBPyConnection): The database connection.
+        table (str): Target table name.
+        batch (pd.DataFrame | Dict[str, list] | List[dict]): Rows to load, as a frame,
+            a columnar {column: values} dict or row dicts; names must match the table.
+        replace (bool): Use INSERT OR REPLACE (upsert on the primary key).
+        key (str, optional): Primary key column. With replace=True, duplicate keys
+            within the batch are collapsed (last wins), since a single statement
+            cannot upsert the same row twice.
+
+    Returns:
+        int: Number of rows loaded.
+    """
+    if isinstance(batch, pd.DataFrame):
+        frame = batch
+    elif isinstance(batch, dict):
+        frame = pd.DataFrame(batch)
+    else:
+        frame = rows_to_frame(batch)
+    if frame.empty:
+        return 0
+    if replace and key:
+        frame = frame.drop_duplicates(subset=[key], keep='last')
+
+    view_name = f"_bulk_{table}_{next(_batch_counter)}"
+    cols = ", ".join(frame.columns)
+    verb = "INSERT OR REPLACE" if replace else "INSERT"
+
+    con.register(view_name, frame)
+    try:
+        con.execute(f"{verb} INTO {table} ({cols}) SELECT {cols} FROM {view_name}")
+    finally:
+        con.unregister(view_name)
+    return len(frame)
@@ -35,9 +35,23 @@ CREATE TABLE IF NOT EXISTS items_current (
     num_views BIGINT,
     content_hash VARCHAR,
     last_seen_run_id UUID,
-    last_seen_at TIMESTAMP
+    last_seen_at TIMESTAMP,
+    is_deleted BOOLEAN DEFAULT false, -- tombstone set by the deletion sweep
+    deleted_at TIMESTAMP,
+    raw_fingerprint VARCHAR -- fingerprint of the raw item, unchanged items skip normalization
 );
 
+-- Upgrade warehouses created before the deletion sweep existed
+ALTER TABLE items_current ADD COLUMN IF NOT EXISTS is_deleted BOOLEAN DEFAULT false;
+ALTER TABLE items_current ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP;
+
+-- Upgrade warehouses created before the unchanged-item fast path
+ALTER TABLE items_current ADD COLUMN IF NOT EXISTS raw_fingerprint VARCHAR;
+
+-- Live catalog: everything the read side (app, reports) should see
+CREATE OR REPLACE VIEW items_active AS
+SELECT * FROM items_current WHERE COALESCE(is_deleted, false) = false;
+
 CREATE TABLE IF NOT EXISTS items_history (
     item_id VARCHAR,
     content_hash VARCHAR,
@@ -70,6 +84,19 @@ CREATE TABLE IF NOT EXISTS quality_scores (
     computed_at TIMESTAMP
 );
 
+-- Compact score breakdown: bit i of passed_mask / missing_mask is quality_rules.bit = i.
+-- Rows written before the masks keep breakdown_json / missing_json (masks are backfilled).
+ALTER TABLE quality_scores ADD COLUMN IF NOT EXISTS passed_mask INTEGER;
+ALTER TABLE quality_scores ADD COLUMN IF NOT EXISTS missing_mask INTEGER;
+
+-- Bit dictionary for quality_scores masks, written from QUALITY_RULES (src/tools/scoring.py)
+CREATE TABLE IF NOT EXISTS quality_rules (
+    bit INTEGER PRIMARY KEY,
+    rule_name VARCHAR, -- key in breakdown_json
+    weight INTEGER,
+    missing_field VARCHAR -- entry in missing_json, if the rule reports one
+);
+
 CREATE TABLE IF NOT EXISTS health_checks (
     run_id UUID,
     item_id VARCHAR,
@@ -81,6 +108,40 @@ CREATE TABLE IF NOT EXISTS health_checks (
     checked_at TIMESTAMP
 );
 
+-- Canonical endpoint actually probed for the item's checked_url (shared by items on
+-- the same service); NULL for rows written before endpoints were grouped
+ALTER TABLE health_checks ADD COLUMN IF NOT EXISTS endpoint_url VARCHAR;
+
+-- Runs whose quality_scores / health_checks rows were moved to Parquet (src/storage/retention.py)
+CREATE TABLE IF NOT EXISTS archived_runs (
+    run_id UUID,
+    table_name VARCHAR,
+    run_date DATE,
+    rows_archived BIGINT,
+    archived_at TIMESTAMP
+);
+
+-- Live rows plus the Parquet archive; replaced with the union once runs are archived
+CREATE VIEW IF NOT EXISTS quality_scores_all AS SELECT * FROM quality_scores;
+CREATE VIEW IF NOT EXISTS health_checks_all AS SELECT * FROM health_checks;
+
+-- quality_scores (archived runs included) in its original JSON shape
+CREATE OR REPLACE VIEW quality_scores_json AS
+SELECT
+    q.run_id,
+    q.item_id,
+    q.score,
+    COALESCE(q.breakdown_json, (
+        SELECT CAST('{' || COALESCE(string_agg('"' || r.rule_name || '": ' || r.weight, ', ' ORDER BY r.bit), '') || '}' AS JSON)
+        FROM quality_rules r WHERE (q.passed_mask >> r.bit) & 1 = 1
+    )) AS breakdown_json,
+    COALESCE(q.missing_json, (
+        SELECT CAST('[' || COALESCE(string_agg('"' || r.missing_field || '"', ', ' ORDER BY r.bit), '') || ']' AS JSON)
+        FROM quality_rules r WHERE (q.missing_mask >> r.bit) & 1 = 1 AND r.missing_field IS NOT NULL
+    )) AS missing_json,
+    q.computed_at
+FROM quality_scores_all q;
+
 CREATE TABLE IF NOT EXISTS relationships (
     run_id UUID,
     src_item_id VARCHAR,
@@ -98,3 +159,65 @@ CREATE TABLE IF NOT EXISTS watchlist_items (
   added_at TIMESTAMP,
   notes TEXT
 );
+
+CREATE TABLE IF NOT EXISTS snapshot_watermarks (
+    portal_url VARCHAR,
+    search_query VARCHAR,
+    max_modified_ms BIGINT, -- ArcGIS epoch ms, avoids timezone round-trips
+    max_modified_at TIMESTAMP,
+    run_id UUID, -- last run that advanced (or carried forward) this watermark
+    updated_at TIMESTAMP,
+    PRIMARY KEY (portal_url, search_query)
+);
+
+CREATE TABLE IF NOT EXISTS health_cache (
+    checked_url VARCHAR PRIMARY KEY, -- canonical endpoint
+    ok BOOLEAN,
+    status_code INTEGER,
+    latency_ms INTEGER,
+    error_message VARCHAR,
+    etag VARCHAR,
+    last_modified VARCHAR,
+    checked_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS run_checkpoints (
+    run_id UUID,
+    stage VARCHAR, -- "options", "fetch", "history", "sweep", "scores", "health"
+    status VARCHAR, -- "running" or "done"
+    state_json JSON, -- stage cursor (page cursors, counters, run options)
+    rows_done BIGINT,
+    updated_at TIMESTAMP,
+    PRIMARY KEY (run_id, stage)
+);
+
+CREATE TABLE IF NOT EXISTS run_leases (
+    lease_name VARCHAR PRIMARY KEY, -- "warehouse_writer"
+    holder VARCHAR, -- "<hostname>:<pid>"
+    job VARCHAR, -- what the holder is running, e.g. "incremental"
+    acquired_at TIMESTAMP,
+    expires_at TIMESTAMP -- renewed by the holder; an expired lease can be taken over
+);
+
+CREATE TABLE IF NOT EXISTS run_stages (
+    run_id UUID,
+    stage VARCHAR, -- "fetch", "normalize", "upsert", "history", "sweep", "scores", "health", "finalize"
+    attempt INTEGER, -- > 1 when the stage was re-run by a resume
+    status VARCHAR, -- "ok" or "failed"
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP,
+    busy_ms BIGINT, -- time spent in the stage (interleaved stages: excludes the others)
+    rows_in BIGINT,
+    rows_out BIGINT,
+    bytes_fetched BIGINT,
+    retries INTEGER,
+    peak_rss_mb DOUBLE -- process peak RSS at the end of the stage
+);
+
+CREATE TABLE IF NOT EXISTS item_changes (
+    run_id UUID,
+    item_id VARCHAR,
+    change_type VARCHAR, -- "new", "modified", "restored" or "deleted"
+    changed_fields JSON, -- modified: {field: {"old": ..., "new": ...}}
+    changed_at TIMESTAMP
+);
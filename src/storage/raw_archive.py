@@ -0,0 +1,199 @@
+import gzip
+import json
+import os
+import pathlib
+import duckdb
+import pandas as pd
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from src.storage.duckdb_client import get_db_path
+
+# Items per archive chunk file before a new one is started
+ARCHIVE_CHUNK_ITEMS = 50000
+
+# Items per page yielded when replaying an archive
+ARCHIVE_PAGE_SIZE = 1000
+
+# zstd level of sealed chunks: level 9 is about 40% smaller than the default (3) on item JSON
+# and still seals a 50,000-item chunk in well under a second
+ARCHIVE_ZSTD_LEVEL = 9
+
+# Chunk files: sealed zstd Parquet, the JSON lines of the chunk being written,
+# and gzip JSON lines written by earlier versions (still replayable)
+ARCHIVE_CHUNK_PATTERNS = ("items-*.parquet", "items-*.jsonl", "items-*.jsonl.gz")
+
+def get_archive_root() -> pathlib.Path:
+    """
+    Returns the directory holding raw-payload archives (one sub-directory per run).
+    Default: raw_archive/ next to the DuckDB file. Override via env var GEOCATALOG_ARCHIVE_DIR.
+    """
+    env_path = os.getenv("GEOCATALOG_ARCHIVE_DIR")
+    if env_path:
+        return pathlib.Path(env_path)
+    return get_db_path().parent / "raw_archive"
+
+def archive_path(run_id, root: Optional[pathlib.Path] = None) -> pathlib.Path:
+    return pathlib.Path(root or get_archive_root()) / str(run_id)
+
+def _sealed_path(directory: pathlib.Path, chunk: int) -> pathlib.Path:
+    return directory / f"items-{chunk:05d}.parquet"
+
+def _staging_path(directory: pathlib.Path, chunk: int) -> pathlib.Path:
+    return directory / f"items-{chunk:05d}.jsonl"
+
+def _chunk_files(directory: pathlib.Path) -> List[Tuple[int, pathlib.Path]]:
+    """(chunk, path) of every chunk file, sealed, still open or legacy gzip, in chunk order."""
+    files = [(int(path.name[6:11]), path) for pattern in ARCHIVE_CHUNK_PATTERNS for path in directory.glob(pattern)]
+    return sorted(files)
+
+def _sql_path(path: pathlib.Path) -> str:
+    return str(path).replace("'", "''")
+
+def _seal_chunk(staging: pathlib.Path, sealed: pathlib.Path) -> None:
+    """Rewrites a JSON-lines chunk as zstd Parquet (one `payload` JSON row per item) and drops it."""
+    with open(staging, encoding='utf-8') as f:
+        frame = pd.DataFrame({'payload': [line.rstrip('\n') for line in f]})
+    partial = sealed.with_suffix('.parquet.tmp')
+    con = duckdb.connect(":memory:")
+    try:
+        con.register('chunk', frame)
+        con.execute(f"""
+            COPY (SELECT CAST(payload AS JSON) AS payload FROM chunk)
+            TO '{_sql_path(partial)}' (FORMAT parquet, COMPRESSION zstd, COMPRESSION_LEVEL {ARCHIVE_ZSTD_LEVEL})
+        """)
+    finally:
+        con.close()
+    os.replace(partial, sealed)
+    staging.unlink()
+
+class RawArchiveWriter:
+    """
+    Appends a run's raw item payloads to zstd-compressed Parquet chunks
+    (`<root>/<run_id>/items-00000.parquet`, ...) with one `payload` JSON
+    column, one row per item in harvest order.
+
+    Pages go into the open chunk as JSON lines (`items-00000.jsonl`), flushed
+    after each page, so the archive is complete up to the last page written.
+    DuckDB rewrites a chunk as Parquet when the page after it fills up
+    arrives, and the last one on finish(). `position()` returns where the
+    archive ends; a resumed run passes the position saved with its last
+    checkpoint, and anything written after it is truncated away, so pages
+    that are fetched again are not archived twice.
+    """
+
+    def __init__(self, run_id, root: Optional[pathlib.Path] = None,
+                 chunk_items: int = ARCHIVE_CHUNK_ITEMS, position: Optional[Dict[str, int]] = None):
+        self.directory = archive_path(run_id, root)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.chunk_items = chunk_items
+        position = position or {'chunk': 0, 'bytes': 0, 'chunk_items': 0, 'items': 0}
+        self.chunk = position['chunk']
+        self.chunk_count = position['chunk_items']
+        self.items = position['items']
+        self._bytes = position['bytes']
+
+        # Drop anything written after the saved position (pages that will be fetched again)
+        for chunk, path in _chunk_files(self.directory):
+            if chunk > self.chunk:
+                path.unlink()
+        # A chunk is only sealed once full and checkpointed as such: nothing to truncate
+        self._file = None
+        if not _sealed_path(self.directory, self.chunk).exists():
+            self._file = open(_staging_path(self.directory, self.chunk), 'ab')
+            self._file.truncate(self._bytes)
+            self._file.seek(self._bytes)
+
+    def write_page(self, raw_page: List[dict]) -> None:
+        if not raw_page:
+            return
+        if self.chunk_count >= self.chunk_items:
+            self._seal()
+            self.chunk += 1
+            self.chunk_count = 0
+            self._file = open(_staging_path(self.directory, self.chunk), 'wb')
+        lines = "".join(json.dumps(raw, separators=(',', ':'), default=str) + "\n" for raw in raw_page)
+        self._file.write(lines.encode('utf-8'))
+        self._file.flush()
+        self.chunk_count += len(raw_page)
+        self.items += len(raw_page)
+
+    def position(self) -> Dict[str, int]:
+        """JSON-serializable end of the archive, for checkpoints."""
+        if self._file is not None:
+            self._bytes = self._file.tell()
+        return {'chunk': self.chunk, 'bytes': self._bytes, 'chunk_items': self.chunk_count, 'items': self.items}
+
+    def _seal(self) -> None:
+        self.close()
+        staging = _staging_path(self.directory, self.chunk)
+        if staging.exists():
+            _seal_chunk(staging, _sealed_path(self.directory, self.chunk))
+
+    def finish(self) -> None:
+        """Seals the last chunk; call once the fetch is complete and checkpointed."""
+        if self.chunk_count:
+            self._seal()
+        else:
+            self.close()
+            _staging_path(self.directory, self.chunk).unlink(missing_ok=True)
+
+    def close(self) -> None:
+        """Closes the open chunk without sealing it, so a resumed run can append to it."""
+        if self._file is not None:
+            self._bytes = self._file.tell()
+            self._file.close()
+            self._file = None
+
+def archive_exists(run_id, root: Optional[pathlib.Path] = None) -> bool:
+    return bool(_chunk_files(archive_path(run_id, root)))
+
+def _iter_chunk(path: pathlib.Path) -> Iterator[dict]:
+    """Raw item dicts of one chunk file, in order."""
+    if path.suffix == '.parquet':
+        con = duckdb.connect(":memory:")
+        try:
+            result = con.execute(f"SELECT CAST(payload AS VARCHAR) FROM read_parquet('{_sql_path(path)}')")
+            while True:
+                rows = result.fetchmany(ARCHIVE_PAGE_SIZE)
+                if not rows:
+                    return
+                for (payload,) in rows:
+                    yield json.loads(payload)
+        finally:
+            con.close()
+    opener = gzip.open if path.suffix == '.gz' else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+def iter_archive_pages(run_id, root: Optional[pathlib.Path] = None, page_size: int = ARCHIVE_PAGE_SIZE,
+                       cursor: Optional[dict] = None) -> Iterator[List[dict]]:
+    """
+    Yields a run's archived raw item dicts in pages, in the order they were harvested.
+
+    `cursor` works as in iter_item_pages: {'yielded': n} is updated just
+    before each page is yielded, and a replay resumed with it skips the
+    first n items.
+    """
+    directory = archive_path(run_id, root)
+    chunks = _chunk_files(directory)
+    if not chunks:
+        raise FileNotFoundError(f"No raw archive for run {run_id} in {directory}")
+    start = cursor.get('yielded', 0) if cursor else 0
+    position = 0
+    page = []
+    for _, path in chunks:
+        for raw in _iter_chunk(path):
+            position += 1
+            if position <= start:
+                continue
+            page.append(raw)
+            if len(page) >= page_size:
+                if cursor is not None:
+                    cursor['yielded'] = position
+                yield page
+                page = []
+    if page:
+        if cursor is not None:
+            cursor['yielded'] = position
+        yield page
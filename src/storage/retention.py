@@ -0,0 +1,186 @@
+import logging
+import os
+import pathlib
+import shutil
+import duckdb
+from datetime import datetime, timezone, timedelta
+from typing import Dict, List, Optional
+
+from src.storage.duckdb_client import get_db_path
+
+logger = logging.getLogger(__name__)
+
+# Per-run fact tables moved to Parquet once their run is older than the retention age
+ARCHIVED_TABLES = ('quality_scores', 'health_checks')
+
+# Default age (days) after which a run's rows leave the live tables
+RETENTION_DAYS = 90
+
+# Directory under the archive root where partitions are written until their delete commits
+STAGING_DIR = '_staging'
+
+def get_fact_archive_root() -> pathlib.Path:
+    """
+    Returns the directory holding archived fact-table rows as Parquet
+    (`<root>/<table>/run_date=YYYY-MM-DD/run_id=<uuid>/data_0.parquet`).
+    Default: fact_archive/ next to the DuckDB file. Override via env var GEOCATALOG_FACT_ARCHIVE_DIR.
+    """
+    env_path = os.getenv("GEOCATALOG_FACT_ARCHIVE_DIR")
+    if env_path:
+        return pathlib.Path(env_path)
+    return get_db_path().parent / "fact_archive"
+
+def _sql_path(path: pathlib.Path) -> str:
+    return path.resolve().as_posix().replace("'", "''")
+
+def _has_parquet(path: pathlib.Path) -> bool:
+    return path.is_dir() and any(path.glob("*/*/*.parquet"))
+
+def refresh_archive_views(con: duckdb.DuckDBPyConnection, root: Optional[pathlib.Path] = None) -> None:
+    """
+    (Re)creates `<table>_all` views: the live table plus its Parquet archive,
+    if any. Filters on run_id or run_date only read the matching partitions.
+    """
+    root = pathlib.Path(root or get_fact_archive_root())
+    for table in ARCHIVED_TABLES:
+        directory = root / table
+        if _has_parquet(directory):
+            con.execute(f"""
+                CREATE OR REPLACE VIEW {table}_all AS
+                SELECT * FROM {table}
+                UNION ALL BY NAME
+                SELECT * EXCLUDE (run_date) FROM read_parquet(
+                    '{_sql_path(directory)}/*/*/*.parquet',
+                    hive_partitioning = true, hive_types = {{'run_date': DATE, 'run_id': UUID}}, union_by_name = true
+                )
+            """)
+        else:
+            con.execute(f"CREATE OR REPLACE VIEW {table}_all AS SELECT * FROM {table}")
+
+def promote_staged_partitions(con: duckdb.DuckDBPyConnection, root: Optional[pathlib.Path] = None) -> int:
+    """
+    Moves staged partitions of runs recorded in archived_runs (their delete
+    committed) into the archive, replacing any earlier copy, and discards
+    the rest (left by an attempt that rolled back or crashed).
+
+    Returns:
+        int: Partitions moved into the archive.
+    """
+    root = pathlib.Path(root or get_fact_archive_root())
+    staging = root / STAGING_DIR
+    if not staging.is_dir():
+        return 0
+    committed = {(table, run_id) for table, run_id in con.execute(
+        "SELECT table_name, CAST(run_id AS VARCHAR) FROM archived_runs"
+    ).fetchall()}
+    moved = 0
+    for table in ARCHIVED_TABLES:
+        for partition in (staging / table).glob("run_date=*/run_id=*"):
+            if (table, partition.name.split('=', 1)[1]) not in committed:
+                continue
+            target = root / table / partition.parent.name / partition.name
+            if target.exists():
+                shutil.rmtree(target)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            partition.rename(target)
+            moved += 1
+    shutil.rmtree(staging)
+    return moved
+
+def protected_run_ids(con: duckdb.DuckDBPyConnection) -> List[str]:
+    """
+    Runs whose rows must stay live regardless of age: the latest snapshot
+    and the latest run with health results (base of health-only refreshes).
+    """
+    rows = con.execute("""
+        SELECT run_id FROM (SELECT run_id FROM runs WHERE COALESCE(source, '') <> 'health' ORDER BY started_at DESC LIMIT 1)
+        UNION
+        SELECT run_id FROM (
+            SELECT r.run_id FROM runs r
+            WHERE EXISTS (SELECT 1 FROM health_checks h WHERE h.run_id = r.run_id)
+            ORDER BY r.started_at DESC LIMIT 1
+        )
+    """).fetchall()
+    return [str(r[0]) for r in rows]
+
+def archive_old_runs(con: duckdb.DuckDBPyConnection, older_than_days: float = RETENTION_DAYS,
+                     root: Optional[pathlib.Path] = None, dry_run: bool = False) -> Dict[str, int]:
+    """
+    Moves quality_scores and health_checks rows of finished runs started more
+    than `older_than_days` ago to partitioned Parquet files and deletes them
+    from the live tables; the `<table>_all` views keep them queryable.
+
+    Partitions are written to a staging directory the views do not read,
+    and the delete runs in one transaction; only after it commits are the
+    partitions moved into the archive (promote_staged_partitions). A job
+    that fails before committing leaves the rows live and discards its
+    files, so no row is ever both live and archived; staged files of a job
+    that died after committing are moved into place by the next job.
+
+    Returns:
+        dict: {'runs': runs archived, '<table>': rows moved per table}.
+    """
+    root = pathlib.Path(root or get_fact_archive_root())
+    if not dry_run:
+        promote_staged_partitions(con, root)
+    cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+    protected = protected_run_ids(con)
+    exists = " OR ".join(f"EXISTS (SELECT 1 FROM {t} f WHERE f.run_id = r.run_id)" for t in ARCHIVED_TABLES)
+    con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE _archive_runs AS
+        SELECT r.run_id, CAST(r.started_at AS DATE) AS run_date FROM runs r
+        WHERE r.finished_at IS NOT NULL AND r.started_at < ?
+        AND NOT list_contains(?::VARCHAR[], CAST(r.run_id AS VARCHAR))
+        AND ({exists})
+    """, (cutoff, protected))
+    summary = {'runs': con.execute("SELECT COUNT(*) FROM _archive_runs").fetchone()[0]}
+    if not summary['runs'] or dry_run:
+        for table in ARCHIVED_TABLES:
+            summary[table] = con.execute(
+                f"SELECT COUNT(*) FROM {table} f JOIN _archive_runs a ON f.run_id = a.run_id"
+            ).fetchone()[0]
+        con.execute("DROP TABLE _archive_runs")
+        logger.info(f"{'Would archive' if dry_run else 'Nothing to archive:'} {summary['runs']} runs older than "
+                    f"{older_than_days} days, " + ", ".join(f"{summary[t]} {t} rows" for t in ARCHIVED_TABLES))
+        return summary
+
+    staging = root / STAGING_DIR
+    con.begin()
+    try:
+        for table in ARCHIVED_TABLES:
+            directory = staging / table
+            directory.mkdir(parents=True, exist_ok=True)
+            moved = con.execute(
+                f"SELECT COUNT(*) FROM {table} f JOIN _archive_runs a ON f.run_id = a.run_id"
+            ).fetchone()[0]
+            if moved:
+                con.execute(f"""
+                    COPY (
+                        SELECT f.*, a.run_date FROM {table} f JOIN _archive_runs a ON f.run_id = a.run_id
+                    ) TO '{_sql_path(directory)}'
+                    (FORMAT parquet, COMPRESSION zstd, PARTITION_BY (run_date, run_id),
+                     OVERWRITE_OR_IGNORE, FILENAME_PATTERN 'data_{{i}}')
+                """)
+                con.execute(f"""
+                    INSERT INTO archived_runs (run_id, table_name, run_date, rows_archived, archived_at)
+                    SELECT run_id, ?, run_date, COUNT(*), ? FROM (
+                        SELECT f.run_id, a.run_date FROM {table} f JOIN _archive_runs a ON f.run_id = a.run_id
+                    ) GROUP BY run_id, run_date
+                """, (table, datetime.now(timezone.utc)))
+                con.execute(f"DELETE FROM {table} WHERE run_id IN (SELECT run_id FROM _archive_runs)")
+            summary[table] = moved
+        con.commit()
+    except Exception:
+        con.rollback()
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    finally:
+        con.execute("DROP TABLE IF EXISTS _archive_runs")
+    promote_staged_partitions(con, root)
+    refresh_archive_views(con, root)
+
+    # Reclaim the deleted rows' space in the database file
+    con.execute("CHECKPOINT")
+    logger.info(f"Archived {summary['runs']} runs older than {older_than_days} days to {root}: "
+                + ", ".join(f"{summary[t]} {t} rows" for t in ARCHIVED_TABLES))
+    return summary
@@ -1,33 +1,49 @@
-from src.services.arcgis_client import get_gis
+from src.services.portal_search import get_search_client
+
+# Search filters for item types whose names also match other types (as arcgis' content.search does)
+ITEM_TYPE_FILTERS = {
+    "feature layer": 'type:"Feature Service"',
+    "web map": 'type:"Web Map" -type:"Web Mapping Application"',
+    "web scene": 'type:"Web Scene" -type:"CityEngine Web Scene"',
+    "layer": 'type:"Layer" -type:"Layer Package" -type:"Explorer Layer"',
+}
 
 def search_items(query, item_type="Feature Layer", max_items=5):
     """
     Searches for items in ArcGIS Online.
-    
+
     Args:
         query (str): The search query string.
         item_type (str): The type of item to search for (default: "Feature Layer").
         max_items (int): The maximum number of items to return (default: 5).
-        
+
     Returns:
         list: A list of dictionaries containing item details.
     """
-    gis = get_gis()
-    items = gis.content.search(query, item_type=item_type, max_items=max_items)
-    
+    client = get_search_client()
+    if item_type:
+        type_filter = ITEM_TYPE_FILTERS.get(item_type.lower(), f'type:"{item_type}"')
+        query = f"{query} {type_filter}" if query else type_filter
+    # Like content.search(outside_org=False): stay within the signed-in organization
+    account_id = getattr(client.properties, "id", None)
+    if account_id and query:
+        query = f"{query} accountid:{account_id}"
+
     results = []
-    for item in items:
+    for item in client.iter_results(query, max_items=max_items, sort_field="avgRating", sort_order="desc"):
         # Handle potential missing attributes gracefully
         results.append({
-            "title": item.title,
-            "id": item.id,
-            "type": item.type,
-            "owner": item.owner,
-            "modified": item.modified, # Unix timestamp usually
-            "tags": item.tags,
-            "url": item.url,
-            "snippet": item.snippet, # Added for scoring
-            "description": item.description # Added for scoring
+            "title": item.get("title"),
+            "id": item.get("id"),
+            "type": item.get("type"),
+            "owner": item.get("owner"),
+            "modified": item.get("modified"), # Unix timestamp usually
+            "tags": item.get("tags"),
+            "url": item.get("url"),
+            "snippet": item.get("snippet"), # Added for scoring
+            "description": item.get("description"), # Added for scoring
+            "thumbnail": item.get("thumbnail"),
+            "extent": item.get("extent")
         })
-    
+
     return results
@@ -6,6 +6,8 @@ import json
 import urllib.parse
 from arcgis.geometry import project
 
+from src.services.request_governor import governed
+
 def normalize_layer_input(input_str: str) -> Dict[str, Any]:
     """
     Parses a user input string (Item ID, FeatureServer URL, Map Viewer URL)
@@ -61,7 +63,7 @@ def resolve_item(item_id_or_url: str, gis: GIS) -> Union[Item, FeatureLayer, Fea
             except: pass
             
         try:
-            item = gis.content.get(item_id)
+            item = governed(gis.url, gis.content.get, item_id)
             if not item:
                 # Last ditch: maybe it IS a URL but didn't look like one?
                 if "http" in item_id:
@@ -119,7 +121,7 @@ def get_row_counts(item: Union[Item, FeatureLayer, FeatureLayerCollection], wher
     
     def count_source(lyr_obj):
         try:
-            return lyr_obj.query(where=where, return_count_only=True)
+            return governed(lyr_obj.url, lyr_obj.query, where=where, return_count_only=True)
         except Exception as e:
             return -1 # Error indicator
             
@@ -250,7 +252,7 @@ def count_rows(input_str: str,
         nonlocal total_count, has_error
         try:
             # return_count_only=True
-            c = lyr_obj.query(where=where, return_count_only=True)
+            c = governed(lyr_obj.url, lyr_obj.query, where=where, return_count_only=True)
             # ArcGIS API for Python query() with return_count_only=True returns just the number usually
             if isinstance(c, (int, float)):
                 return {"index": idx, "name": name, "count": int(c), "error": None}
@@ -414,7 +416,8 @@ def query_preview_geojson(item_id_or_url: str, layer_index: int = 0,
     # Let's just run query.
     
     try:
-        fset = target_layer.query(
+        fset = governed(
+            target_layer.url, target_layer.query,
             where=where,
             out_sr=out_sr_wkid, # FIX #1
             result_record_count=limit,
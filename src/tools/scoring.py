@@ -1,32 +1,214 @@
+import threading
+import duckdb
+import pandas as pd
+from datetime import datetime, timezone
+from typing import List, Optional
+
+# Quality rules, declared once and shared by the snapshot pipeline and the app.
+# Each rule is a SQL predicate over items_current columns (or a frame with the
+# same columns). `missing` names the field reported in missing_json when the
+# `missing_when` predicate holds. `$now` is bound to the scoring time.
+# A rule's position is its bit in passed_mask / missing_mask (see quality_rules):
+# append new rules, never reorder or reuse a position.
+QUALITY_RULES = [
+    {'name': 'has_description', 'weight': 20, 'when': "has_description",
+     'missing': 'description', 'missing_when': "NOT COALESCE(has_description, false)"},
+    {'name': 'tags_count', 'weight': 15, 'when': "tags_count >= 3",
+     'missing': 'tags', 'missing_when': "COALESCE(tags_count, 0) = 0"},
+    {'name': 'has_extent', 'weight': 15, 'when': "has_extent"},
+    {'name': 'has_thumbnail', 'weight': 5, 'when': "has_thumbnail",
+     'missing': 'thumbnail', 'missing_when': "NOT COALESCE(has_thumbnail, false)"},
+    {'name': 'snippet_len', 'weight': 5, 'when': "snippet_len BETWEEN 20 AND 200"},
+    {'name': 'title_len', 'weight': 5, 'when': "length(COALESCE(title, '')) BETWEEN 10 AND 120"},
+    {'name': 'freshness', 'weight': 20, 'when': "modified_at > $now - INTERVAL 181 DAY"},
+    {'name': 'url', 'weight': 10, 'when': "COALESCE(url, '') <> ''"},
+]
+
+def rule_bit(name: str) -> int:
+    """passed_mask bit of the rule called `name`."""
+    for bit, rule in enumerate(QUALITY_RULES):
+        if rule['name'] == name:
+            return 1 << bit
+    raise KeyError(name)
+
+def missing_bit(field: str) -> int:
+    """missing_mask bit of the missing field `field` (e.g. 'tags')."""
+    for bit, rule in enumerate(QUALITY_RULES):
+        if rule.get('missing') == field:
+            return 1 << bit
+    raise KeyError(field)
+
+def missing_field_sql(field: str, scores: str = "s") -> str:
+    """
+    SQL predicate: the item lacks `field` (e.g. 'tags'). Tests the missing_mask
+    bit of the item's quality_scores row (`scores` alias, LEFT JOINed); items
+    without a score row, e.g. from a run without scores or whose scores were
+    archived, fall back to the rule's predicate on the item columns.
+    """
+    rule = next((r for r in QUALITY_RULES if r.get('missing') == field), None)
+    if rule is None:
+        raise KeyError(field)
+    return f"COALESCE(({scores}.missing_mask & {missing_bit(field)}) <> 0, {rule['missing_when']})"
+
+def failed_rule_sql(name: str, scores: str = "s") -> str:
+    """
+    SQL predicate: the item fails rule `name` (e.g. 'has_extent'). Like
+    missing_field_sql, falls back to the item columns without a score row.
+    """
+    rule = next((r for r in QUALITY_RULES if r['name'] == name), None)
+    if rule is None:
+        raise KeyError(name)
+    return f"COALESCE(({scores}.passed_mask & {rule_bit(name)}) = 0, NOT COALESCE({rule['when']}, false))"
+
+def sync_quality_rules(con: duckdb.DuckDBPyConnection) -> None:
+    """
+    Writes QUALITY_RULES to the quality_rules dictionary (a handful of rows;
+    cheap enough to run with every scoring pass).
+    """
+    con.executemany(
+        "INSERT OR REPLACE INTO quality_rules (bit, rule_name, weight, missing_field) VALUES (?, ?, ?, ?)",
+        [(bit, r['name'], r['weight'], r.get('missing')) for bit, r in enumerate(QUALITY_RULES)]
+    )
+
+def backfill_quality_masks(con: duckdb.DuckDBPyConnection) -> int:
+    """
+    One-time migration: fills in the masks of quality_scores rows stored
+    before them (JSON only) from the quality_rules dictionary. Scans the
+    whole table, so it is run by scripts/init_duckdb.py, not per snapshot.
+
+    Returns:
+        int: Number of rows backfilled.
+    """
+    sync_quality_rules(con)
+    pending = con.sql(
+        "SELECT COUNT(*) FROM quality_scores WHERE passed_mask IS NULL AND breakdown_json IS NOT NULL"
+    ).fetchone()[0]
+    if not pending:
+        return 0
+    con.execute("""
+        UPDATE quality_scores q SET
+            passed_mask = (
+                SELECT COALESCE(SUM(1 << r.bit), 0) FROM quality_rules r
+                WHERE json_exists(q.breakdown_json, '$."' || r.rule_name || '"')
+            ),
+            missing_mask = (
+                SELECT COALESCE(SUM(1 << r.bit), 0) FROM quality_rules r
+                WHERE list_contains(CAST(q.missing_json AS VARCHAR[]), r.missing_field)
+            )
+        WHERE q.passed_mask IS NULL AND q.breakdown_json IS NOT NULL
+    """)
+    return pending
+
+def quality_scores_sql(source: str, where: str = "") -> str:
+    """
+    Builds a SELECT that evaluates QUALITY_RULES over every row of `source`.
+
+    Returns columns: item_id, score (0-100), passed_mask and missing_mask
+    (bit i set when QUALITY_RULES[i] passed / its field is missing), and the
+    same as JSON: breakdown_json ({rule: weight} for passed rules) and
+    missing_json (list of missing fields).
+    """
+    passed = [(r, f"COALESCE({r['when']}, false)") for r in QUALITY_RULES]
+    score = " + ".join(f"CASE WHEN {p} THEN {r['weight']} ELSE 0 END" for r, p in passed)
+    passed_mask = " + ".join(f"CASE WHEN {p} THEN {1 << bit} ELSE 0 END" for bit, (r, p) in enumerate(passed))
+    missing_mask = " + ".join(
+        f"CASE WHEN {r['missing_when']} THEN {1 << bit} ELSE 0 END"
+        for bit, r in enumerate(QUALITY_RULES) if r.get('missing')
+    )
+    breakdown = ", ".join(f"CASE WHEN {p} THEN '\"{r['name']}\": {r['weight']}' END" for r, p in passed)
+    missing = ", ".join(
+        f"CASE WHEN {r['missing_when']} THEN '\"{r['missing']}\"' END"
+        for r in QUALITY_RULES if r.get('missing')
+    )
+    return f"""
+        SELECT
+            item_id,
+            CAST(LEAST(GREATEST({score}, 0), 100) AS INTEGER) AS score,
+            CAST({passed_mask} AS INTEGER) AS passed_mask,
+            CAST({missing_mask} AS INTEGER) AS missing_mask,
+            CAST('{{' || concat_ws(', ', {breakdown}) || '}}' AS JSON) AS breakdown_json,
+            CAST('[' || concat_ws(', ', {missing}) || ']' AS JSON) AS missing_json
+        FROM {source}
+        {where}
+    """
+
+def compute_quality_scores(con: duckdb.DuckDBPyConnection, run_id, now: Optional[datetime] = None,
+                           all_items: bool = False) -> int:
+    """
+    Scores every items_current row seen in `run_id` (with `all_items`, every
+    live row, e.g. for incremental runs) in one set-based statement and
+    appends the results to quality_scores. Only the masks are stored; the
+    quality_scores_json view rebuilds breakdown_json / missing_json from them.
+
+    Returns:
+        int: Number of scored items.
+    """
+    now = now or datetime.now(timezone.utc)
+    sync_quality_rules(con)
+    where = "WHERE NOT COALESCE(is_deleted, false)" if all_items else "WHERE last_seen_run_id = $run_id"
+    scored = quality_scores_sql("items_current", where)
+    con.execute(f"""
+        INSERT INTO quality_scores (run_id, item_id, score, passed_mask, missing_mask, computed_at)
+        SELECT $run_id, item_id, score, passed_mask, missing_mask, $now FROM ({scored})
+    """, {'run_id': str(run_id), 'now': now})
+    return con.execute("SELECT COUNT(*) FROM quality_scores WHERE run_id = ?", (str(run_id),)).fetchone()[0]
+
+# In-memory database for scoring frames when the caller has no connection (created on first use)
+_scoring_db: Optional[duckdb.DuckDBPyConnection] = None
+_scoring_db_lock = threading.Lock()
+
+def _scoring_cursor() -> duckdb.DuckDBPyConnection:
+    global _scoring_db
+    with _scoring_db_lock:
+        if _scoring_db is None:
+            _scoring_db = duckdb.connect(":memory:")
+        # One cursor per call: registrations are per cursor, so concurrent callers don't clash
+        return _scoring_db.cursor()
+
+def score_frame(frame: pd.DataFrame, con: Optional[duckdb.DuckDBPyConnection] = None,
+                now: Optional[datetime] = None) -> pd.DataFrame:
+    """
+    Scores a frame of normalized items (items_current columns) with the same rules.
+    Runs on `con` (e.g. the caller's warehouse connection) when given, otherwise
+    on a cursor of a shared in-memory database.
+
+    Returns:
+        pd.DataFrame: item_id, score, passed_mask, missing_mask, breakdown_json, missing_json (input order).
+    """
+    now = now or datetime.now(timezone.utc)
+    cur = con if con is not None else _scoring_cursor()
+    cur.register("_scoring_batch", frame.assign(_pos=range(len(frame))))
+    try:
+        return cur.execute(quality_scores_sql("_scoring_batch", "ORDER BY _pos"), {'now': now}).df()
+    finally:
+        cur.unregister("_scoring_batch")
+        if con is None:
+            cur.close()
+
+def score_search_results(items: List[dict], con: Optional[duckdb.DuckDBPyConnection] = None) -> List[int]:
+    """
+    Calculates quality scores for raw ArcGIS item dicts (e.g. from search_items),
+    on `con` if given (see score_frame).
+
+    Returns:
+        List[int]: Scores between 0 and 100, in input order.
+    """
+    if not items:
+        return []
+    # Imported here: the pipeline module imports this one
+    from src.pipeline.snapshot import normalize_item
+    from src.pipeline.records import records_to_columns
+    frame = pd.DataFrame(records_to_columns([normalize_item(i, None) for i in items]))
+    return score_frame(frame, con)['score'].astype(int).tolist()
+
 def quality_score(item_dict):
     """
     Calculates a quality score for an ArcGIS item based on its metadata.
-    
+
     Args:
         item_dict (dict): The item dictionary returned by search_items.
-        
+
     Returns:
         int: A score between 0 and 100.
     """
-    score = 0
-    
-    # 1. Title check (shouldn't be empty, effectively guaranteed by search but good to check)
-    if item_dict.get('title'):
-        score += 20
-        
-    # 2. Snippet (summary) check
-    if item_dict.get('snippet'):
-        score += 30
-        
-    # 3. Description check
-    if item_dict.get('description'):
-        score += 30
-        
-    # 4. Tags check
-    tags = item_dict.get('tags', [])
-    if tags:
-        score += 10
-        if len(tags) >= 3:
-            score += 10
-            
-    return min(score, 100)
+    return score_search_results([item_dict])[0]